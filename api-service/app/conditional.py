@@ -0,0 +1,64 @@
+"""
+HTTP conditional request helpers
+Polling endpoints tag responses with weak ETags built from snapshot
+versions, so an unchanged snapshot is answered with an empty 304 before the
+response body is built or serialized.
+"""
+
+import time
+from typing import Sequence
+
+from fastapi import Request, Response
+from starlette.middleware.gzip import GZipMiddleware
+
+# Distinguishes ETags across restarts, when version counters start over
+_EPOCH = format(int(time.time()), "x")
+
+
+def make_etag(*versions) -> str:
+    """Weak ETag from the versions a representation is built from"""
+    return 'W/"' + "-".join([_EPOCH, *(str(version) for version in versions)]) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of If-None-Match against `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in header.split(",")
+    )
+
+
+def set_etag(response: Response, etag: str):
+    """Tag a response and ask clients to revalidate before reusing it"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Gzip negotiation that leaves streaming paths (Server-Sent Events)
+    alone, since compressing them would hold back events until a buffer
+    fills
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, exclude: Sequence[str] = ()):
+        super().__init__(app, minimum_size=minimum_size)
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,93 @@
+"""
+Runtime configuration for the AetherLink API service
+Values are read from environment variables (or a local .env file)
+"""
+
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Service settings loaded from the environment"""
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    api_host: str = "0.0.0.0"
+    api_port: int = 8000
+    network_prefix: str = "192.168.1"
+
+    # Presence tracking: how long a missing device stays "suspect" before
+    # it is confirmed offline, and how many failed probes are required
+    presence_offline_grace: float = 60.0  # seconds
+    presence_confirm_probes: int = 2
+
+    # Device discovery backend: auto (arp-scan, falling back to arp -a),
+    # arp-scan, arp-table, neighbor, native or replay. Replay plays back a
+    # trace recorded with discovery_record_path at discovery_replay_speed.
+    discovery_backend: str = "auto"
+    discovery_replay_path: Optional[str] = None
+    discovery_replay_speed: float = 1.0
+    discovery_record_path: Optional[str] = None
+
+    # Alert history: number of alerts kept in memory and an optional
+    # JSON lines file so history survives restarts
+    alert_history_size: int = 10000
+    alert_history_path: Optional[str] = None
+
+    # Per-device state (device records, presence, histories, baselines,
+    # sessions, alert state) is kept under memory_budget_mb: every
+    # memory_check_interval seconds the least recently seen offline devices'
+    # state is evicted, to memory_spill_path if set (and reloaded when they
+    # reconnect)
+    memory_budget_mb: float = 256.0
+    memory_spill_path: Optional[str] = None
+    memory_check_interval: float = 60.0
+
+    # Warm start: known devices, histories and alert state are saved to
+    # state_checkpoint_path every state_checkpoint_interval seconds (and on
+    # shutdown) and restored at startup
+    state_checkpoint_path: Optional[str] = None
+    state_checkpoint_interval: float = 60.0
+
+    # Startup: services are built in the background after the app starts
+    # serving; a warning is logged when that takes over startup_budget
+    # seconds
+    startup_budget: float = 2.0
+
+    # Exports are read and encoded export_chunk_size rows at a time
+    export_chunk_size: int = 5000
+
+    # Logging: level, JSON lines (or plain text) output, and per-message
+    # rate limiting (records per second with bursts) for repeated messages
+    log_level: str = "INFO"
+    log_json: bool = True
+    log_rate_limit: float = 10.0
+    log_rate_burst: int = 20
+    log_queue_size: int = 10000
+
+    # Streaming: seconds between published status updates, and how many
+    # events are kept so SSE clients can resume with Last-Event-ID
+    publish_interval: float = 5.0
+    event_replay_size: int = 1000
+
+    # Scan cadence: publish_interval while WebSocket/SSE clients are
+    # connected or the API was called in the last scan_idle_after seconds,
+    # otherwise a maintenance scan every scan_idle_interval seconds
+    scan_idle_interval: float = 60.0
+    scan_idle_after: float = 30.0
+
+    # Shared secret for /api/admin endpoints (sent as X-Admin-Token);
+    # admin endpoints are disabled (404) when unset
+    admin_token: Optional[str] = None
+
+    # Multi-worker deployments: "standalone" scans in every process; with
+    # "api", workers are stateless and served by the scanner process
+    # (python -m app.scanner) through the broker at broker_url, which is
+    # hosted by the scanner for unix:// and tcp:// URLs, or an external
+    # Redis-compatible server for redis:// URLs
+    worker_role: str = "standalone"
+    broker_url: str = "unix:///tmp/aetherlink-broker.sock"
+
+
+settings = Settings()
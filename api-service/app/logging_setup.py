@@ -0,0 +1,162 @@
+"""
+Structured logging for the AetherLink API service
+Application loggers (`app.*`) write to a bounded in-memory queue drained by a
+background thread, so request handlers and the scan loop never block on
+stdout. Repeated messages are rate limited per message key and can be
+sampled, and records are emitted as JSON lines by default.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc)
+            .isoformat()
+            .replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_FIELDS and name not in ("key", "sample"):
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per message key (the `key` extra, or the unformatted
+    message template) allowing `rate` records per second with bursts of
+    `burst`. Records may also carry a `sample` extra (0-1) to keep only
+    that fraction. The next record let through for a key reports how many
+    were dropped in between as `suppressed`.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 20, max_keys: int = 1024):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> [tokens, last refill time, suppressed since last emit]
+        self.buckets: Dict[str, List[float]] = {}
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR and not hasattr(record, "key"):
+            # Errors are only limited when they opt in with a key
+            return True
+
+        key = str(getattr(record, "key", record.msg))
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self.buckets.clear()
+            bucket = self.buckets[key] = [float(self.burst), now, 0]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        sample = getattr(record, "sample", None)
+        if bucket[0] < 1 or (sample is not None and random.random() >= sample):
+            bucket[2] += 1
+            self.suppressed_total += 1
+            return False
+
+        bucket[0] -= 1
+        if bucket[2]:
+            record.suppressed = int(bucket[2])
+            bucket[2] = 0
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(
+    level: str = "INFO",
+    json_output: bool = True,
+    rate: float = 10.0,
+    burst: int = 20,
+    queue_size: int = 10000,
+) -> DroppingQueueHandler:
+    """
+    Route the `app` logger through a non-blocking queue to stdout
+    Safe to call again (e.g. on reload); the previous listener is stopped
+    """
+    global _listener
+
+    shutdown_logging()
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(
+        JsonFormatter()
+        if json_output
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RateLimitFilter(rate=rate, burst=burst))
+
+    logger = logging.getLogger("app")
+    logger.handlers = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    return handler
+
+
+@atexit.register
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_stats() -> Dict[str, int]:
+    """Dropped and rate-limited record counts for diagnostics"""
+    stats = {"queued": 0, "dropped": 0, "suppressed": 0}
+    for handler in logging.getLogger("app").handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            stats["queued"] = handler.queue.qsize()
+            stats["dropped"] = handler.dropped
+            for log_filter in handler.filters:
+                if isinstance(log_filter, RateLimitFilter):
+                    stats["suppressed"] = log_filter.suppressed_total
+    return stats
@@ -2,12 +2,41 @@
 Main FastAPI application for AetherLink Network Monitor
 """
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import network
+from fastapi.responses import PlainTextResponse
+from app.config import settings
+from app.logging_setup import setup_logging
+
+# Configure logging before the app modules are imported
+setup_logging(
+    level=settings.log_level,
+    json_output=settings.log_json,
+    rate=settings.log_rate_limit,
+    burst=settings.log_rate_burst,
+    queue_size=settings.log_queue_size,
+)
+
+from app.conditional import CompressionMiddleware  # noqa: E402
+from app.routers import admin, export, network  # noqa: E402
+from app.services.container import services  # noqa: E402
+from app.services.metrics import MetricsMiddleware, registry  # noqa: E402
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Services are built in the background; /health answers meanwhile and
+    # API routes wait until they are ready
+    await services.start()
+    yield
+    await services.stop()
+
 
 # Create FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="AetherLink API",
     description="Network monitoring API service for AetherLink dashboard",
     version="0.1.0",
@@ -31,10 +60,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+# Compress larger responses for clients sending Accept-Encoding: gzip
+app.add_middleware(CompressionMiddleware, minimum_size=1024, exclude=["/api/events"])
+
+# Per-route request latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(network.router)
+app.include_router(admin.router)
+app.include_router(export.router)
 
 
 @app.get("/")
@@ -50,8 +88,16 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+    """Health check endpoint (`ready` once services finished starting)"""
+    return {"status": "healthy", "ready": services.is_ready}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    if services.is_ready:
+        services.gateway.collect_metrics()
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 from typing import Optional, Literal
 from enum import Enum
@@ -21,6 +21,8 @@ class NetworkDevice(BaseModel):
     connection_quality: Optional[Literal["excellent", "good", "fair", "poor"]] = None
     first_seen: Optional[datetime] = None
     total_connections: Optional[int] = None
+    # Deviations above the device's usual latency/loss for this hour of day
+    anomaly_score: Optional[float] = None
 
     class Config:
         json_schema_extra = {
@@ -66,6 +68,7 @@ class NetworkActivity(BaseModel):
 
     id: str
     device: str
+    device_id: Optional[str] = None
     action: str
     timestamp: datetime
 
@@ -88,6 +91,25 @@ class ChartDataPoint(BaseModel):
     upload: float
 
 
+class DeviceBulkQuery(BaseModel):
+    """History, activities or availability of several devices in one request"""
+
+    device_ids: list[str] = Field(..., min_length=1, max_length=1000)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    # Per device
+    limit: int = Field(100, ge=1, le=1000)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "device_ids": ["aabbccddeeff", "112233445566"],
+                "since": "2025-11-06T18:00:00",
+                "limit": 100,
+            }
+        }
+
+
 class NetworkStatusResponse(BaseModel):
     """Complete network status response"""
 
@@ -138,6 +160,7 @@ class AlertType(str, Enum):
     DUPLICATE_IP = "duplicate_ip"
     HIGH_LATENCY = "high_latency"
     PACKET_LOSS = "packet_loss"
+    ANOMALY = "anomaly"
 
 
 class AlertSeverity(str, Enum):
@@ -162,6 +185,12 @@ class Alert(BaseModel):
     timestamp: datetime
     acknowledged: bool = False
     acknowledged_at: Optional[datetime] = None
+    # Lifecycle: repeats of the same condition are folded into one alert
+    fingerprint: Optional[str] = None
+    occurrences: int = 1
+    last_occurrence: Optional[datetime] = None
+    resolved: bool = False
+    resolved_at: Optional[datetime] = None
 
     class Config:
         json_schema_extra = {
@@ -175,6 +204,9 @@ class Alert(BaseModel):
                 "device_name": "iPhone 13",
                 "timestamp": "2025-11-06T18:30:00",
                 "acknowledged": False,
+                "fingerprint": "high_latency:aabbccddeeff",
+                "occurrences": 3,
+                "resolved": False,
             }
         }
 
@@ -189,6 +221,40 @@ class AlertRule(BaseModel):
     latency_threshold: Optional[float] = 200.0  # ms
     packet_loss_threshold: Optional[float] = 10.0  # percentage
     offline_threshold: Optional[int] = 300  # seconds
+    # Generic rule engine fields (metric rules default to the legacy
+    # threshold matching their type when these are left unset)
+    metric: Optional[str] = None  # e.g. "latency", "packet_loss"
+    condition: Literal["threshold", "rate_of_change", "sustained"] = "threshold"
+    operator: Literal[">", ">=", "<", "<="] = ">"
+    threshold: Optional[float] = None  # rate_of_change: units per second
+    duration: Optional[int] = Field(None, ge=0)  # seconds, for sustained
+    severity: Optional[AlertSeverity] = None
+    # Windowed evaluation: aggregate samples over a sliding window
+    # (seconds; the EWMA half-life for "ewma") before applying the condition
+    aggregate: Literal["last", "mean", "max", "ewma", "p50", "p90", "p95", "p99"] = (
+        "last"
+    )
+    # Windows and sample counts are bounded so one rule cannot make every
+    # device keep an arbitrarily long history
+    window: Optional[int] = Field(None, gt=0, le=1024)
+    min_samples: int = Field(1, ge=1, le=1024)
+    # Fire only when the condition held in `breaches` of the last `samples`
+    breaches: Optional[int] = Field(None, ge=1, le=1024)
+    samples: Optional[int] = Field(None, ge=1, le=1024)
+    # Scopes (empty = applies to every device)
+    device_ids: list[str] = []
+    vendors: list[str] = []
+    device_types: list[str] = []
+
+    @model_validator(mode="after")
+    def check_breaches(self) -> "AlertRule":
+        """A rule needing more breaches than samples could never fire"""
+        if self.breaches is not None:
+            if self.samples is None:
+                raise ValueError("breaches requires samples")
+            if self.breaches > self.samples:
+                raise ValueError("breaches must not exceed samples")
+        return self
 
     class Config:
         json_schema_extra = {
@@ -197,6 +263,13 @@ class AlertRule(BaseModel):
                 "type": "high_latency",
                 "enabled": True,
                 "latency_threshold": 200.0,
+                "metric": "latency",
+                "operator": ">",
+                "threshold": 150.0,
+                "aggregate": "p95",
+                "window": 300,
+                "min_samples": 5,
+                "device_types": ["phone"],
             }
         }
 
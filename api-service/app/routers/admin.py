@@ -0,0 +1,88 @@
+"""
+Admin API routes for runtime diagnostics
+Profiling can be started and stopped on the running service without a
+redeploy. Requests must send ADMIN_TOKEN in X-Admin-Token; without a
+configured token the admin endpoints are disabled.
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.services.profiler import MAX_DURATION, PROFILE_MODES, profiling
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject requests without the configured admin token"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode(), settings.admin_token.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(
+    prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)]
+)
+
+
+@router.post("/profile/start")
+async def start_profiling(
+    duration: float = Query(10.0, gt=0, le=MAX_DURATION),
+    mode: str = Query("wall", pattern=f"^({'|'.join(PROFILE_MODES)})$"),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    slow_callback_ms: float = Query(100.0, ge=10),
+    subsystems: Optional[str] = None,
+):
+    """
+    Start sampling the service for `duration` seconds
+
+    - **mode**: `wall` (all threads, includes blocking I/O) or `cpu`
+      (event loop thread, CPU time only)
+    - **interval_ms**: Sampling interval
+    - **slow_callback_ms**: Event loop stalls longer than this are reported
+    - **subsystems**: Comma-separated `monitor`, `alerts`, `websocket`
+      (default: all)
+    """
+    try:
+        profiler = profiling.start(
+            duration,
+            mode=mode,
+            interval=interval_ms / 1000,
+            slow_callback=slow_callback_ms / 1000,
+            subsystems=subsystems.split(",") if subsystems else None,
+        )
+        return profiler.report()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/profile/stop")
+async def stop_profiling():
+    """Stop the running profiling session early and return its profile"""
+    report = profiling.stop()
+    if report is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    return report
+
+
+@router.get("/profile")
+async def get_profile(format: str = Query("json", pattern="^(json|collapsed)$")):
+    """
+    Get the current or last profile
+
+    - **format**: `json` (stacks, counts and slow callbacks) or `collapsed`
+      (one `frame;frame;... count` line per stack, for flamegraph.pl or
+      speedscope)
+    """
+    if profiling.profiler is None:
+        raise HTTPException(status_code=404, detail="No profiling session")
+    if format == "collapsed":
+        return PlainTextResponse(profiling.profiler.collapsed())
+    return profiling.profiler.report()
@@ -0,0 +1,77 @@
+"""
+API routes for streaming data exports
+Device history, alerts, stats and activities are streamed in chunks, so
+analytics jobs can pull large ranges without the API buffering them.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.services.container import services
+from app.services.export import (
+    EXPORT_DATASETS,
+    EXPORT_FORMATS,
+    parquet_available,
+    start_export,
+)
+
+
+async def require_ready():
+    """Wait for startup to finish"""
+    await services.ready()
+
+
+router = APIRouter(
+    prefix="/api/export", tags=["export"], dependencies=[Depends(require_ready)]
+)
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: str = Path(..., pattern=f"^({'|'.join(EXPORT_DATASETS)})$"),
+    format: str = Query("ndjson", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    device_id: Optional[List[str]] = Query(None),
+):
+    """
+    Stream a dataset as a file download
+
+    - **dataset**: `history` (device snapshots), `alerts`, `stats` or
+      `activities`, oldest first
+    - **format**: `ndjson` (one JSON object per line), `csv` (with a header
+      row) or `parquet` (one row group per chunk; requires pyarrow)
+    - **since** / **until**: Time range (inclusive)
+    - **device_id**: Only these devices (repeatable; ignored for `stats`)
+    """
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(
+            status_code=501,
+            detail="Parquet export requires the pyarrow package, which is "
+            "not installed or failed to import",
+        )
+    try:
+        body = await start_export(
+            services.gateway,
+            dataset,
+            format,
+            chunk_size=settings.export_chunk_size,
+            since=since,
+            until=until,
+            device_ids=device_id,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    filename = f"{dataset}-{datetime.now():%Y%m%dT%H%M%S}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
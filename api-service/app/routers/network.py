@@ -2,54 +2,227 @@
 API Routes for network monitoring endpoints
 """
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from typing import List
+import logging
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Union
+from datetime import datetime
 import asyncio
+import json
 from app.models.network import (
     NetworkDevice,
     NetworkStats,
     NetworkActivity,
     NetworkStatusResponse,
+    DeviceBulkQuery,
     Alert,
     AlertRule,
+    AlertSeverity,
+    AlertType,
     AlertsResponse,
 )
-from app.services.network_monitor import NetworkMonitorService
-from app.services.websocket_manager import manager
+from app.conditional import etag_matches, make_etag, not_modified, set_etag
+from app.services.container import services
+from app.services.device_registry import SEARCH_FIELDS, SEARCH_MODES
+from app.services.event_hub import TOPICS
+from app.services.websocket_manager import manager, project_devices
+
+logger = logging.getLogger(__name__)
+
+
+async def record_demand():
+    """
+    Wait for startup to finish, then record the call as demand so the scan
+    cadence stays up while callers keep polling
+    """
+    await services.ready()
+    services.publisher.touch()
+
+
+router = APIRouter(
+    prefix="/api", tags=["network"], dependencies=[Depends(record_demand)]
+)
 
-router = APIRouter(prefix="/api", tags=["network"])
 
-# Initialize network monitor service
-network_monitor = NetworkMonitorService()
+def status_etag(versions: dict) -> str:
+    """ETag of the network status: everything its payload is built from"""
+    return make_etag(
+        versions["snapshot"],
+        versions["activities"],
+        versions["alerts"],
+        versions.get("stats"),
+    )
 
 
 @router.get("/network/status", response_model=NetworkStatusResponse)
-async def get_network_status():
+async def get_network_status(request: Request, response: Response):
     """
     Get complete network status including devices, stats, and activities
+
+    Supports `If-None-Match`: unchanged devices, activities, alerts and
+    stats return 304
     """
     try:
-        devices = await network_monitor.scan_network()
-        stats = await network_monitor.get_system_stats()
+        devices = await services.gateway.scan_network()
+        # Sampled before the versions are read: a new sample moves the
+        # stats version on
+        stats = await services.gateway.get_system_stats()
+        versions = await services.gateway.get_versions()
+        etag = status_etag(versions)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         stats.connected_devices = len(devices)
-        activities = await network_monitor.get_activities(limit=10)
-        chart_data = network_monitor.generate_chart_data()
+        activities = await services.gateway.get_activities(limit=10)
+        chart_data = await services.gateway.generate_chart_data()
 
+        set_etag(response, etag)
         return NetworkStatusResponse(
             stats=stats, devices=devices, activities=activities, chart_data=chart_data
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/devices", response_model=List[NetworkDevice])
-async def get_devices():
+async def get_devices(request: Request, response: Response):
     """
     Get list of all connected devices
+
+    Supports `If-None-Match`: an unchanged snapshot returns 304
     """
     try:
-        devices = await network_monitor.scan_network()
+        devices = await services.gateway.scan_network()
+        versions = await services.gateway.get_versions()
+        etag = make_etag(versions["snapshot"])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
         return devices
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/devices/search", response_model=List[NetworkDevice])
+async def search_devices(
+    q: str = Query(..., min_length=1),
+    field: Optional[str] = Query(None, pattern=f"^({'|'.join(SEARCH_FIELDS)})$"),
+    mode: str = Query("prefix", pattern=f"^({'|'.join(SEARCH_MODES)})$"),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """
+    Search current devices without scanning
+
+    - **q**: Case-insensitive text to match
+    - **field**: Only match `id`, `mac`, `ip` or `name` (default: all)
+    - **mode**: `prefix` (default) or `substring`
+    - **limit**: Maximum number of devices returned
+    """
+    try:
+        registry = await services.gateway.get_registry()
+        return registry.search(q, [field] if field else None, mode, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/devices/history")
+async def get_devices_history(
+    query: DeviceBulkQuery,
+    format: str = Query("rows", pattern="^(rows|columns)$"),
+):
+    """
+    Get the history of several devices in one request
+
+    Returns `histories` (device id -> snapshots, oldest first, the last
+    `limit` per device between `since` and `until`) and the `missing` ids
+    of unknown devices. With `format=columns` each device's history is one
+    list per field (`timestamp`, `status`, `latency`, ...), which is
+    smaller and ready for charting.
+    """
+    try:
+        result = await services.gateway.get_devices_history(
+            query.device_ids,
+            query.since,
+            query.until,
+            query.limit,
+            columns=format == "columns",
+        )
+        # Rows are plain JSON values: skip per-row response validation
+        return Response(json.dumps(result), media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/devices/activities")
+async def get_devices_activities(query: DeviceBulkQuery):
+    """
+    Get the activities of several devices in one request
+
+    Returns `activities` (device id -> entries, newest first, up to `limit`
+    per device between `since` and `until`) and the `missing` ids of
+    unknown devices
+    """
+    try:
+        return await services.gateway.get_devices_activities(
+            query.device_ids, query.since, query.until, query.limit
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/devices/availability")
+async def get_devices_availability(query: DeviceBulkQuery):
+    """
+    Get the availability of several devices in one request
+
+    Returns per device id the time monitored and online between `since`
+    (default: a day before `until`) and `until` (default: now), the uptime
+    percentage, the number of sessions and the longest outage, plus the
+    `missing` ids of unknown devices. `limit` is ignored.
+    """
+    try:
+        return await services.gateway.get_devices_availability(
+            query.device_ids, query.since, query.until
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/devices/online")
+async def get_devices_online(
+    since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    """
+    Get the ids of devices online at any time between `since` and `until`
+
+    Both default to now, which lists the devices online now
+    """
+    try:
+        return await services.gateway.get_devices_online(since, until)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -57,13 +230,15 @@ async def get_devices():
 @router.get("/devices/{device_id}", response_model=NetworkDevice)
 async def get_device(device_id: str):
     """
-    Get specific device by ID (MAC address without colons)
+    Get a current device by ID (MAC address without colons), MAC, IP or name
+
+    Served from the latest snapshot without triggering a scan
     """
     try:
-        devices = await network_monitor.scan_network()
-        for device in devices:
-            if device.id == device_id:
-                return device
+        registry = await services.gateway.get_registry()
+        device = registry.get(device_id)
+        if device is not None:
+            return device
         raise HTTPException(
             status_code=404, detail=f"Device with ID {device_id} not found"
         )
@@ -74,16 +249,22 @@ async def get_device(device_id: str):
 
 
 @router.get("/devices/{device_id}/history")
-async def get_device_history(device_id: str, limit: int = 100):
+async def get_device_history(
+    request: Request, response: Response, device_id: str, limit: int = 100
+):
     """
     Get historical data for a specific device
 
     Returns latency, packet loss, and connection quality over time
     """
     try:
-        # Convert device_id back to MAC address format (add colons)
-        mac = ":".join([device_id[i : i + 2] for i in range(0, len(device_id), 2)])
-        history = network_monitor.get_device_history(mac, limit)
+        # Version by the newest snapshot recorded for this device
+        etag = make_etag(await services.gateway.get_device_history_version(device_id))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+
+        history = await services.gateway.get_device_history(device_id, limit)
 
         # Return empty history if none exists yet (device might be new)
         return {"device_id": device_id, "history": history}
@@ -101,25 +282,10 @@ async def get_device_activities(device_id: str, limit: int = 50):
     Returns recent connection/disconnection events and alerts
     """
     try:
-        # Find device name from current devices or known devices
-        devices = await network_monitor.scan_network()
-        device_name = None
-
-        for device in devices:
-            if device.id == device_id:
-                device_name = device.name
-                break
-
-        if not device_name:
-            # Try to find from known devices
-            mac = ":".join([device_id[i : i + 2] for i in range(0, len(device_id), 2)])
-            if mac in network_monitor.known_devices:
-                device_name = network_monitor.known_devices[mac].get("name")
-
-        if not device_name:
+        # Current or previously seen devices, by device id
+        activities = await services.gateway.get_device_activities(device_id, limit)
+        if activities is None:
             raise HTTPException(status_code=404, detail=f"Device {device_id} not found")
-
-        activities = network_monitor.get_device_activities(device_name, limit)
         return activities
     except HTTPException:
         raise
@@ -127,16 +293,71 @@ async def get_device_activities(device_id: str, limit: int = 50):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/devices/{device_id}/availability")
+async def get_device_availability(
+    device_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+):
+    """
+    Get a device's uptime percentage and longest outage
+
+    - **since** / **until**: Window (default: the last 24 hours); time before
+      the device was first seen doesn't count
+    """
+    try:
+        result = await services.gateway.get_devices_availability(
+            [device_id], since, until
+        )
+        availability = result["devices"].get(device_id)
+        if availability is None:
+            raise HTTPException(status_code=404, detail=f"Device {device_id} not found")
+        return {
+            "device_id": device_id,
+            "since": result["since"],
+            "until": result["until"],
+            **availability,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/devices/{device_id}/baseline")
+async def get_device_baseline(
+    device_id: str, hour: Optional[int] = Query(None, ge=0, le=23)
+):
+    """
+    Get a device's learned latency and packet loss baseline
+
+    - **hour**: Hour of day (0-23); omit for the all-day baseline
+
+    Anomaly scores measure how far a scan is above these, in deviations
+    """
+    try:
+        baseline = await services.gateway.get_device_baseline(device_id, hour)
+        if baseline is None:
+            raise HTTPException(
+                status_code=404, detail=f"No baseline for device {device_id}"
+            )
+        return {"device_id": device_id, "hour": hour, "baseline": baseline}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/stats", response_model=NetworkStats)
 async def get_stats():
     """
     Get network statistics (speed, uptime, data usage)
     """
     try:
-        devices = await network_monitor.scan_network()
-        stats = await network_monitor.get_system_stats()
+        devices = await services.gateway.scan_network()
+        stats = await services.gateway.get_system_stats()
         stats.connected_devices = len(devices)
         return stats
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -151,8 +372,10 @@ async def get_activities(limit: int = 10):
     if limit > 50:
         limit = 50
     try:
-        activities = await network_monitor.get_activities(limit=limit)
+        activities = await services.gateway.get_activities(limit=limit)
         return activities
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -169,41 +392,103 @@ async def get_diagnostics():
     - List of known device MAC addresses
     """
     try:
-        diagnostics = network_monitor.get_diagnostics()
+        diagnostics = await services.gateway.get_diagnostics()
+        diagnostics["worker_role"] = services.gateway.role
         diagnostics["websocket_connections"] = manager.get_connection_count()
+        diagnostics["websocket_encodings"] = manager.encoding_counts()
+        diagnostics["publisher"] = services.publisher.get_stats()
+        diagnostics["events"] = manager.events.get_stats()
+        diagnostics["startup"] = services.get_stats()
+        if services.checkpointer is not None:
+            diagnostics["checkpoint"] = services.checkpointer.get_stats()
         return diagnostics
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/alerts", response_model=AlertsResponse)
-async def get_alerts():
+async def get_alerts(
+    request: Request,
+    response: Response,
+    device_id: Optional[str] = None,
+    type: Optional[AlertType] = None,
+    severity: Optional[AlertSeverity] = None,
+):
     """
-    Get all active (unacknowledged) network alerts
+    Get active (unacknowledged) network alerts
+
+    - **device_id**, **type**, **severity**: Optional filters
 
     Returns:
     - List of active alerts
     - Count of unacknowledged alerts
     """
     try:
-        alerts = network_monitor.get_alerts()
-        unack_count = network_monitor.alert_manager.get_unacknowledged_count()
+        versions = await services.gateway.get_versions()
+        etag = make_etag(versions["alerts"])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+
+        alerts = await services.gateway.get_alerts(
+            device_id=device_id,
+            alert_type=type.value if type else None,
+            severity=severity.value if severity else None,
+        )
+        unack_count = await services.gateway.get_unacknowledged_count()
         return AlertsResponse(alerts=alerts, unacknowledged_count=unack_count)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/alerts/history", response_model=List[Alert])
-async def get_alert_history(limit: int = 50):
+async def get_alert_history(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    device_id: Optional[str] = None,
+    type: Optional[AlertType] = None,
+    severity: Optional[AlertSeverity] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[int] = None,
+):
     """
-    Get alert history
+    Get alert history (oldest first within the page)
 
     - **limit**: Number of alerts to return (default: 50, max: 100)
+    - **device_id**, **type**, **severity**: Optional filters
+    - **since**, **until**: Optional time range (ISO 8601)
+    - **cursor**: Value of the `X-Next-Cursor` header from the previous
+      page, to fetch the next older page
     """
     if limit > 100:
         limit = 100
     try:
-        return network_monitor.get_alert_history(limit)
+        versions = await services.gateway.get_versions()
+        etag = make_etag(versions["alerts"])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+
+        alerts, next_cursor = await services.gateway.query_alert_history(
+            device_id=device_id,
+            alert_type=type.value if type else None,
+            severity=severity.value if severity else None,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=limit,
+        )
+        if next_cursor is not None:
+            response.headers["X-Next-Cursor"] = str(next_cursor)
+        return alerts[::-1]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -216,7 +501,7 @@ async def acknowledge_alert(alert_id: str):
     - **alert_id**: The ID of the alert to acknowledge
     """
     try:
-        success = network_monitor.acknowledge_alert(alert_id)
+        success = await services.gateway.acknowledge_alert(alert_id)
         if not success:
             raise HTTPException(status_code=404, detail=f"Alert {alert_id} not found")
         return {"status": "acknowledged", "alert_id": alert_id}
@@ -232,7 +517,9 @@ async def get_alert_rules():
     Get all configured alert rules
     """
     try:
-        return network_monitor.get_alert_rules()
+        return await services.gateway.get_alert_rules()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -250,7 +537,7 @@ async def update_alert_rule(rule_id: str, rule: AlertRule):
             raise HTTPException(
                 status_code=400, detail="Rule ID in path must match rule ID in body"
             )
-        network_monitor.update_alert_rule(rule)
+        await services.gateway.update_alert_rule(rule)
         return rule
     except HTTPException:
         raise
@@ -258,94 +545,160 @@ async def update_alert_rule(rule_id: str, rule: AlertRule):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/events")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = None,
+    last_event_id: Optional[int] = Query(None, alias="lastEventId"),
+    last_event_id_header: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-Sent Events stream of network updates
+
+    - **topics**: Comma-separated `devices`, `alerts`, `stats` (default: all)
+    - **Last-Event-ID** header (or `lastEventId`): resume after this event;
+      missed events are replayed from a bounded buffer, and a `resync`
+      event is sent first if some were lost
+
+    New subscribers first receive the latest `devices` and `stats` snapshots.
+    """
+    selected = topics.split(",") if topics else list(TOPICS)
+    unknown = set(selected) - set(TOPICS)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown topics: {', '.join(sorted(unknown))}"
+        )
+
+    services.publisher.ensure_running()
+    resume_from = (
+        last_event_id_header if last_event_id_header is not None else last_event_id
+    )
+    subscription, backlog, gap = manager.events.subscribe(selected, resume_from)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            if gap:
+                yield "event: resync\ndata: {}\n\n"
+            for _, _, frame in backlog:
+                yield frame
+            while True:
+                try:
+                    entry = await asyncio.wait_for(subscription.queue.get(), 15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if entry is None:
+                    break
+                yield entry[2]
+        finally:
+            manager.events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Message type used for each topic's snapshot when a client subscribes
+SNAPSHOT_TYPES = {"devices": "devices", "stats": "stats", "alerts": "alert_batch"}
+
+
+async def handle_client_message(websocket: WebSocket, raw: Union[str, bytes]):
+    """
+    Handle a subscription request from a WebSocket client:
+    {"action": "subscribe", "topics": [...], "fields": [...]} or
+    {"action": "unsubscribe", "topics": [...]} (no topics: all), as JSON
+    text or in the client's binary encoding
+    """
+    try:
+        request = manager.decode(websocket, raw)
+        action = request.get("action")
+        topics = request.get("topics") or []
+        if not isinstance(topics, list):
+            raise ValueError("topics must be a list")
+
+        if action == "subscribe":
+            fields = request.get("fields")
+            if fields is not None and not isinstance(fields, list):
+                raise ValueError("fields must be a list")
+            added = manager.subscribe(websocket, topics, fields)
+        elif action == "unsubscribe":
+            manager.unsubscribe(websocket, topics or None)
+            added = []
+        else:
+            raise ValueError(f"Unknown action: {action}")
+    except (ValueError, AttributeError) as e:
+        await manager.send_personal_message(
+            {"type": "error", "message": str(e) or "Invalid message"}, websocket
+        )
+        return
+
+    subscription = manager.subscriptions.get(websocket)
+    await manager.send_personal_message(
+        {
+            "type": "subscribed",
+            "topics": sorted(subscription["topics"]) if subscription else [],
+            "fields": list(subscription["fields"] or []) if subscription else None,
+        },
+        websocket,
+    )
+
+    # Bring new subscribers up to date without waiting for the next cycle
+    for topic in added:
+        snapshot = services.publisher.snapshot_for(topic)
+        if snapshot is None:
+            continue
+        message = {
+            "type": SNAPSHOT_TYPES.get(topic, "device_update"),
+            "topic": topic,
+            "timestamp": datetime.now().isoformat(),
+            **snapshot,
+        }
+        await manager.send_personal_message(
+            project_devices(message, subscription["fields"]), websocket
+        )
+
+
 @router.websocket("/ws/network")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time network updates
 
-    Sends network status updates every 5 seconds and
-    immediately on network changes
+    Sends the latest status on connect, then the shared publisher's
+    network updates (every 5 seconds), device events and alert batches.
+    Clients may instead subscribe to topics (`devices`, `alerts`, `stats`,
+    `device:<id>`) with optional device field projections, see
+    handle_client_message. Clients offering the `aetherlink.msgpack` or
+    `aetherlink.cbor` subprotocol get binary frames with interned keys.
     """
     await manager.connect(websocket)
-    last_device_state = {}
+    services.publisher.ensure_running()
 
     try:
+        if services.publisher.last_status is not None:
+            await manager.send_personal_message(
+                {
+                    "type": "network_update",
+                    "timestamp": datetime.now().isoformat(),
+                    "data": services.publisher.last_status,
+                },
+                websocket,
+            )
+
+        # Updates are pushed by the publisher; listen for subscriptions
         while True:
-            try:
-                # Get current network status
-                devices = await network_monitor.scan_network()
-                stats = await network_monitor.get_system_stats()
-                stats.connected_devices = len(devices)
-                activities = await network_monitor.get_activities(limit=10)
-                chart_data = network_monitor.generate_chart_data()
-
-                # Get active alerts
-                active_alerts = network_monitor.get_alerts()
-                unack_count = network_monitor.alert_manager.get_unacknowledged_count()
-
-                # Prepare status data
-                status_data = {
-                    "stats": {
-                        "connected_devices": stats.connected_devices,
-                        "network_speed": stats.network_speed,
-                        "data_usage": stats.data_usage,
-                        "uptime": stats.uptime,
-                    },
-                    "devices": [device.model_dump(mode="json") for device in devices],
-                    "activities": [act.model_dump(mode="json") for act in activities],
-                    "chart_data": [
-                        point.model_dump(mode="json") for point in chart_data
-                    ],
-                    "alerts": [
-                        alert.model_dump(mode="json") for alert in active_alerts
-                    ],
-                    "unacknowledged_alerts": unack_count,
-                }
-
-                # Check for device changes
-                current_device_state = {
-                    dev.mac: {"status": dev.status, "quality": dev.connection_quality}
-                    for dev in devices
-                }
-
-                # Detect new/removed/changed devices
-                for mac, state in current_device_state.items():
-                    if mac not in last_device_state:
-                        # New device
-                        device = next(d for d in devices if d.mac == mac)
-                        device_data = device.model_dump(mode="json")
-                        await manager.broadcast_device_event("connected", device_data)
-                    elif last_device_state[mac]["quality"] != state["quality"]:
-                        # Quality changed
-                        device = next(d for d in devices if d.mac == mac)
-                        device_data = device.model_dump(mode="json")
-                        await manager.broadcast_device_event(
-                            "quality_change", device_data
-                        )
-
-                # Check for disconnected devices
-                for mac in last_device_state:
-                    if mac not in current_device_state:
-                        await manager.broadcast_device_event(
-                            "disconnected", {"mac": mac}
-                        )
-
-                last_device_state = current_device_state
-
-                # Broadcast network update
-                await manager.broadcast_network_update(status_data)
-
-                # Wait 5 seconds before next update
-                await asyncio.sleep(5)
-
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                print(f"Error in WebSocket loop: {e}")
-                await asyncio.sleep(5)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            raw = message.get("text")
+            await handle_client_message(
+                websocket, raw if raw is not None else message.get("bytes")
+            )
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
         manager.disconnect(websocket)
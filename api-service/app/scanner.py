@@ -0,0 +1,146 @@
+"""
+Scanner process for multi-worker deployments
+Runs the only network monitor and publish loop, hosts the broker (unless
+BROKER_URL points at an external Redis) and answers calls from API workers:
+
+    python -m app.scanner
+    WORKER_ROLE=api uvicorn app.main:app --workers 4
+"""
+
+import asyncio
+import json
+import logging
+import signal
+from typing import Optional, Set
+
+from app.config import settings
+from app.logging_setup import setup_logging
+from app.services.broker import BrokerClient, LocalBroker
+from app.services.cadence import ScanCadence
+from app.services.checkpoint import StateCheckpointer
+from app.services.gateway import CALLS_CHANNEL, EVENTS_CHANNEL, WRITE_METHODS
+from app.services.network_monitor import create_network_monitor
+from app.services.publisher import BrokerPublisher
+
+logger = logging.getLogger(__name__)
+
+
+class AlertForwarder:
+    """Alert notifier target that forwards batches to the API workers"""
+
+    def __init__(self, client: BrokerClient):
+        self.client = client
+
+    async def broadcast_alert_batch(
+        self, alerts: list, resolved: list, resolved_devices: Optional[dict] = None
+    ):
+        message = {
+            "op": "alert_batch",
+            "alerts": alerts,
+            "resolved": resolved,
+            "resolved_devices": resolved_devices or {},
+        }
+        await self.client.publish(EVENTS_CHANNEL, json.dumps(message, default=str))
+
+
+async def serve_calls(
+    client: BrokerClient,
+    publisher: BrokerPublisher,
+    checkpointer: Optional[StateCheckpointer] = None,
+):
+    """Answer gateway calls from API workers on their reply channels"""
+    # The subscription awaits its handler before reading the next message,
+    # so each call runs as its own task and a slow one holds up no other
+    calls: Set[asyncio.Task] = set()
+
+    async def handle(channel: str, payload: bytes):
+        request = json.loads(payload)
+        if request.get("method") == "report_demand":
+            # One-way: workers with callers or clients keep the cadence up
+            publisher.cadence.report(**request["kwargs"])
+            return
+        reply = await publisher.gateway.handle_call(request)
+        if request.get("method") == "get_diagnostics" and "result" in reply:
+            reply["result"]["scanner"] = publisher.get_stats()
+            if checkpointer is not None:
+                reply["result"]["checkpoint"] = checkpointer.get_stats()
+        if request.get("method") in WRITE_METHODS and "error" not in reply:
+            await publisher.publish_versions()
+        await client.publish(request["reply"], json.dumps(reply))
+
+    async def answer(channel: str, payload: bytes):
+        try:
+            await handle(channel, payload)
+        except Exception as e:
+            logger.error("Error answering gateway call: %s", e)
+
+    async def dispatch(channel: str, payload: bytes):
+        task = asyncio.create_task(answer(channel, payload))
+        calls.add(task)
+        task.add_done_callback(calls.discard)
+
+    try:
+        await client.subscribe([CALLS_CHANNEL], dispatch)
+    finally:
+        for task in calls:
+            task.cancel()
+
+
+async def run():
+    broker = None
+    if not settings.broker_url.startswith("redis://"):
+        broker = LocalBroker(settings.broker_url)
+        await broker.start()
+
+    client = BrokerClient(settings.broker_url)
+    monitor = create_network_monitor(connection_manager=AlertForwarder(client))
+    cadence = ScanCadence(
+        active_interval=settings.publish_interval,
+        idle_interval=settings.scan_idle_interval,
+        idle_after=settings.scan_idle_after,
+    )
+    publisher = BrokerPublisher(monitor, client, cadence=cadence)
+    checkpointer = None
+    if settings.state_checkpoint_path:
+        checkpointer = StateCheckpointer(
+            monitor,
+            settings.state_checkpoint_path,
+            interval=settings.state_checkpoint_interval,
+        )
+        checkpointer.restore()
+        checkpointer.start()
+    calls = asyncio.create_task(serve_calls(client, publisher, checkpointer))
+    publisher.ensure_running()
+    logger.info("🛰️ Scanner publishing to %s", settings.broker_url)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    try:
+        await stopping.wait()
+    finally:
+        logger.info("🛑 Scanner stopping")
+        calls.cancel()
+        await publisher.stop()
+        if checkpointer is not None:
+            await checkpointer.stop()
+        monitor.governor.close()
+        await client.close()
+        if broker is not None:
+            await broker.stop()
+
+
+def main():
+    setup_logging(
+        level=settings.log_level,
+        json_output=settings.log_json,
+        rate=settings.log_rate_limit,
+        burst=settings.log_rate_burst,
+        queue_size=settings.log_queue_size,
+    )
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
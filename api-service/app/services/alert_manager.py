@@ -1,8 +1,9 @@
 """Alert management service for network monitoring."""
 
 import time
+import uuid
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from collections import deque
 
 from app.models.network import (
@@ -12,18 +13,74 @@ from app.models.network import (
     AlertSeverity,
     NetworkDevice,
 )
+from app.services.alert_store import AlertStore
+from app.services.memory_governor import estimate_size
+from app.services.rule_engine import DEFAULT_WINDOW, CompiledRule, RuleEngine
+
+RULE_TITLES = {
+    AlertType.HIGH_LATENCY: "High Latency Detected",
+    AlertType.PACKET_LOSS: "Packet Loss Detected",
+    AlertType.POOR_CONNECTION: "Poor Connection Quality",
+    AlertType.ANOMALY: "Unusual Connection Behavior",
+}
+
+RULE_SEVERITIES = {
+    AlertType.HIGH_LATENCY: AlertSeverity.WARNING,
+    AlertType.PACKET_LOSS: AlertSeverity.ERROR,
+    AlertType.POOR_CONNECTION: AlertSeverity.WARNING,
+    AlertType.ANOMALY: AlertSeverity.WARNING,
+}
+
+METRIC_UNITS = {"latency": "ms", "packet_loss": "%"}
+
+# Expired flood history and orphaned clear counts are pruned at most this
+# often (seconds)
+PRUNE_INTERVAL = 60.0
 
 
 class AlertManager:
     """Manages network alerts, rules, and notifications."""
 
-    def __init__(self, max_history: int = 100):
+    def __init__(
+        self,
+        max_history: int = 10000,
+        history_path: Optional[str] = None,
+        resolve_after: int = 2,
+        flood_limit: int = 5,
+        flood_window: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
         """Initialize alert manager with storage."""
+        # Time source for offline thresholds, rule windows and flood
+        # suppression (the replay clock when replaying a trace)
+        self.clock = clock
         self.active_alerts: Dict[str, Alert] = {}
-        self.alert_history: deque = deque(maxlen=max_history)
+        self.store = AlertStore(max_alerts=max_history, path=history_path)
         self.rules: Dict[str, AlertRule] = self._create_default_rules()
         self.device_states: Dict[str, dict] = {}
 
+        # Lifecycle: open alerts by fingerprint (including acknowledged
+        # ones that have not resolved yet) and rule alerts per device
+        self.open_alerts: Dict[str, Alert] = {}
+        self.rule_alerts: Dict[str, Set[str]] = {}
+        self.clear_counts: Dict[str, int] = {}
+        self.resolve_after = resolve_after
+
+        # Flood suppression: at most flood_limit alerts per fingerprint
+        # within flood_window seconds
+        self.flood_limit = flood_limit
+        self.flood_window = flood_window
+        self.flood_history: Dict[str, deque] = {}
+        self.suppressed_count = 0
+        self.pruned_at = 0.0
+
+        self.engine = RuleEngine()
+        self.engine.load(list(self.rules.values()))
+
+        # Bumped whenever an alert is raised, resolved or acknowledged;
+        # repeat occurrences don't count. Used for HTTP ETags.
+        self.version = 0
+
     def _create_default_rules(self) -> Dict[str, AlertRule]:
         """Create default alert rules."""
         return {
@@ -32,12 +89,25 @@ class AlertManager:
                 type=AlertType.HIGH_LATENCY,
                 enabled=True,
                 latency_threshold=200.0,
+                aggregate="p95",
+                window=300,
+                min_samples=3,
             ),
             "packet_loss": AlertRule(
                 id="packet_loss",
                 type=AlertType.PACKET_LOSS,
                 enabled=True,
                 packet_loss_threshold=10.0,
+                breaches=3,
+                samples=5,
+            ),
+            "anomaly": AlertRule(
+                id="anomaly",
+                type=AlertType.ANOMALY,
+                enabled=True,
+                threshold=4.0,
+                breaches=3,
+                samples=5,
             ),
             "device_offline": AlertRule(
                 id="device_offline",
@@ -58,12 +128,100 @@ class AlertManager:
         }
 
     def evaluate_device(self, device: NetworkDevice) -> List[Alert]:
-        """Evaluate a device against alert rules."""
-        alerts = []
+        """Evaluate a single device against alert rules."""
+        return self.evaluate_devices([device])
+
+    def evaluate_devices(self, devices: List[NetworkDevice]) -> List[Alert]:
+        """
+        Evaluate a whole scan result against alert rules in one pass.
+
+        Returns alert events: newly raised alerts and alerts that were
+        automatically resolved (``resolved=True``) during this evaluation.
+        """
+        events = []
+        now = self.clock()
+
+        for device in devices:
+            events.extend(self._evaluate_lifecycle(device, now))
+
+        matched = set()
+        for compiled, device, value in self.engine.evaluate(devices, now):
+            rule = compiled.rule
+            fingerprint = f"{rule.id}:{device.id}"
+            matched.add(fingerprint)
+            self.rule_alerts.setdefault(device.id, set()).add(fingerprint)
+            self.clear_counts.pop(fingerprint, None)
+            alert = self._create_alert(
+                alert_type=rule.type,
+                severity=rule.severity
+                or RULE_SEVERITIES.get(rule.type, AlertSeverity.WARNING),
+                title=RULE_TITLES.get(rule.type, "Alert Rule Triggered"),
+                message=self._describe_match(compiled, device, value),
+                device_id=device.id,
+                device_name=device.name,
+                fingerprint=fingerprint,
+            )
+            if alert is not None:
+                events.append(alert)
+
+        # Resolve rule alerts whose condition has cleared for long enough
+        for device in devices:
+            if device.status != "online" or device.id not in self.rule_alerts:
+                continue
+            fingerprints = self.rule_alerts[device.id]
+            for fingerprint in list(fingerprints):
+                if fingerprint in matched:
+                    continue
+                clears = self.clear_counts.get(fingerprint, 0) + 1
+                if clears < self.resolve_after:
+                    self.clear_counts[fingerprint] = clears
+                    continue
+                fingerprints.discard(fingerprint)
+                self.clear_counts.pop(fingerprint, None)
+                resolved = self._resolve(fingerprint)
+                if resolved is not None:
+                    events.append(resolved)
+            if not fingerprints:
+                del self.rule_alerts[device.id]
+
+        if now - self.pruned_at >= PRUNE_INTERVAL:
+            self._prune(now)
+        return events
+
+    def _prune(self, now: float):
+        """
+        Drop flood history whose newest alert is older than the flood window
+        (it can no longer suppress anything) and clear counts of
+        fingerprints without an open alert.
+        """
+        horizon = now - self.flood_window
+        self.flood_history = {
+            fingerprint: raised
+            for fingerprint, raised in self.flood_history.items()
+            if raised and raised[-1] >= horizon
+        }
+        self.clear_counts = {
+            fingerprint: clears
+            for fingerprint, clears in self.clear_counts.items()
+            if fingerprint in self.open_alerts
+        }
+        self.pruned_at = now
+
+    def _evaluate_lifecycle(self, device: NetworkDevice, now: float) -> List[Alert]:
+        """Handle new-device and offline-threshold rules for a device."""
         device_id = device.id
+        offline_fingerprint = f"{AlertType.DEVICE_OFFLINE.value}:{device_id}"
 
         # Track device state
         if device_id not in self.device_states:
+            if device.status != "online":
+                # Evicted by the memory governor while offline; tracked
+                # again when it reconnects
+                return []
+            self.device_states[device_id] = {
+                "last_seen": now,
+                "status": device.status,
+            }
             # New device detected
             if self.rules["new_device"].enabled:
                 alert = self._create_alert(
@@ -75,93 +233,81 @@ class AlertManager:
                     device_id=device_id,
                     device_name=device.name,
                 )
-                alerts.append(alert)
+                return [alert] if alert is not None else []
+            return []
+
+        state = self.device_states[device_id]
+        state["status"] = device.status
 
-            self.device_states[device_id] = {
-                "last_seen": time.time(),
-                "status": device.status,
-            }
-        else:
-            # Update last seen
-            self.device_states[device_id]["last_seen"] = time.time()
-
-            # Check status change
-            prev_status = self.device_states[device_id]["status"]
-            if prev_status != device.status and device.status == "offline":
-                if self.rules["device_offline"].enabled:
-                    alert = self._create_alert(
-                        alert_type=AlertType.DEVICE_OFFLINE,
-                        severity=AlertSeverity.WARNING,
-                        title="Device Went Offline",
-                        message=f"Device '{device.name}' "
-                        f"({device.ip}) is no longer responding",
-                        device_id=device_id,
-                        device_name=device.name,
-                    )
-                    alerts.append(alert)
-
-            self.device_states[device_id]["status"] = device.status
-
-        # Check connection quality for online devices
         if device.status == "online":
-            # High latency check
-            if (
-                device.latency
-                and self.rules["high_latency"].enabled
-                and device.latency
-                > self.rules["high_latency"].latency_threshold
-            ):
-                alert_id = f"latency-{device_id}"
-                if alert_id not in self.active_alerts:
-                    alert = self._create_alert(
-                        alert_type=AlertType.HIGH_LATENCY,
-                        severity=AlertSeverity.WARNING,
-                        title="High Latency Detected",
-                        message=f"Device '{device.name}' has high latency "
-                        f"({device.latency:.1f}ms)",
-                        device_id=device_id,
-                        device_name=device.name,
-                        alert_id=alert_id,
-                    )
-                    alerts.append(alert)
-
-            # Packet loss check
-            if (
-                device.packet_loss
-                and self.rules["packet_loss"].enabled
-                and device.packet_loss
-                > self.rules["packet_loss"].packet_loss_threshold
-            ):
-                alert_id = f"packetloss-{device_id}"
-                if alert_id not in self.active_alerts:
-                    alert = self._create_alert(
-                        alert_type=AlertType.PACKET_LOSS,
-                        severity=AlertSeverity.ERROR,
-                        title="Packet Loss Detected",
-                        message=f"Device '{device.name}' experiencing "
-                        f"packet loss ({device.packet_loss:.1f}%)",
-                        device_id=device_id,
-                        device_name=device.name,
-                        alert_id=alert_id,
-                    )
-                    alerts.append(alert)
-
-        return alerts
+            # Update last seen and re-arm the offline alert
+            state["last_seen"] = now
+            if state.pop("offline_alerted", False):
+                resolved = self._resolve(offline_fingerprint)
+                return [resolved] if resolved is not None else []
+            return []
+
+        if state.get("offline_alerted"):
+            return []
+
+        # Only alert once the device has been gone long enough
+        rule = self.rules["device_offline"]
+        if rule.enabled and now - state["last_seen"] >= (rule.offline_threshold or 0):
+            state["offline_alerted"] = True
+            alert = self._create_alert(
+                alert_type=AlertType.DEVICE_OFFLINE,
+                severity=AlertSeverity.WARNING,
+                title="Device Went Offline",
+                message=f"Device '{device.name}' "
+                f"({device.ip}) is no longer responding",
+                device_id=device_id,
+                device_name=device.name,
+                fingerprint=offline_fingerprint,
+            )
+            return [alert] if alert is not None else []
+        return []
+
+    @staticmethod
+    def _describe_match(
+        compiled: CompiledRule, device: NetworkDevice, value: float
+    ) -> str:
+        """Build a human readable alert message for a rule match."""
+        rule = compiled.rule
+        label = compiled.metric.replace("_", " ")
+        unit = METRIC_UNITS.get(compiled.metric, "")
+        if compiled.metric == "anomaly_score":
+            message = (
+                f"Device '{device.name}' latency or packet loss is unusually "
+                f"high for this time of day ({value:.1f} deviations)"
+            )
+        else:
+            message = f"Device '{device.name}' has high {label} ({value:.1f}{unit})"
+        if rule.aggregate != "last":
+            window = rule.window or DEFAULT_WINDOW
+            message += f", {rule.aggregate} over the last {window}s"
+        if rule.samples:
+            message += f" in {rule.breaches or rule.samples} of {rule.samples} samples"
+        if rule.condition == "sustained":
+            message += f" for over {rule.duration or 0}s"
+        elif rule.condition == "rate_of_change":
+            message = (
+                f"Device '{device.name}' {label} is changing quickly "
+                f"(now {value:.1f}{unit})"
+            )
+        return message
 
     def create_duplicate_ip_alert(
         self, ip: str, mac_addresses: List[str]
-    ) -> Alert:
+    ) -> Optional[Alert]:
         """Create alert for duplicate IP detection."""
-        alert = self._create_alert(
+        return self._create_alert(
             alert_type=AlertType.DUPLICATE_IP,
             severity=AlertSeverity.CRITICAL,
             title="Duplicate IP Detected",
             message=f"IP {ip} is being used by multiple devices: "
             f"{', '.join(mac_addresses)}",
-            alert_id=f"dupip-{ip}",
+            fingerprint=f"{AlertType.DUPLICATE_IP.value}:{ip}",
         )
-        self._add_alert(alert)
-        return alert
 
     def _create_alert(
         self,
@@ -171,53 +317,124 @@ class AlertManager:
         message: str,
         device_id: Optional[str] = None,
         device_name: Optional[str] = None,
-        alert_id: Optional[str] = None,
-    ) -> Alert:
-        """Create a new alert."""
-        if alert_id is None:
-            alert_id = f"alert-{int(time.time() * 1000)}"
+        fingerprint: Optional[str] = None,
+    ) -> Optional[Alert]:
+        """
+        Create a new alert unless it duplicates an open alert or its
+        fingerprint is being flood-suppressed. Returns None in both cases.
+        """
+        if fingerprint is None:
+            fingerprint = f"{alert_type.value}:{device_id or title}"
+
+        now = datetime.now()
+
+        # Deduplicate: fold repeats into the open alert
+        existing = self.open_alerts.get(fingerprint)
+        if existing is not None:
+            existing.occurrences += 1
+            existing.last_occurrence = now
+            return None
+
+        # Flood suppression per device and alert type
+        if not self._allow(fingerprint, self.clock()):
+            self.suppressed_count += 1
+            return None
 
         alert = Alert(
-            id=alert_id,
+            id=f"alert-{uuid.uuid4().hex[:12]}",
             type=alert_type,
             severity=severity,
             title=title,
             message=message,
             device_id=device_id,
             device_name=device_name,
-            timestamp=datetime.now(),
+            timestamp=now,
             acknowledged=False,
+            fingerprint=fingerprint,
+            last_occurrence=now,
         )
 
+        self.open_alerts[fingerprint] = alert
         self._add_alert(alert)
         return alert
 
+    def _allow(self, fingerprint: str, now: float) -> bool:
+        """Sliding-window rate limit on new alerts per fingerprint."""
+        raised = self.flood_history.get(fingerprint)
+        if raised is None:
+            raised = self.flood_history[fingerprint] = deque(maxlen=self.flood_limit)
+        if len(raised) == self.flood_limit and now - raised[0] < self.flood_window:
+            return False
+        raised.append(now)
+        return True
+
+    def _resolve(self, fingerprint: str) -> Optional[Alert]:
+        """Mark the open alert for a fingerprint as resolved."""
+        alert = self.open_alerts.pop(fingerprint, None)
+        self.clear_counts.pop(fingerprint, None)
+        raised = self.flood_history.get(fingerprint)
+        if raised and self.clock() - raised[-1] >= self.flood_window:
+            del self.flood_history[fingerprint]
+        if alert is None:
+            return None
+        alert.resolved = True
+        alert.resolved_at = datetime.now()
+        self.active_alerts.pop(alert.id, None)
+        self.store.update(alert)
+        self.version += 1
+        return alert
+
     def _add_alert(self, alert: Alert):
         """Add alert to active alerts and history."""
         self.active_alerts[alert.id] = alert
-        self.alert_history.append(alert)
+        self.store.add(alert)
+        self.version += 1
 
-    def get_active_alerts(self) -> List[Alert]:
-        """Get all active (unacknowledged) alerts."""
-        return list(self.active_alerts.values())
+    def get_active_alerts(
+        self,
+        device_id: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        severity: Optional[str] = None,
+    ) -> List[Alert]:
+        """Get active (unacknowledged) alerts, optionally filtered."""
+        return [
+            alert
+            for alert in self.active_alerts.values()
+            if (device_id is None or alert.device_id == device_id)
+            and (alert_type is None or alert.type.value == alert_type)
+            and (severity is None or alert.severity.value == severity)
+        ]
 
     def get_alert_history(self, limit: int = 50) -> List[Alert]:
-        """Get recent alert history."""
-        return list(self.alert_history)[-limit:]
+        """Get recent alert history (oldest first)."""
+        alerts, _ = self.store.query(limit=limit)
+        return alerts[::-1]
+
+    def query_alert_history(self, **filters) -> Tuple[List[Alert], Optional[int]]:
+        """Query alert history; see AlertStore.query for filters."""
+        return self.store.query(**filters)
 
     def acknowledge_alert(self, alert_id: str) -> bool:
-        """Acknowledge an alert."""
+        """
+        Acknowledge an alert. Alerts that auto-resolve stay open (but
+        silent) until their condition clears, so they are not re-raised.
+        """
         if alert_id in self.active_alerts:
             alert = self.active_alerts[alert_id]
             alert.acknowledged = True
             alert.acknowledged_at = datetime.now()
             del self.active_alerts[alert_id]
+            self.store.update(alert)
+            self.version += 1
+            if alert.type in (AlertType.NEW_DEVICE, AlertType.DUPLICATE_IP):
+                self.open_alerts.pop(alert.fingerprint, None)
             return True
         return False
 
     def update_rule(self, rule: AlertRule):
-        """Update an alert rule."""
+        """Update an alert rule and recompile it."""
         self.rules[rule.id] = rule
+        self.engine.update(rule)
 
     def get_rules(self) -> List[AlertRule]:
         """Get all alert rules."""
@@ -226,3 +443,181 @@ class AlertManager:
     def get_unacknowledged_count(self) -> int:
         """Get count of unacknowledged alerts."""
         return len(self.active_alerts)
+
+    def awaits_offline_alert(self, device_id: str) -> bool:
+        """Whether an offline device may still raise the offline alert."""
+        state = self.device_states.get(device_id)
+        return (
+            state is not None
+            and not state.get("offline_alerted")
+            and self.rules["device_offline"].enabled
+        )
+
+    def _device_fingerprints(self, device_id: str) -> List[str]:
+        """Every fingerprint the alerts of a device can have."""
+        prefixes = {alert_type.value for alert_type in AlertType}
+        prefixes.update(self.rules)
+        return [f"{prefix}:{device_id}" for prefix in prefixes]
+
+    def device_bytes(self, device_id: str) -> int:
+        """
+        Approximate size of a device's lifecycle state, rule windows,
+        rule alert fingerprints, open alert entries, flood history and
+        clear counts.
+        """
+        total = self.engine.device_bytes(device_id)
+        state = self.device_states.get(device_id)
+        if state is not None:
+            total += estimate_size(state)
+        fingerprints = self.rule_alerts.get(device_id)
+        if fingerprints is not None:
+            total += estimate_size(list(fingerprints))
+        for fingerprint in self._device_fingerprints(device_id):
+            raised = self.flood_history.get(fingerprint)
+            if raised is not None:
+                total += estimate_size(fingerprint) + estimate_size(raised)
+            if fingerprint in self.clear_counts:
+                total += estimate_size(fingerprint)
+            if fingerprint in self.open_alerts:
+                total += estimate_size(fingerprint)
+        return total
+
+    def evict_device(self, device_id: str) -> Optional[dict]:
+        """
+        Forget an offline device (for the memory governor).
+
+        Returns its lifecycle state, with the fingerprints of its rule
+        alerts and its open alerts as JSON (so they still resolve, and are
+        not raised again, once it is back); rule windows, flood history and
+        clear counts are dropped.
+        """
+        self.engine.forget(device_id)
+        open_alerts = {}
+        for fingerprint in self._device_fingerprints(device_id):
+            self.flood_history.pop(fingerprint, None)
+            self.clear_counts.pop(fingerprint, None)
+            alert = self.open_alerts.pop(fingerprint, None)
+            if alert is not None:
+                open_alerts[fingerprint] = alert.model_dump_json()
+        state = self.device_states.pop(device_id, None)
+        fingerprints = self.rule_alerts.pop(device_id, None)
+        if fingerprints:
+            state = dict(state or {}, rule_alerts=sorted(fingerprints))
+        if open_alerts:
+            state = dict(state or {}, open_alerts=open_alerts)
+        return state
+
+    def restore_device(self, device_id: str, state: Optional[dict]):
+        """
+        Put back lifecycle state of a reconnecting device.
+
+        Without saved lifecycle state the device is still known, so it must
+        not alert as new, and its open offline alert must still resolve.
+        """
+        if state is not None and "rule_alerts" in state:
+            state = dict(state)
+            fingerprints = state.pop("rule_alerts")
+            self.rule_alerts.setdefault(device_id, set()).update(fingerprints)
+            state = state or None
+        if state is not None and "open_alerts" in state:
+            state = dict(state)
+            for fingerprint, line in state.pop("open_alerts").items():
+                alert = Alert.model_validate_json(line)
+                # Share the live instance so acknowledgements still apply
+                alert = (
+                    self.active_alerts.get(alert.id)
+                    or self.store.get(alert.id)
+                    or alert
+                )
+                if not alert.resolved:
+                    self.open_alerts.setdefault(fingerprint, alert)
+            state = state or None
+        if device_id in self.device_states:
+            return
+        if state is None:
+            offline_fingerprint = f"{AlertType.DEVICE_OFFLINE.value}:{device_id}"
+            state = {"last_seen": self.clock(), "status": "offline"}
+            if offline_fingerprint in self.open_alerts:
+                state["offline_alerted"] = True
+        self.device_states[device_id] = state
+
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Lifecycle state for warm-start checkpoints.
+
+        Alerts are kept as JSON strings (serialized and parsed by pydantic's
+        native JSON codec); history is included only when the store has no
+        file of its own.
+        """
+        alerts = {alert.id: alert for alert in self.open_alerts.values()}
+        alerts.update(self.active_alerts)
+        history = []
+        if not self.store.path:
+            history = [
+                self.store.records[seq].model_dump_json()
+                for seq in reversed(list(self.store.all.iter_before(None)))
+            ]
+        return {
+            "version": self.version,
+            "suppressed": self.suppressed_count,
+            "rules": [rule.model_dump(mode="json") for rule in self.rules.values()],
+            "device_states": self.device_states,
+            "alerts": [alert.model_dump_json() for alert in alerts.values()],
+            "active": list(self.active_alerts),
+            "open": {fp: alert.id for fp, alert in self.open_alerts.items()},
+            "rule_alerts": {
+                device_id: sorted(fps) for device_id, fps in self.rule_alerts.items()
+            },
+            "clear_counts": self.clear_counts,
+            "flood_history": {
+                fp: list(raised) for fp, raised in self.flood_history.items()
+            },
+            "history": history,
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """Restore state saved by export_state."""
+        for data in state["rules"]:
+            rule = AlertRule.model_validate(data)
+            self.rules[rule.id] = rule
+        self.engine.load(list(self.rules.values()))
+
+        for line in state["history"]:
+            self.store.add(Alert.model_validate_json(line))
+
+        alerts = {}
+        for line in state["alerts"]:
+            alert = Alert.model_validate_json(line)
+            # Share the stored instance so acknowledgements update history
+            alerts[alert.id] = self.store.get(alert.id) or alert
+        self.active_alerts = {
+            alert_id: alerts[alert_id]
+            for alert_id in state["active"]
+            if alert_id in alerts
+        }
+        self.open_alerts = {
+            fp: alerts[alert_id]
+            for fp, alert_id in state["open"].items()
+            if alert_id in alerts
+        }
+
+        self.device_states = state["device_states"]
+        self.rule_alerts = {
+            device_id: set(fps) for device_id, fps in state["rule_alerts"].items()
+        }
+        self.clear_counts = state["clear_counts"]
+        self.flood_history = {
+            fp: deque(raised, maxlen=self.flood_limit)
+            for fp, raised in state["flood_history"].items()
+        }
+        self.suppressed_count = state["suppressed"]
+        self.version = state["version"]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get alert pipeline counters for diagnostics."""
+        return {
+            "active": len(self.active_alerts),
+            "open": len(self.open_alerts),
+            "suppressed": self.suppressed_count,
+            "history": len(self.store),
+        }
@@ -0,0 +1,77 @@
+"""
+Batched alert notification delivery
+Collects alert events during a short window and sends them to WebSocket
+clients as a single frame instead of one broadcast task per alert
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.network import Alert
+from app.services.websocket_manager import ConnectionManager
+
+
+class AlertNotifier:
+    """
+    Buffers raised and resolved alerts and flushes them every
+    `flush_interval` seconds, at most `max_batch` alerts per frame
+    """
+
+    def __init__(
+        self,
+        connection_manager: ConnectionManager,
+        flush_interval: float = 1.0,
+        max_batch: int = 100,
+    ):
+        self.connection_manager = connection_manager
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.pending: List[Dict[str, Any]] = []
+        # (alert id, device id) so device topics hear about their resolutions
+        self.resolved: List[Tuple[str, Optional[str]]] = []
+        self.flush_task: Optional[asyncio.Task] = None
+        self.frames_sent = 0
+
+    def notify(self, alerts: List[Alert]):
+        """Queue alert events and schedule a flush if none is pending"""
+        for alert in alerts:
+            if alert.resolved:
+                self.resolved.append((alert.id, alert.device_id))
+            else:
+                self.pending.append(alert.model_dump(mode="json"))
+
+        if not (self.pending or self.resolved):
+            return
+        if self.flush_task is None or self.flush_task.done():
+            try:
+                self.flush_task = asyncio.get_running_loop().create_task(
+                    self._flush_later()
+                )
+            except RuntimeError:
+                # No running event loop (e.g. synchronous callers)
+                self.flush_task = None
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """Send everything queued so far, splitting into max_batch frames"""
+        while self.pending or self.resolved:
+            alerts = self.pending[: self.max_batch]
+            del self.pending[: self.max_batch]
+            resolved = self.resolved[: self.max_batch]
+            del self.resolved[: self.max_batch]
+            await self.connection_manager.broadcast_alert_batch(
+                alerts,
+                [alert_id for alert_id, _ in resolved],
+                {alert_id: device for alert_id, device in resolved if device},
+            )
+            self.frames_sent += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get notifier counters for diagnostics"""
+        return {
+            "pending": len(self.pending) + len(self.resolved),
+            "frames_sent": self.frames_sent,
+        }
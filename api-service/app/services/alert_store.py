@@ -0,0 +1,267 @@
+"""
+Indexed, bounded alert store
+Keeps alert history in insertion (time) order with secondary indexes by
+device, type and severity, cursor pagination and optional persistence
+to an append-only JSON lines file
+"""
+
+import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.models.network import Alert
+
+logger = logging.getLogger(__name__)
+
+
+class _SeqIndex:
+    """
+    Sorted list of sequence numbers with O(1) removal from the front
+    (the oldest entry is always evicted first). The global index also
+    keeps a parallel list of timestamps for time-range bisection.
+    """
+
+    __slots__ = ("seqs", "times", "start")
+
+    def __init__(self, timed: bool = False):
+        self.seqs: List[int] = []
+        self.times: Optional[List[float]] = [] if timed else None
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.start
+
+    def append(self, seq: int, timestamp: float = 0.0):
+        self.seqs.append(seq)
+        if self.times is not None:
+            self.times.append(timestamp)
+
+    def popleft(self):
+        self.start += 1
+        # Compact once the dead prefix dominates the list
+        if self.start > 64 and self.start * 2 > len(self.seqs):
+            del self.seqs[: self.start]
+            if self.times is not None:
+                del self.times[: self.start]
+            self.start = 0
+
+    def first(self) -> Optional[int]:
+        return self.seqs[self.start] if len(self) else None
+
+    def seq_after_time(self, timestamp: float) -> Optional[int]:
+        """First sequence number whose timestamp is later than `timestamp`"""
+        position = bisect_right(self.times, timestamp, self.start)
+        return self.seqs[position] if position < len(self.seqs) else None
+
+    def seq_at_time(self, timestamp: float) -> Optional[int]:
+        """First sequence number whose timestamp is not earlier than `timestamp`"""
+        position = bisect_left(self.times, timestamp, self.start)
+        return self.seqs[position] if position < len(self.seqs) else None
+
+    def iter_before(self, before: Optional[int]) -> Iterator[int]:
+        """Yield sequence numbers lower than `before`, newest first"""
+        stop = len(self.seqs)
+        if before is not None:
+            stop = bisect_left(self.seqs, before, self.start)
+        for position in range(stop - 1, self.start - 1, -1):
+            yield self.seqs[position]
+
+
+class AlertStore:
+    """
+    Bounded alert history with indexed queries
+
+    Memory is capped at `max_alerts`; the oldest alerts are evicted first.
+    Queries walk the most selective index newest-first and stop as soon as
+    `limit` matches are found or the `since` boundary is crossed.
+    """
+
+    def __init__(self, max_alerts: int = 10000, path: Optional[str] = None):
+        self.max_alerts = max_alerts
+        self.path = path
+        self.next_seq = 1
+        self.records: Dict[int, Alert] = {}
+        self.seq_by_id: Dict[str, int] = {}
+        self.all = _SeqIndex(timed=True)
+        self.by_device: Dict[str, _SeqIndex] = {}
+        self.by_type: Dict[str, _SeqIndex] = {}
+        self.by_severity: Dict[str, _SeqIndex] = {}
+        self.lines_written = 0
+
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, alert: Alert):
+        """Append a new alert (and persist it when a path is configured)"""
+        self._insert(alert)
+        self._persist(alert)
+
+    def update(self, alert: Alert):
+        """Persist a change to a stored alert (acknowledged, resolved)"""
+        if alert.id in self.seq_by_id:
+            self._persist(alert)
+
+    def get(self, alert_id: str) -> Optional[Alert]:
+        seq = self.seq_by_id.get(alert_id)
+        return self.records.get(seq) if seq is not None else None
+
+    def _insert(self, alert: Alert):
+        seq = self.next_seq
+        self.next_seq += 1
+        self.records[seq] = alert
+        self.seq_by_id[alert.id] = seq
+        self.all.append(seq, alert.timestamp.timestamp())
+        for index, key in self._keys(alert):
+            entry = index.get(key)
+            if entry is None:
+                entry = index[key] = _SeqIndex()
+            entry.append(seq)
+
+        while len(self.records) > self.max_alerts:
+            self._evict_oldest()
+
+    def _keys(self, alert: Alert) -> List[Tuple[Dict[str, _SeqIndex], str]]:
+        keys = [
+            (self.by_type, alert.type.value),
+            (self.by_severity, alert.severity.value),
+        ]
+        if alert.device_id:
+            keys.append((self.by_device, alert.device_id))
+        return keys
+
+    def _evict_oldest(self):
+        seq = self.all.first()
+        alert = self.records.pop(seq)
+        self.seq_by_id.pop(alert.id, None)
+        self.all.popleft()
+        for index, key in self._keys(alert):
+            entry = index[key]
+            entry.popleft()
+            if not len(entry):
+                del index[key]
+
+    def query(
+        self,
+        device_id: Optional[str] = None,
+        alert_type: Optional[str] = None,
+        severity: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[int] = None,
+        limit: int = 50,
+    ) -> Tuple[List[Alert], Optional[int]]:
+        """
+        Return up to `limit` matching alerts, newest first, plus the cursor
+        for the next (older) page or None when there are no more results
+        """
+        candidates = [self.all]
+        for index, key in (
+            (self.by_device, device_id),
+            (self.by_type, alert_type),
+            (self.by_severity, severity),
+        ):
+            if key is not None:
+                candidates.append(index.get(key, _SeqIndex()))
+        driver = min(candidates, key=len)
+
+        before = cursor
+        if until is not None:
+            # Translate the time bound into a sequence bound
+            bound = self.all.seq_after_time(until.timestamp()) or self.next_seq
+            before = bound if before is None else min(before, bound)
+
+        since_ts = since.timestamp() if since is not None else None
+        results: List[Alert] = []
+        for seq in driver.iter_before(before):
+            alert = self.records[seq]
+            if since_ts is not None and alert.timestamp.timestamp() < since_ts:
+                break
+            if device_id is not None and alert.device_id != device_id:
+                continue
+            if alert_type is not None and alert.type.value != alert_type:
+                continue
+            if severity is not None and alert.severity.value != severity:
+                continue
+            if len(results) == limit:
+                return results, self.seq_by_id[results[-1].id]
+            results.append(alert)
+
+        return results, None
+
+    def query_range(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        after: Optional[int] = None,
+        limit: int = 1000,
+    ) -> Tuple[List[Alert], Optional[int]]:
+        """
+        Return up to `limit` alerts between `since` and `until`, oldest
+        first, stored after the `after` cursor, plus the cursor for the
+        next page or None at the end
+        """
+        # Sequence numbers are contiguous and only the oldest are evicted,
+        # so the range is a span of numbers, whatever is added meanwhile
+        start = self.all.first() or self.next_seq
+        if after is not None:
+            start = max(start, after + 1)
+        if since is not None:
+            start = max(start, self.all.seq_at_time(since.timestamp()) or self.next_seq)
+        stop = self.next_seq
+        if until is not None:
+            stop = self.all.seq_after_time(until.timestamp()) or stop
+        end = min(stop, start + limit)
+        alerts = [self.records[seq] for seq in range(start, end)]
+        return alerts, (end - 1 if end < stop else None)
+
+    def _persist(self, alert: Alert):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "a") as handle:
+                handle.write(alert.model_dump_json() + "\n")
+            self.lines_written += 1
+            if self.lines_written > self.max_alerts * 2:
+                self._compact()
+        except OSError as e:
+            logger.warning("⚠️ Could not persist alert %s: %s", alert.id, e)
+
+    def _compact(self):
+        """Rewrite the log with one line per retained alert"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as handle:
+            for seq in reversed(list(self.all.iter_before(None))):
+                handle.write(self.records[seq].model_dump_json() + "\n")
+        os.replace(temp_path, self.path)
+        self.lines_written = len(self.records)
+
+    def _load(self):
+        """Replay the persisted log; later lines update earlier ones"""
+        if not os.path.exists(self.path):
+            return
+        latest: Dict[str, Alert] = {}
+        try:
+            with open(self.path) as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        alert = Alert.model_validate(json.loads(line))
+                    except ValueError:
+                        continue
+                    latest[alert.id] = alert
+                    self.lines_written += 1
+        except OSError as e:
+            logger.warning("⚠️ Could not load alert history: %s", e)
+            return
+
+        for alert in sorted(latest.values(), key=lambda a: a.timestamp):
+            self._insert(alert)
+        logger.info("📂 Loaded %s alerts from %s", len(self.records), self.path)
@@ -0,0 +1,233 @@
+"""
+Per-device connection baselines and anomaly scores
+Latency and packet loss are learned per device and hour of day (devices
+behave differently at night than at peak hours) as exponentially weighted
+means and variances in NumPy arrays with one row per device. Each scan is
+scored and learned for all devices at once: a device's anomaly score is
+how many deviations its latency or loss is above its usual value for the
+current hour.
+"""
+
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.network import NetworkDevice
+
+HOURS = 24
+# The last slot holds the all-day baseline, used for hours that don't
+# have enough samples yet
+ALL_DAY = HOURS
+SLOTS = HOURS + 1
+
+# Statistics kept per device, slot and metric
+STATISTICS = ("count", "mean", "variance")
+METRICS = ("latency", "packet_loss")
+
+# Learning clips samples to this many deviations above the baseline, so an
+# incident shifts the baseline only slowly
+LEARN_CLIP = 3.0
+
+
+class DeviceBaselines:
+    """
+    Hour-of-day latency and packet loss baselines for every device
+
+    `half_life` is the number of samples after which a sample's weight in a
+    baseline halves; until then baselines are plain averages. Deviations are
+    measured in standard deviations, but never smaller than `floors`
+    (absolute, per metric) or `relative_floor` times the mean, so perfectly
+    steady devices don't alert on tiny changes. Scores are None until a
+    device has `min_samples` samples.
+    """
+
+    def __init__(
+        self,
+        half_life: float = 50.0,
+        min_samples: int = 10,
+        floors=(1.0, 1.0),
+        relative_floor: float = 0.1,
+        capacity: int = 256,
+    ):
+        self.alpha = 1.0 - 0.5 ** (1.0 / half_life)
+        self.min_samples = min_samples
+        self.floors = np.array(floors, dtype=float)
+        self.relative_floor = relative_floor
+        self.rows: Dict[str, int] = {}
+        # Row owners; None for rows freed by evict and not reused yet
+        self.macs: List[Optional[str]] = []
+        self.free_rows: List[int] = []
+        # (statistic, device row, slot, metric); a scan gathers its cells
+        # into contiguous per-statistic arrays with one take, since NumPy is
+        # many times slower on strided views
+        self.state = np.zeros((len(STATISTICS), capacity, SLOTS, len(METRICS)))
+        # Cells read by the last scan, reused while its devices and hour
+        # don't change
+        self._scan_key = None
+        self._scan_cells = np.zeros(0, dtype=np.intp)
+        self.scans = 0
+        self.last_seconds: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _row(self, mac: str) -> int:
+        row = self.rows.get(mac)
+        if row is None:
+            if self.free_rows:
+                row = self.rows[mac] = self.free_rows.pop()
+                self.macs[row] = mac
+                return row
+            row = self.rows[mac] = len(self.macs)
+            self.macs.append(mac)
+            if row == self.state.shape[1]:
+                self.state = np.concatenate(
+                    [self.state, np.zeros_like(self.state)], axis=1
+                )
+        return row
+
+    def device_bytes(self, mac: str) -> int:
+        """Size of a device's row, 0 without one"""
+        if mac not in self.rows:
+            return 0
+        return self.state.nbytes // self.state.shape[1]
+
+    def evict(self, mac: str) -> Optional[bytes]:
+        """Free a device's row; its baselines as raw bytes, None without one"""
+        row = self.rows.pop(mac, None)
+        if row is None:
+            return None
+        data = self.state[:, row].tobytes()
+        self.state[:, row] = 0.0
+        self.macs[row] = None
+        self.free_rows.append(row)
+        self._scan_key = None
+        return data
+
+    def restore_device(self, mac: str, data: Optional[bytes]):
+        """Put back baselines returned by evict (unless relearning already)"""
+        if data is None or mac in self.rows:
+            return
+        row = self._row(mac)
+        self.state[:, row] = np.frombuffer(data, dtype=float).reshape(
+            self.state[:, row].shape
+        )
+        self._scan_key = None
+
+    def _cells_for(self, devices: List[NetworkDevice], hour: int) -> np.ndarray:
+        """Flat indices of each device's hour and all-day cells per metric"""
+        key = (hour, [device.mac for device in devices])
+        if key != self._scan_key:
+            rows = np.array([self._row(mac) for mac in key[1]], dtype=np.intp)
+            slots = rows[:, None] * SLOTS + [hour, ALL_DAY]
+            cells = slots[:, :, None] * len(METRICS) + np.arange(len(METRICS))
+            self._scan_cells = cells.ravel()
+            self._scan_key = key
+        return self._scan_cells
+
+    def observe(self, devices: List[NetworkDevice], timestamp: float):
+        """
+        Score the devices' measurements against their baselines for the
+        hour of `timestamp` (setting `anomaly_score` on each), then learn
+        them
+        """
+        if not devices:
+            return
+        start = time.perf_counter()
+        cells = self._cells_for(devices, datetime.fromtimestamp(timestamp).hour)
+        flat = self.state.reshape(len(STATISTICS), -1)
+        # (statistic, device, hour/all-day slot, metric)
+        block = flat.take(cells, axis=1).reshape(
+            len(STATISTICS), len(devices), 2, len(METRICS)
+        )
+        counts, means, variances = block
+        # (device, metric); missing measurements are NaN
+        values = np.column_stack(
+            (
+                np.array([device.latency for device in devices], dtype=float),
+                np.array([device.packet_loss for device in devices], dtype=float),
+            )
+        )
+        valid = ~np.isnan(values)
+
+        # Score against the hour's baseline, or the all-day one while the
+        # hour is still learning
+        use_hour = counts[:, 0] >= self.min_samples
+        ready = use_hour | (counts[:, 1] >= self.min_samples)
+        mean = np.where(use_hour, means[:, 0], means[:, 1])
+        scale = np.maximum(
+            np.sqrt(np.where(use_hour, variances[:, 0], variances[:, 1])),
+            np.maximum(self.floors, self.relative_floor * np.abs(mean)),
+        )
+        scored = ready & valid
+        deviations = np.where(scored, (values - mean) / scale, np.nan)
+        # Only degradations count: lower latency or loss is never anomalous
+        scores = np.fmax(deviations[:, 0], deviations[:, 1])
+        scores = np.round(np.maximum(scores, 0.0), 2)
+
+        # Learn both slots; skipped measurements leave them unchanged
+        learned = np.where(
+            scored, np.minimum(values, mean + LEARN_CLIP * scale), values
+        )
+        valid = valid[:, None]
+        counts += valid
+        alpha = np.maximum(1.0 / np.maximum(counts, 1.0), self.alpha)
+        delta = np.where(valid, learned[:, None] - means, 0.0)
+        means += alpha * delta
+        variances += alpha * delta**2
+        variances *= np.where(valid, 1.0 - alpha, 1.0)
+        flat[:, cells] = block.reshape(len(STATISTICS), -1)
+
+        # Pydantic's validating __setattr__ would cost more than all of the
+        # scoring at a thousand devices, and a float needs no validation
+        for device, score in zip(devices, scores.tolist()):
+            # NaN (no baseline or measurement) becomes None
+            device.__dict__["anomaly_score"] = score if score == score else None
+        self.scans += 1
+        self.last_seconds = time.perf_counter() - start
+
+    def get_baseline(self, mac: str, hour: Optional[int] = None) -> Optional[Dict]:
+        """A device's baseline per metric for an hour (default: all day)"""
+        row = self.rows.get(mac)
+        if row is None:
+            return None
+        counts, means, variances = self.state[:, row, ALL_DAY if hour is None else hour]
+        return {
+            name: {
+                "samples": int(counts[index]),
+                "mean": round(float(means[index]), 3),
+                "stddev": round(float(np.sqrt(variances[index])), 3),
+            }
+            for index, name in enumerate(METRICS)
+        }
+
+    def export_state(self) -> Dict[str, Any]:
+        """Baselines as plain built-in types (the array as raw bytes)"""
+        return {
+            "macs": list(self.macs),
+            "state": self.state[:, : len(self.macs)].tobytes(),
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        macs = state["macs"]
+        statistics, capacity, slots, metrics = self.state.shape
+        restored = np.frombuffer(state["state"], dtype=float).reshape(
+            (statistics, len(macs), slots, metrics)
+        )
+        capacity = max(capacity, len(macs))
+        self.state = np.zeros((statistics, capacity, slots, metrics))
+        self.state[:, : len(macs)] = restored
+        self.macs = list(macs)
+        self.rows = {mac: row for row, mac in enumerate(self.macs) if mac is not None}
+        self.free_rows = [row for row, mac in enumerate(self.macs) if mac is None]
+        self._scan_key = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "devices": len(self.rows),
+            "scans": self.scans,
+            "last_seconds": self.last_seconds,
+            "bytes": self.state.nbytes,
+        }
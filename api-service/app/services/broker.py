@@ -0,0 +1,336 @@
+"""
+Local message broker for multi-worker deployments
+A small server speaking a subset of the Redis protocol (RESP): PING, GET,
+SET, PUBLISH, SUBSCRIBE and UNSUBSCRIBE over a Unix socket (or TCP). The
+scanner process hosts it and API workers connect to it; the same client
+also works against a real Redis or Valkey server via a redis:// URL.
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Subscribers whose socket buffer grows past this are disconnected
+MAX_SUBSCRIBER_BUFFER = 8 * 1024 * 1024
+
+
+class BrokerError(Exception):
+    """Error reply from the broker"""
+
+
+def encode_command(*args) -> bytes:
+    """Encode a command as a RESP array of bulk strings"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def encode_reply(value) -> bytes:
+    """Encode a reply: None, int, bytes, list, or BrokerError"""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, BrokerError):
+        return b"-ERR %s\r\n" % str(value).encode()
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode_reply(v) for v in value)
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Read one RESP value; error replies are returned as BrokerError"""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Broker connection closed")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode()
+    if prefix == b"-":
+        return BrokerError(body.decode())
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise ConnectionError(f"Invalid RESP data: {line[:32]!r}")
+
+
+def parse_url(url: str) -> Tuple[str, Dict]:
+    """
+    Connection arguments for a broker URL: unix:///path/to.sock,
+    redis://host:port/db or tcp://host:port
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return "unix", {"path": parsed.path}
+    if parsed.scheme in ("redis", "tcp"):
+        db = parsed.path.strip("/")
+        return "tcp", {
+            "host": parsed.hostname or "127.0.0.1",
+            "port": parsed.port or 6379,
+            "db": int(db) if db else 0,
+            "password": parsed.password,
+        }
+    raise ValueError(f"Unsupported broker URL: {url}")
+
+
+class LocalBroker:
+    """
+    In-process broker server. Values and channel subscriptions live in
+    memory; PUBLISH writes to each subscriber's socket without waiting, so
+    one slow worker cannot hold back the others.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.kind, self.address = parse_url(url)
+        self.values: Dict[bytes, bytes] = {}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = defaultdict(set)
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self.published = 0
+
+    async def start(self):
+        if self.kind == "unix":
+            path = self.address["path"]
+            if os.path.exists(path):
+                # Stale socket from a previous run
+                os.unlink(path)
+            self.server = await asyncio.start_unix_server(self._handle, path=path)
+            os.chmod(path, 0o600)
+        else:
+            self.server = await asyncio.start_server(
+                self._handle, self.address["host"], self.address["port"]
+            )
+        logger.info("📮 Broker listening on %s", self.url)
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        # Close client connections so their handlers finish before the loop
+        for writer in self.connections.values():
+            writer.close()
+        if self.connections:
+            await asyncio.wait(list(self.connections), timeout=1.0)
+        if self.kind == "unix" and os.path.exists(self.address["path"]):
+            os.unlink(self.address["path"])
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed: Set[bytes] = set()
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    args = await read_reply(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                if not isinstance(args, list) or not args:
+                    writer.write(encode_reply(BrokerError("expected a command")))
+                    continue
+                command = args[0].upper()
+                if command in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    for channel in args[1:] or list(subscribed):
+                        if command == b"SUBSCRIBE":
+                            subscribed.add(channel)
+                            self.channels[channel].add(writer)
+                        else:
+                            subscribed.discard(channel)
+                            self._remove_subscriber(channel, writer)
+                        writer.write(
+                            encode_reply([command.lower(), channel, len(subscribed)])
+                        )
+                else:
+                    writer.write(encode_reply(self.execute(command, args[1:])))
+                await writer.drain()
+        finally:
+            del self.connections[task]
+            for channel in subscribed:
+                self._remove_subscriber(channel, writer)
+            writer.close()
+
+    def _remove_subscriber(self, channel: bytes, writer: asyncio.StreamWriter):
+        subscribers = self.channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(writer)
+            if not subscribers:
+                del self.channels[channel]
+
+    def execute(self, command: bytes, args: List[bytes]):
+        """Run a non-subscription command and return its reply"""
+        if command == b"PING":
+            return args[0] if args else "PONG"
+        if command == b"GET" and len(args) == 1:
+            return self.values.get(args[0])
+        if command == b"SET" and len(args) == 2:
+            self.values[args[0]] = args[1]
+            return "OK"
+        if command == b"PUBLISH" and len(args) == 2:
+            return self.publish(args[0], args[1])
+        if command == b"SELECT":
+            return "OK"
+        return BrokerError(f"unknown command or wrong arguments '{command.decode()}'")
+
+    def publish(self, channel: bytes, payload: bytes) -> int:
+        frame = encode_reply([b"message", channel, payload])
+        receivers = 0
+        for writer in list(self.channels.get(channel, ())):
+            if writer.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BUFFER:
+                logger.warning(
+                    "⚠️ Dropping slow broker subscriber",
+                    extra={"key": "broker_slow_subscriber"},
+                )
+                writer.close()
+                self._remove_subscriber(channel, writer)
+                continue
+            writer.write(frame)
+            receivers += 1
+        self.published += 1
+        return receivers
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "clients": len(self.connections),
+            "channels": len(self.channels),
+            "keys": len(self.values),
+            "published": self.published,
+        }
+
+
+class BrokerClient:
+    """
+    Client for LocalBroker or Redis. Commands share one connection; each
+    subscription gets its own connection, reconnecting with backoff.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.kind, self.address = parse_url(url)
+        self.timeout = timeout
+        self.lock = asyncio.Lock()
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def open_connection(
+        self,
+    ) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self.kind == "unix":
+            connect = asyncio.open_unix_connection(self.address["path"])
+        else:
+            connect = asyncio.open_connection(
+                self.address["host"], self.address["port"]
+            )
+        reader, writer = await asyncio.wait_for(connect, self.timeout)
+        if self.kind == "tcp":
+            if self.address["password"]:
+                await self._setup(reader, writer, "AUTH", self.address["password"])
+            if self.address["db"]:
+                await self._setup(reader, writer, "SELECT", self.address["db"])
+        return reader, writer
+
+    async def _setup(self, reader, writer, *args):
+        writer.write(encode_command(*args))
+        reply = await read_reply(reader)
+        if isinstance(reply, BrokerError):
+            writer.close()
+            raise reply
+
+    async def execute(self, *args):
+        """Send a command and return its reply, raising BrokerError"""
+        async with self.lock:
+            try:
+                if self.writer is None:
+                    self.reader, self.writer = await self.open_connection()
+                self.writer.write(encode_command(*args))
+                reply = await asyncio.wait_for(read_reply(self.reader), self.timeout)
+            except (OSError, ConnectionError, asyncio.TimeoutError):
+                self._reset()
+                raise
+        if isinstance(reply, BrokerError):
+            raise reply
+        return reply
+
+    def _reset(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value) -> None:
+        await self.execute("SET", key, value)
+
+    async def publish(self, channel: str, payload) -> int:
+        return await self.execute("PUBLISH", channel, payload)
+
+    async def subscribe(
+        self,
+        channels: List[str],
+        handler: Callable[[str, bytes], Awaitable[None]],
+        on_connect: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        """
+        Deliver messages on `channels` to `handler` until cancelled.
+        `on_connect` runs after every (re)subscribe, to catch up on state
+        missed while disconnected.
+        """
+        backoff = 0.5
+        while True:
+            writer = None
+            try:
+                reader, writer = await self.open_connection()
+                writer.write(encode_command("SUBSCRIBE", *channels))
+                for _ in channels:
+                    await read_reply(reader)
+                backoff = 0.5
+                if on_connect is not None:
+                    await on_connect()
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and reply[0] == b"message":
+                        try:
+                            await handler(reply[1].decode(), reply[2])
+                        except Exception as e:
+                            logger.error("Error handling broker message: %s", e)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+                logger.warning(
+                    "⚠️ Broker subscription lost (%s), retrying in %.1fs",
+                    e,
+                    backoff,
+                    extra={"key": "broker_reconnect"},
+                )
+            finally:
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+
+    async def close(self):
+        async with self.lock:
+            self._reset()
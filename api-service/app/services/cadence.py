@@ -0,0 +1,105 @@
+"""
+Demand-driven scan cadence
+The publish loop scans every `active_interval` seconds while someone is
+watching (WebSocket/SSE clients, or API calls in the last `idle_after`
+seconds) and drops to a slow maintenance cadence otherwise. New demand
+while idle wakes the loop right away.
+"""
+
+import asyncio
+import math
+import time
+from typing import Callable, Dict, Tuple
+
+
+class ScanCadence:
+    """Chooses when the publish loop runs its next cycle"""
+
+    def __init__(
+        self,
+        active_interval: float = 5.0,
+        idle_interval: float = 60.0,
+        idle_after: float = 30.0,
+        watchers: Callable[[], int] = lambda: 0,
+    ):
+        self.active_interval = active_interval
+        self.idle_interval = max(idle_interval, active_interval)
+        self.idle_after = idle_after
+        self.watchers = watchers
+        self.last_demand = float("-inf")
+        self.last_cycle = float("-inf")
+        # Watcher counts reported by API workers: worker -> (count, time)
+        self.remote: Dict[str, Tuple[int, float]] = {}
+        self.wake_event = asyncio.Event()
+        self.wakeups = 0
+        self.cycles = {"active": 0, "idle": 0}
+
+    def watcher_count(self) -> int:
+        now = time.monotonic()
+        remote = sum(
+            count
+            for count, reported in self.remote.values()
+            if now - reported < self.idle_after
+        )
+        return self.watchers() + remote
+
+    @property
+    def mode(self) -> str:
+        if (
+            self.watcher_count()
+            or time.monotonic() - self.last_demand < self.idle_after
+        ):
+            return "active"
+        return "idle"
+
+    @property
+    def interval(self) -> float:
+        return self.active_interval if self.mode == "active" else self.idle_interval
+
+    def touch(self):
+        """Record demand (an API call or a new streaming client)"""
+        idle = self.mode == "idle"
+        self.last_demand = time.monotonic()
+        if idle:
+            # Re-evaluate now instead of finishing the idle sleep
+            self.wakeups += 1
+            self.wake_event.set()
+
+    def report(self, worker: str, watchers: int):
+        """Demand reported by an API worker in a multi-worker deployment"""
+        self.remote[worker] = (watchers, time.monotonic())
+        self.touch()
+
+    async def wait(self):
+        """Sleep until the next cycle is due at the current demand level"""
+        while True:
+            remaining = self.interval - (time.monotonic() - self.last_cycle)
+            if remaining <= 0:
+                break
+            self.wake_event.clear()
+            try:
+                await asyncio.wait_for(self.wake_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        self.cycles[self.mode] += 1
+        self.last_cycle = time.monotonic()
+
+    def get_stats(self) -> Dict:
+        now = time.monotonic()
+        self.remote = {
+            worker: entry
+            for worker, entry in self.remote.items()
+            if now - entry[1] < self.idle_after
+        }
+        return {
+            "mode": self.mode,
+            "interval": self.interval,
+            "watchers": self.watcher_count(),
+            "seconds_since_demand": (
+                round(now - self.last_demand, 1)
+                if math.isfinite(self.last_demand)
+                else None
+            ),
+            "wakeups": self.wakeups,
+            "cycles": dict(self.cycles),
+        }
@@ -0,0 +1,173 @@
+"""
+Warm-start checkpoints of monitor state
+Known devices, presence, histories, activities and alert lifecycle state
+are periodically written to a gzipped file and restored at startup, so a
+restart doesn't re-announce every device or start with empty charts.
+
+The state only holds built-in types and is encoded with MessagePack: a
+documented format that stays readable across Python versions, loads
+hundreds of thousands of history rows faster than JSON, keeps bytes (such
+as the baseline arrays) as they are and, unlike pickle or marshal, is safe
+to decode from a file that may have been tampered with. Tuples come back
+as lists; restore_state() converts what it needs.
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+import msgpack
+
+from app.services.network_monitor import NetworkMonitorService
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FORMAT = "aetherlink-state"
+# Bump on incompatible changes to export_state(); checkpoints with another
+# version are ignored and the service starts cold (1 was marshal-encoded)
+CHECKPOINT_VERSION = 2
+
+
+class StateCheckpointer:
+    """
+    Saves the monitor's state every `interval` seconds when it changed,
+    and once more on shutdown. Files are replaced atomically, so a crash
+    mid-write leaves the previous checkpoint intact.
+    """
+
+    def __init__(
+        self, monitor: NetworkMonitorService, path: str, interval: float = 60.0
+    ):
+        self.monitor = monitor
+        self.path = path
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.saved_key = None
+        self.saves = 0
+        self.last_save_seconds: Optional[float] = None
+        self.last_size: Optional[int] = None
+        self.restore_seconds: Optional[float] = None
+        self.restored_devices = 0
+
+    def _change_key(self):
+        monitor = self.monitor
+        return (
+            monitor.last_scan_time,
+            monitor.activity_counter,
+            monitor.alert_manager.version,
+        )
+
+    def restore(self) -> bool:
+        """Load the checkpoint into the monitor; False if there is none"""
+        if not os.path.exists(self.path):
+            return False
+        start = time.perf_counter()
+        try:
+            with gzip.open(self.path, "rb") as handle:
+                data = msgpack.unpackb(handle.read())
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            logger.warning("⚠️ Could not read state checkpoint %s: %s", self.path, e)
+            return False
+        if not isinstance(data, dict) or data.get("format") != CHECKPOINT_FORMAT:
+            logger.warning("⚠️ Ignoring unrecognized state checkpoint %s", self.path)
+            return False
+        if data.get("version") != CHECKPOINT_VERSION:
+            logger.warning(
+                "⚠️ Ignoring state checkpoint %s with version %s",
+                self.path,
+                data.get("version"),
+            )
+            return False
+        try:
+            self.monitor.restore_state(data["state"])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error("❌ Invalid state checkpoint %s: %s", self.path, e)
+            return False
+
+        self.restore_seconds = time.perf_counter() - start
+        self.restored_devices = len(self.monitor.known_devices)
+        self.saved_key = self._change_key()
+        logger.info(
+            "♻️ Restored %s known devices from %s (saved %.0fs ago) in %.0fms",
+            self.restored_devices,
+            self.path,
+            time.time() - data.get("saved_at", time.time()),
+            self.restore_seconds * 1000,
+        )
+        return True
+
+    def _write(self, state: Dict[str, Any]):
+        payload = msgpack.packb(
+            {
+                "format": CHECKPOINT_FORMAT,
+                "version": CHECKPOINT_VERSION,
+                "saved_at": time.time(),
+                "state": state,
+            }
+        )
+        data = gzip.compress(payload, compresslevel=1)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, self.path)
+        self.last_size = len(data)
+
+    async def save(self, force: bool = False) -> bool:
+        """Checkpoint now if anything changed since the last save"""
+        key = self._change_key()
+        if key == self.saved_key and not force:
+            return False
+        start = time.perf_counter()
+        # Snapshot on the event loop (consistent with scans), then encode
+        # and write in a thread
+        state = self.monitor.export_state()
+        try:
+            await asyncio.to_thread(self._write, state)
+        except OSError as e:
+            logger.warning("⚠️ Could not write state checkpoint %s: %s", self.path, e)
+            return False
+        self.saved_key = key
+        self.saves += 1
+        self.last_save_seconds = time.perf_counter() - start
+        return True
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error writing state checkpoint: %s", e)
+
+    async def stop(self):
+        """Stop the periodic task and write a final checkpoint"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "interval": self.interval,
+            "saves": self.saves,
+            "last_save_seconds": self.last_save_seconds,
+            "size_bytes": self.last_size,
+            "restored_devices": self.restored_devices,
+            "restore_seconds": self.restore_seconds,
+        }
@@ -0,0 +1,200 @@
+"""
+Lazily built API services
+Importing the app doesn't construct anything expensive: the network monitor
+(interface detection, discovery backend, alert history), gateway, publisher
+and checkpointer are built on first use. At startup the lifespan warms them
+up in a thread while the app already serves /health, and API routes wait
+until they are ready.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.broker import BrokerClient
+from app.services.cadence import ScanCadence
+from app.services.checkpoint import StateCheckpointer
+from app.services.gateway import LocalGateway, RemoteGateway
+from app.services.network_monitor import NetworkMonitorService, create_network_monitor
+from app.services.publisher import ReplicaPublisher, StatusPublisher
+from app.services.websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """
+    Builds each service on first access and keeps it for the process
+    lifetime. `start()` warms everything up in the background, `ready()`
+    waits for that from request handlers.
+    """
+
+    def __init__(self, startup_budget: float = 2.0):
+        self.startup_budget = startup_budget
+        self.lock = threading.RLock()
+        self.instances: Dict[str, Any] = {}
+        # Seconds spent building each service or warm-up step
+        self.timings: Dict[str, float] = {}
+        self.ready_event = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.error: Optional[Exception] = None
+        self.startup_seconds: Optional[float] = None
+
+    @property
+    def is_api_worker(self) -> bool:
+        return settings.worker_role == "api"
+
+    def _timed(self, name: str, build: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return build()
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 4)
+
+    def _get(self, name: str, build: Callable[[], Any]) -> Any:
+        try:
+            return self.instances[name]
+        except KeyError:
+            pass
+        with self.lock:
+            if name not in self.instances:
+                self.instances[name] = self._timed(name, build)
+            return self.instances[name]
+
+    @property
+    def monitor(self) -> Optional[NetworkMonitorService]:
+        """The network monitor; None in stateless API workers"""
+        if self.is_api_worker:
+            return None
+        return self._get("monitor", create_network_monitor)
+
+    @property
+    def gateway(self):
+        def build():
+            if self.is_api_worker:
+                # Stateless worker: served by the scanner process
+                return RemoteGateway(BrokerClient(settings.broker_url))
+            return LocalGateway(self.monitor)
+
+        return self._get("gateway", build)
+
+    @property
+    def publisher(self) -> StatusPublisher:
+        def build():
+            if self.is_api_worker:
+                return ReplicaPublisher(self.gateway, manager)
+            # Single scan-and-publish loop shared by WebSocket and SSE
+            # clients, fast while someone is watching and slow when idle
+            return StatusPublisher(
+                self.monitor,
+                manager,
+                cadence=ScanCadence(
+                    active_interval=settings.publish_interval,
+                    idle_interval=settings.scan_idle_interval,
+                    idle_after=settings.scan_idle_after,
+                    watchers=manager.watcher_count,
+                ),
+            )
+
+        return self._get("publisher", build)
+
+    @property
+    def checkpointer(self) -> Optional[StateCheckpointer]:
+        """Warm-start checkpoints, if configured (not in API workers)"""
+        if self.is_api_worker or not settings.state_checkpoint_path:
+            return None
+        return self._get(
+            "checkpointer",
+            lambda: StateCheckpointer(
+                self.monitor,
+                settings.state_checkpoint_path,
+                interval=settings.state_checkpoint_interval,
+            ),
+        )
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready_event.is_set() and self.error is None
+
+    def warm_up(self):
+        """Build all services and their lazy parts (runs in a thread)"""
+        monitor = self.monitor
+        if monitor is not None:
+            self._timed("discovery", lambda: monitor.discovery)
+        self.gateway
+        self.publisher
+        if self.checkpointer is not None:
+            # Warm start from the last checkpoint before the first scan
+            self._timed("checkpoint_restore", self.checkpointer.restore)
+
+    async def start(self):
+        """Warm up in the background so the app starts serving right away"""
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._start())
+
+    async def _start(self):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.warm_up)
+            if self.checkpointer is not None:
+                self.checkpointer.start()
+            # Maintenance scans run from startup; demand speeds them up
+            self.publisher.ensure_running()
+        except Exception as e:
+            self.error = e
+            logger.error("❌ Service startup failed: %s", e)
+        finally:
+            self.startup_seconds = time.perf_counter() - start
+            self.ready_event.set()
+        if self.error is not None:
+            return
+
+        if self.startup_seconds > self.startup_budget:
+            logger.warning(
+                "⚠️ Services ready in %.0fms, over the %.0fms startup budget: %s",
+                self.startup_seconds * 1000,
+                self.startup_budget * 1000,
+                self.timings,
+            )
+        else:
+            logger.info("🚀 Services ready in %.0fms", self.startup_seconds * 1000)
+
+    async def ready(self):
+        """Wait until startup finished; 503 if it failed"""
+        if not self.ready_event.is_set():
+            await self.ready_event.wait()
+        if self.error is not None:
+            raise HTTPException(
+                status_code=503, detail=f"Service failed to start: {self.error}"
+            )
+
+    async def stop(self):
+        # Let a warm-up in progress finish, so the checkpoint written on
+        # shutdown is never a partially restored state
+        if self.task is not None:
+            await self.task
+        if self.error is not None:
+            return
+        if "publisher" in self.instances:
+            await self.publisher.stop()
+        if "checkpointer" in self.instances:
+            await self.checkpointer.stop()
+        if "monitor" in self.instances:
+            self.monitor.governor.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready,
+            "error": str(self.error) if self.error is not None else None,
+            "startup_seconds": self.startup_seconds,
+            "startup_budget": self.startup_budget,
+            "timings": dict(self.timings),
+        }
+
+
+services = ServiceContainer(startup_budget=settings.startup_budget)
@@ -0,0 +1,163 @@
+"""
+Device registry for lookups and search without scanning
+The latest snapshot is indexed by id, MAC, IP and name (hash maps for exact
+lookups), with sorted keys for prefix search and one joined string per
+field for substring search, so both stay fast with thousands of devices.
+Indexes hold positions in the snapshot, so a new scan with unchanged ids,
+addresses and names reuses them as they are.
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.models.network import NetworkDevice
+
+SEARCH_FIELDS = ("id", "mac", "ip", "name")
+SEARCH_MODES = ("prefix", "substring")
+
+# Separates keys in the joined search text; stripped from queries
+SEPARATOR = "\n"
+
+
+def device_id(mac: str) -> str:
+    """Device id for a MAC address: the MAC without separators"""
+    return mac.replace(":", "").replace("-", "")
+
+
+class DeviceRegistry:
+    """
+    Indexes the devices of the latest snapshot. `update()` takes the new
+    device objects every scan and rebuilds the indexes only when the
+    snapshot version changes (membership, order, addresses or names).
+    """
+
+    def __init__(self):
+        self.devices: List[NetworkDevice] = []
+        # Positions in `devices` by id, IP and lowercase name
+        self.by_id: Dict[str, int] = {}
+        self.by_ip: Dict[str, int] = {}
+        self.by_name: Dict[str, List[int]] = {}
+        # MAC of every device seen since startup (or restored), by id
+        self.known: Dict[str, str] = {}
+        self.version: Optional[Hashable] = None
+        # Per field: sorted (key, position) pairs, and the joined keys with
+        # the start offset of each key
+        self.sorted_keys: Dict[str, List[Tuple[str, int]]] = {}
+        self.texts: Dict[str, Tuple[str, List[int]]] = {}
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def remember(self, macs: Iterable[str]):
+        """Record known devices, e.g. restored ones not scanned yet"""
+        for mac in macs:
+            self.known[device_id(mac)] = mac
+
+    def update(self, devices: List[NetworkDevice], version: Hashable = None):
+        """Index a new snapshot"""
+        self.devices = devices
+        if version is not None and version == self.version:
+            # Only measurements changed: the indexes still apply
+            return
+
+        self.version = version
+        self.rebuilds += 1
+        self.by_id = {}
+        self.by_ip = {}
+        self.by_name = {}
+        for position, device in enumerate(devices):
+            self.by_id[device.id] = position
+            self.by_ip[device.ip] = position
+            self.by_name.setdefault(device.name.lower(), []).append(position)
+            self.known[device.id] = device.mac
+
+        self.sorted_keys = {}
+        self.texts = {}
+        for field in SEARCH_FIELDS:
+            keys = [self._key(device, field) for device in devices]
+            self.sorted_keys[field] = sorted(
+                (key, position) for position, key in enumerate(keys)
+            )
+            starts = []
+            offset = 0
+            for key in keys:
+                starts.append(offset)
+                offset += len(key) + 1
+            self.texts[field] = (SEPARATOR.join(keys), starts)
+
+    @staticmethod
+    def _key(device: NetworkDevice, field: str) -> str:
+        return str(getattr(device, field)).replace(SEPARATOR, " ").lower()
+
+    def get(self, key: str) -> Optional[NetworkDevice]:
+        """Current device by id, MAC (any notation), IP or exact name"""
+        normalized = device_id(key)
+        for index, index_key in (
+            (self.by_id, key),
+            (self.by_id, normalized),
+            (self.by_id, normalized.lower()),
+            (self.by_ip, key),
+        ):
+            position = index.get(index_key)
+            if position is not None:
+                return self.devices[position]
+        named = self.by_name.get(key.lower())
+        return self.devices[named[0]] if named else None
+
+    def mac_for(self, device_id: str) -> Optional[str]:
+        """MAC of a current or previously seen device"""
+        return self.known.get(device_id)
+
+    def search(
+        self,
+        query: str,
+        fields: Optional[Iterable[str]] = None,
+        mode: str = "prefix",
+        limit: int = 50,
+    ) -> List[NetworkDevice]:
+        """
+        Devices with a field starting with (or containing) `query`,
+        case-insensitive, in snapshot order
+        """
+        query = query.replace(SEPARATOR, "").lower()
+        if not query:
+            return []
+        # The first `limit` matches overall are among the first `limit`
+        # matches of each field
+        positions = set()
+        for field in fields or SEARCH_FIELDS:
+            if mode == "prefix":
+                positions.update(self._prefix_matches(field, query, limit))
+            else:
+                positions.update(self._substring_matches(field, query, limit))
+        return [self.devices[position] for position in sorted(positions)[:limit]]
+
+    def _prefix_matches(self, field: str, query: str, limit: int) -> List[int]:
+        keys = self.sorted_keys.get(field, [])
+        # All keys starting with `query` sort between query and query + max
+        start = bisect_left(keys, (query,))
+        end = bisect_right(keys, (query + "\U0010ffff",))
+        return heapq.nsmallest(limit, (position for _, position in keys[start:end]))
+
+    def _substring_matches(self, field: str, query: str, limit: int) -> List[int]:
+        text, starts = self.texts.get(field, ("", []))
+        matches = []
+        found = text.find(query)
+        # Keys are joined in snapshot order, so matches come in order
+        while found != -1 and len(matches) < limit:
+            position = bisect_right(starts, found) - 1
+            matches.append(position)
+            if position + 1 == len(starts):
+                break
+            # Continue with the next key
+            found = text.find(query, starts[position + 1])
+        return matches
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "devices": len(self.devices),
+            "known": len(self.known),
+            "rebuilds": self.rebuilds,
+        }
@@ -0,0 +1,460 @@
+"""
+Device discovery backends for AetherLink
+Every backend implements DiscoveryBackend.discover(), returning a list of
+dicts with {ip, mac} plus optional {vendor, response_time, hostname}.
+Duplicate IP warnings are reported as {"ip": ..., "duplicate": True}.
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import re
+import select
+import socket
+import struct
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Protocol
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DiscoveryResult = List[Dict[str, Any]]
+
+
+class DiscoveryBackend(Protocol):
+    """Interface implemented by all discovery backends"""
+
+    # Backend name used in configuration and diagnostics
+    name: str
+    # False for simulated backends: the monitor then skips ping probes
+    # and reverse DNS, which would hit the real network
+    live: bool
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        """Return discovered devices, or None if the backend failed"""
+        ...
+
+
+class ArpScanBackend:
+    """Active scanning with arp-scan (requires cap_net_raw or sudo)"""
+
+    name = "arp-scan"
+    live = True
+
+    def __init__(self, interface: Optional[str]):
+        self.interface = interface
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        """
+        Use arp-scan for fast, active network scanning
+        Returns None if arp-scan fails
+        """
+        if not self.interface:
+            logger.warning("⚠️ No network interface detected for arp-scan")
+            return None
+
+        try:
+            # Run arp-scan with retry and timeout
+            cmd = [
+                "arp-scan",
+                "--interface",
+                self.interface,
+                "--localnet",
+                "--retry",
+                "2",
+                "--timeout",
+                "500",
+                "--quiet",
+            ]
+
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+
+            if result.returncode != 0:
+                logger.warning("⚠️ arp-scan failed: %s", result.stderr)
+                return None
+
+            return self.parse(result.stdout)
+
+        except subprocess.TimeoutExpired:
+            logger.warning("⚠️ arp-scan timed out")
+            return None
+        except FileNotFoundError:
+            logger.warning("⚠️ arp-scan not found in PATH")
+            return None
+        except Exception as e:
+            logger.warning("⚠️ arp-scan error: %s", e)
+            return None
+
+    @staticmethod
+    def parse(output: str) -> DiscoveryResult:
+        """
+        Parse arp-scan output
+        Format: IP\\tMAC\\tVendor\\tResponse_time
+        Example: 192.168.1.1\\t00:11:22:33:44:55\\tApple\\t0.123ms
+        """
+        devices = []
+
+        for line in output.strip().split("\n"):
+            # Skip empty lines and headers
+            if not line or line.startswith("#"):
+                continue
+
+            # Check for duplicate IP warnings
+            if "DUP" in line or "duplicate" in line.lower():
+                ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", line)
+                if ip_match:
+                    devices.append({"ip": ip_match.group(1), "duplicate": True})
+                continue
+
+            # Parse device line
+            parts = line.split("\t")
+            if len(parts) < 2:
+                continue
+
+            ip = parts[0].strip()
+            mac = parts[1].strip().lower()
+            vendor = parts[2].strip() if len(parts) > 2 else None
+
+            # Parse response time (e.g., "0.123ms")
+            response_time = None
+            if len(parts) > 3:
+                time_match = re.search(r"([\d.]+)", parts[3].strip())
+                if time_match:
+                    response_time = float(time_match.group(1))
+
+            devices.append(
+                {
+                    "ip": ip,
+                    "mac": mac,
+                    "vendor": vendor,
+                    "response_time": response_time,
+                }
+            )
+
+        logger.info("✅ arp-scan found %s devices", len(devices))
+        return devices
+
+
+class ArpTableBackend:
+    """Passive discovery from the kernel ARP cache via `arp -a`"""
+
+    name = "arp-table"
+    live = True
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        devices = []
+
+        try:
+            result = subprocess.run(
+                ["arp", "-a"], capture_output=True, text=True, timeout=3
+            )
+
+            if result.returncode != 0:
+                return devices
+
+            for line in result.stdout.split("\n"):
+                ip_match = re.search(r"\((\d+\.\d+\.\d+\.\d+)\)", line)
+                mac_match = re.search(
+                    r"([0-9a-f]{1,2}[:-]){5}[0-9a-f]{1,2}", line, re.IGNORECASE
+                )
+
+                if ip_match and mac_match:
+                    ip = ip_match.group(1)
+                    mac = mac_match.group(0).lower()
+
+                    if mac == "00:00:00:00:00:00":
+                        continue
+                    if "incomplete" in line.lower():
+                        continue
+
+                    hostname_match = re.match(r"^(\S+)\s+\(", line)
+                    hostname = hostname_match.group(1) if hostname_match else None
+
+                    devices.append({"ip": ip, "mac": mac, "hostname": hostname})
+
+            logger.info("✅ arp -a found %s devices", len(devices))
+            return devices
+
+        except Exception as e:
+            logger.error("❌ Error with arp -a: %s", e)
+            return devices
+
+
+class NeighborTableBackend:
+    """Passive discovery from the Linux neighbor table via `ip neigh`"""
+
+    name = "neighbor"
+    live = True
+
+    # States for entries that no longer (or never did) resolve
+    STALE_STATES = {"FAILED", "INCOMPLETE", "NOARP"}
+
+    def __init__(self, interface: Optional[str] = None):
+        self.interface = interface
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        cmd = ["ip", "-4", "neigh", "show"]
+        if self.interface:
+            cmd += ["dev", self.interface]
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=3)
+        except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+            logger.warning("⚠️ ip neigh unavailable: %s", e)
+            return None
+
+        if result.returncode != 0:
+            logger.warning("⚠️ ip neigh failed: %s", result.stderr)
+            return None
+
+        devices = []
+        # Example: 192.168.1.1 dev eth0 lladdr aa:bb:cc:dd:ee:ff REACHABLE
+        for line in result.stdout.split("\n"):
+            parts = line.split()
+            if len(parts) < 2 or "lladdr" not in parts:
+                continue
+            if parts[-1] in self.STALE_STATES:
+                continue
+            mac = parts[parts.index("lladdr") + 1].lower()
+            devices.append({"ip": parts[0], "mac": mac})
+
+        logger.info("✅ ip neigh found %s devices", len(devices))
+        return devices
+
+
+class NativeArpBackend:
+    """
+    Active ARP sweep over a raw AF_PACKET socket (Linux, needs NET_RAW)
+    Avoids spawning arp-scan; the subnet is taken from the interface
+    address and capped at `max_hosts` addresses
+    """
+
+    name = "native"
+    live = True
+
+    def __init__(
+        self, interface: Optional[str], timeout: float = 1.0, max_hosts: int = 1024
+    ):
+        self.interface = interface
+        self.timeout = timeout
+        self.max_hosts = max_hosts
+
+    def _interface_addresses(self):
+        own_mac = own_ip = netmask = None
+        for address in psutil.net_if_addrs().get(self.interface, []):
+            if address.family == socket.AF_INET:
+                own_ip, netmask = address.address, address.netmask
+            elif address.family == psutil.AF_LINK:
+                own_mac = address.address
+        return own_mac, own_ip, netmask
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        if not self.interface or not hasattr(socket, "AF_PACKET"):
+            logger.warning("⚠️ Native ARP scanning is not available on this host")
+            return None
+
+        own_mac, own_ip, netmask = self._interface_addresses()
+        if not (own_mac and own_ip and netmask):
+            logger.warning("⚠️ No IPv4/MAC address on %s", self.interface)
+            return None
+
+        network = ipaddress.IPv4Network(f"{own_ip}/{netmask}", strict=False)
+        hosts = [str(host) for host in network.hosts()][: self.max_hosts]
+        own_mac_bytes = bytes.fromhex(own_mac.replace(":", "").replace("-", ""))
+        own_ip_bytes = socket.inet_aton(own_ip)
+
+        try:
+            sock = socket.socket(
+                socket.AF_PACKET, socket.SOCK_RAW, socket.htons(0x0806)
+            )
+        except PermissionError:
+            logger.warning("⚠️ Native ARP scanning requires NET_RAW")
+            return None
+
+        devices: Dict[str, Dict[str, Any]] = {}
+        try:
+            sock.bind((self.interface, 0))
+            sock.setblocking(False)
+            sent_at = time.perf_counter()
+            for host in hosts:
+                frame = (
+                    b"\xff" * 6
+                    + own_mac_bytes
+                    + b"\x08\x06"
+                    + struct.pack("!HHBBH", 1, 0x0800, 6, 4, 1)
+                    + own_mac_bytes
+                    + own_ip_bytes
+                    + b"\x00" * 6
+                    + socket.inet_aton(host)
+                )
+                sock.send(frame)
+
+            deadline = sent_at + self.timeout
+            while (remaining := deadline - time.perf_counter()) > 0:
+                ready, _, _ = select.select([sock], [], [], remaining)
+                if not ready:
+                    break
+                packet = sock.recv(65535)
+                # Ethernet (14) + ARP reply (opcode 2)
+                if len(packet) < 42 or packet[20:22] != b"\x00\x02":
+                    continue
+                mac = ":".join(f"{b:02x}" for b in packet[22:28])
+                ip = socket.inet_ntoa(packet[28:32])
+                if ip not in devices:
+                    devices[ip] = {
+                        "ip": ip,
+                        "mac": mac,
+                        "response_time": round(
+                            (time.perf_counter() - sent_at) * 1000, 3
+                        ),
+                    }
+                elif devices[ip]["mac"] != mac:
+                    devices[f"dup-{ip}"] = {"ip": ip, "duplicate": True}
+        except OSError as e:
+            logger.warning("⚠️ Native ARP scan error: %s", e)
+            return None
+        finally:
+            sock.close()
+
+        logger.info("✅ native ARP found %s devices", len(devices))
+        return list(devices.values())
+
+
+class FallbackBackend:
+    """Tries each backend in order until one succeeds"""
+
+    def __init__(self, backends: List[DiscoveryBackend]):
+        self.backends = backends
+        self.name = "+".join(backend.name for backend in backends)
+        self.live = all(backend.live for backend in backends)
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        for index, backend in enumerate(self.backends):
+            devices = backend.discover()
+            if devices is not None:
+                return devices
+            if index + 1 < len(self.backends):
+                logger.info("📋 Falling back to %s", self.backends[index + 1].name)
+        return None
+
+
+class ReplayBackend:
+    """
+    Plays back a recorded scan trace (JSON lines of {"t": seconds,
+    "devices": [...]}) at `speed` times real time, looping at the end.
+    Lets the whole service be load-tested without a LAN or NET_RAW.
+
+    `clock` is the wall-clock time as it passes in the trace (starting at the
+    real time playback started); the monitor uses it for presence grace,
+    sessions and alert rule windows so these run at replay speed too.
+    """
+
+    name = "replay"
+    live = False
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.frames: List[Dict[str, Any]] = []
+        with open(path) as handle:
+            for line in handle:
+                if line.strip():
+                    self.frames.append(json.loads(line))
+        if not self.frames:
+            raise ValueError(f"Replay trace {path} is empty")
+        self.frames.sort(key=lambda frame: frame["t"])
+        self.start_offset = self.frames[0]["t"]
+        self.duration = self.frames[-1]["t"] - self.start_offset
+        self.started_at: Optional[float] = None
+        self.started_wall = 0.0
+        self.position = 0
+
+    def elapsed(self) -> float:
+        """Trace seconds played back so far (playback starts on first use)"""
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now
+            self.started_wall = time.time()
+        return (now - self.started_at) * self.speed
+
+    def clock(self) -> float:
+        elapsed = self.elapsed()
+        return self.started_wall + elapsed
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        trace_time = self.elapsed()
+        if self.loop and self.duration > 0:
+            trace_time %= self.duration
+        trace_time += self.start_offset
+
+        # Frames are sorted; rewind only when the trace wrapped around
+        if self.frames[self.position]["t"] > trace_time:
+            self.position = 0
+        while (
+            self.position + 1 < len(self.frames)
+            and self.frames[self.position + 1]["t"] <= trace_time
+        ):
+            self.position += 1
+
+        return [dict(device) for device in self.frames[self.position]["devices"]]
+
+
+class RecordingBackend:
+    """Wraps a backend and appends every successful scan to a trace file"""
+
+    def __init__(self, backend: DiscoveryBackend, path: str):
+        self.backend = backend
+        self.path = path
+        self.name = f"{backend.name}+record"
+        self.live = backend.live
+        self.started_at = time.time()
+
+    def discover(self) -> Optional[DiscoveryResult]:
+        devices = self.backend.discover()
+        if devices is not None:
+            frame = {"t": round(time.time() - self.started_at, 3), "devices": devices}
+            try:
+                with open(self.path, "a") as handle:
+                    handle.write(json.dumps(frame) + "\n")
+            except OSError as e:
+                logger.warning("⚠️ Could not record scan trace: %s", e)
+        return devices
+
+
+def create_backend(
+    name: str,
+    interface: Optional[str],
+    replay_path: Optional[str] = None,
+    replay_speed: float = 1.0,
+    record_path: Optional[str] = None,
+) -> DiscoveryBackend:
+    """
+    Build a discovery backend from configuration
+    `name` is one of: auto, arp-scan, arp-table, neighbor, native, replay
+    """
+    if name == "auto":
+        backend: DiscoveryBackend = FallbackBackend(
+            [ArpScanBackend(interface), ArpTableBackend()]
+        )
+    elif name == "arp-scan":
+        backend = ArpScanBackend(interface)
+    elif name == "arp-table":
+        backend = ArpTableBackend()
+    elif name == "neighbor":
+        backend = NeighborTableBackend(interface)
+    elif name == "native":
+        backend = NativeArpBackend(interface)
+    elif name == "replay":
+        if not replay_path or not os.path.exists(replay_path):
+            raise ValueError("Replay discovery requires an existing replay path")
+        backend = ReplayBackend(replay_path, speed=replay_speed)
+    else:
+        raise ValueError(f"Unknown discovery backend: {name}")
+
+    if record_path:
+        backend = RecordingBackend(backend, record_path)
+    return backend
@@ -0,0 +1,139 @@
+"""
+Topic event hub for streaming clients
+Events are numbered, encoded once as Server-Sent Events frames and kept in
+a bounded replay buffer, so reconnecting clients can resume from their
+Last-Event-ID and any number of subscribers share one encode per event.
+"""
+
+import asyncio
+import json
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+TOPICS = ("devices", "alerts", "stats")
+
+# (event id, topic, encoded SSE frame)
+Entry = Tuple[int, str, str]
+
+
+class Subscription:
+    """A subscriber's topics and its queue of pending frames"""
+
+    def __init__(self, topics: Iterable[str], max_queue: int):
+        self.topics: Set[str] = set(topics)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.max_queue = max_queue
+        self.overflowed = False
+
+    def push(self, entry: Entry):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_queue:
+            # Too slow to keep up: end the stream, the client resumes from
+            # its Last-Event-ID (or resyncs) when it reconnects
+            self.overflowed = True
+            self.queue.put_nowait(None)
+        else:
+            self.queue.put_nowait(entry)
+
+
+class EventHub:
+    """Publishes numbered topic events to subscribers with a replay buffer"""
+
+    def __init__(self, replay_size: int = 1000, max_queue: int = 256):
+        self.next_id = 1
+        self.buffer: Deque[Entry] = deque(maxlen=replay_size)
+        self.snapshots: Dict[str, Entry] = {}
+        self.subscribers: Set[Subscription] = set()
+        self.max_queue = max_queue
+
+    def publish(
+        self, topic: str, event_type: str, data: Dict[str, Any], snapshot: bool = False
+    ) -> int:
+        """
+        Publish an event and return its id. Snapshot events (a full
+        device list or stats) are also sent first to new subscribers.
+        """
+        event_id = self.next_id
+        self.next_id += 1
+        payload = json.dumps(
+            {
+                "id": event_id,
+                "type": event_type,
+                "timestamp": datetime.now().isoformat(),
+                **data,
+            },
+            default=str,
+        )
+        entry = (
+            event_id,
+            topic,
+            f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n",
+        )
+        self.buffer.append(entry)
+        if snapshot:
+            self.snapshots[topic] = entry
+
+        for subscription in self.subscribers:
+            if topic in subscription.topics:
+                subscription.push(entry)
+        return event_id
+
+    def replay(self, last_event_id: int, topics: Set[str]) -> Tuple[List[Entry], bool]:
+        """
+        Buffered events after `last_event_id` for the given topics, and
+        whether events were lost (the id is older than the buffer, or
+        from before a restart)
+        """
+        if last_event_id >= self.next_id:
+            return [], True
+        if not self.buffer:
+            return [], last_event_id < self.next_id - 1
+        first_id = self.buffer[0][0]
+        gap = last_event_id < first_id - 1
+        start = max(0, last_event_id + 1 - first_id)
+        return [
+            entry for entry in islice(self.buffer, start, None) if entry[1] in topics
+        ], gap
+
+    def subscribe(
+        self, topics: Iterable[str], last_event_id: Optional[int] = None
+    ) -> Tuple[Subscription, List[Entry], bool]:
+        """
+        Register a subscriber and return it with its backlog: events missed
+        since `last_event_id`, or the latest snapshots for a new client
+        """
+        subscription = Subscription(topics, self.max_queue)
+        if last_event_id is None:
+            backlog = sorted(
+                entry
+                for topic, entry in self.snapshots.items()
+                if topic in subscription.topics
+            )
+            gap = False
+        else:
+            backlog, gap = self.replay(last_event_id, subscription.topics)
+            if gap:
+                # Events were lost: also send the latest snapshots
+                backlog = sorted(
+                    set(backlog)
+                    | {
+                        entry
+                        for topic, entry in self.snapshots.items()
+                        if topic in subscription.topics
+                    }
+                )
+        self.subscribers.add(subscription)
+        return subscription, backlog, gap
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "last_event_id": self.next_id - 1,
+            "buffered": len(self.buffer),
+            "subscribers": len(self.subscribers),
+        }
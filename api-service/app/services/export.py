@@ -0,0 +1,392 @@
+"""
+Streaming export of device history, alerts, stats and activities
+Rows are read through the gateway one chunk at a time (so API workers page
+through the scanner's data the same way) and each chunk is encoded as
+NDJSON, CSV or a Parquet row group before the next one is read, so memory
+stays at one chunk however much data an export covers. Chunks resume from
+a cursor, so scans running between chunks don't disturb an export.
+
+Parquet needs the optional pyarrow package.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from app.services.network_monitor import NetworkMonitorService
+
+logger = logging.getLogger(__name__)
+
+# Columns of each dataset, with their Parquet types
+EXPORT_COLUMNS = {
+    "history": (
+        ("device_id", "string"),
+        ("mac", "string"),
+        ("timestamp", "timestamp"),
+        ("status", "string"),
+        ("latency", "double"),
+        ("packet_loss", "double"),
+        ("connection_quality", "string"),
+        ("ip", "string"),
+    ),
+    "alerts": (
+        ("id", "string"),
+        ("timestamp", "timestamp"),
+        ("type", "string"),
+        ("severity", "string"),
+        ("title", "string"),
+        ("message", "string"),
+        ("device_id", "string"),
+        ("device_name", "string"),
+        ("fingerprint", "string"),
+        ("occurrences", "int64"),
+        ("last_occurrence", "timestamp"),
+        ("acknowledged", "bool"),
+        ("acknowledged_at", "timestamp"),
+        ("resolved", "bool"),
+        ("resolved_at", "timestamp"),
+    ),
+    "stats": (
+        ("timestamp", "timestamp"),
+        ("connected_devices", "int64"),
+        ("network_speed", "double"),
+        ("data_usage", "double"),
+        ("uptime", "string"),
+    ),
+    "activities": (
+        ("id", "string"),
+        ("timestamp", "timestamp"),
+        ("device_id", "string"),
+        ("device", "string"),
+        ("action", "string"),
+    ),
+}
+EXPORT_DATASETS = tuple(EXPORT_COLUMNS)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+Rows = List[List[Any]]
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _read_history(monitor: NetworkMonitorService, since, until, macs, cursor, limit):
+    # Devices in id order, each device's snapshots in time order; the
+    # cursor is the last exported (device id, timestamp)
+    if macs is None:
+        macs = monitor.registry.known
+    ids = sorted(macs)
+    after_id, after_time = cursor if cursor is not None else (None, None)
+    position = bisect_left(ids, after_id) if after_id is not None else 0
+
+    timestamp_of = itemgetter(0)
+    formatted: Dict[float, str] = {}
+    rows: Rows = []
+    for device in islice(ids, position, None):
+        mac = macs[device]
+        history = monitor.device_history.get(mac, ()) if mac is not None else ()
+        start = 0
+        end = len(history)
+        if since is not None:
+            start = bisect_left(history, since.timestamp(), key=timestamp_of)
+        if until is not None:
+            end = bisect_right(history, until.timestamp(), key=timestamp_of)
+        if device == after_id:
+            start = max(start, bisect_right(history, after_time, key=timestamp_of))
+        snapshots = list(islice(history, start, min(end, start + limit - len(rows))))
+        times = monitor.format_times((row[0] for row in snapshots), formatted)
+        rows.extend(
+            [device, mac, time_text, *snapshot[1:]]
+            for time_text, snapshot in zip(times, snapshots)
+        )
+        if len(rows) >= limit:
+            return rows, [device, snapshots[-1][0]]
+    return rows, None
+
+
+def _read_alerts(monitor: NetworkMonitorService, since, until, macs, cursor, limit):
+    alerts, cursor = monitor.alert_manager.store.query_range(
+        since, until, after=cursor, limit=limit
+    )
+    rows = [
+        [
+            alert.id,
+            alert.timestamp.isoformat(),
+            alert.type.value,
+            alert.severity.value,
+            alert.title,
+            alert.message,
+            alert.device_id,
+            alert.device_name,
+            alert.fingerprint,
+            alert.occurrences,
+            _isoformat(alert.last_occurrence),
+            alert.acknowledged,
+            _isoformat(alert.acknowledged_at),
+            alert.resolved,
+            _isoformat(alert.resolved_at),
+        ]
+        for alert in alerts
+        if macs is None or alert.device_id in macs
+    ]
+    return rows, cursor
+
+
+def _read_stats(monitor: NetworkMonitorService, since, until, macs, cursor, limit):
+    # The cursor is the timestamp of the last exported entry
+    history = monitor.stats_history
+
+    def timestamp_of(entry):
+        return entry["timestamp"].timestamp()
+
+    start = 0
+    end = len(history)
+    if since is not None:
+        start = bisect_left(history, since.timestamp(), key=timestamp_of)
+    if until is not None:
+        end = bisect_right(history, until.timestamp(), key=timestamp_of)
+    if cursor is not None:
+        start = max(start, bisect_right(history, cursor, key=timestamp_of))
+    entries = list(islice(history, start, min(end, start + limit)))
+    rows = [
+        [
+            entry["timestamp"].isoformat(),
+            entry["stats"]["connected_devices"],
+            entry["stats"]["network_speed"],
+            entry["stats"]["data_usage"],
+            entry["stats"]["uptime"],
+        ]
+        for entry in entries
+    ]
+    if start + limit < end:
+        return rows, timestamp_of(entries[-1])
+    return rows, None
+
+
+def _read_activities(monitor: NetworkMonitorService, since, until, macs, cursor, limit):
+    # The log is newest first and entries are numbered by the activity
+    # counter, so entry n sits at index activity_counter - n; the cursor is
+    # the number of the last exported entry
+    log = monitor.activity_log
+    newest = monitor.activity_counter
+    first = max(newest - len(log) + 1, (cursor or 0) + 1)
+    since_ts = since.timestamp() if since is not None else None
+    until_ts = until.timestamp() if until is not None else None
+
+    rows: Rows = []
+    for number in range(first, newest + 1):
+        activity = log[newest - number]
+        timestamp = activity.timestamp.timestamp()
+        if since_ts is not None and timestamp < since_ts:
+            continue
+        if until_ts is not None and timestamp > until_ts:
+            break
+        if macs is not None and activity.device_id not in macs:
+            continue
+        rows.append(
+            [
+                activity.id,
+                activity.timestamp.isoformat(),
+                activity.device_id,
+                activity.device,
+                activity.action,
+            ]
+        )
+        if len(rows) == limit:
+            return rows, number
+    return rows, None
+
+
+_READERS = {
+    "history": _read_history,
+    "alerts": _read_alerts,
+    "stats": _read_stats,
+    "activities": _read_activities,
+}
+
+
+def read_chunk(
+    monitor: NetworkMonitorService,
+    dataset: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    macs: Optional[Dict[str, str]] = None,
+    cursor: Any = None,
+    limit: int = 5000,
+) -> Tuple[Rows, Any]:
+    """
+    Up to `limit` rows of a dataset (in EXPORT_COLUMNS order) between
+    `since` and `until`, after `cursor`, optionally only for some devices
+    (id -> MAC, None when unknown); returns the rows and the cursor for
+    the next chunk, None at the end. Cursors are plain JSON values.
+    """
+    return _READERS[dataset](monitor, since, until, macs, cursor, limit)
+
+
+@lru_cache(maxsize=None)
+def parquet_available() -> bool:
+    """
+    Whether pyarrow actually imports (installed is not enough: a build
+    against another NumPy fails on import); checked once
+    """
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except Exception as e:
+        logger.warning("⚠️ Parquet export unavailable, pyarrow failed to import: %s", e)
+        return False
+    return True
+
+
+def encode_ndjson(names: Sequence[str], rows: Rows) -> bytes:
+    dumps = json.dumps
+    return "".join([dumps(dict(zip(names, row))) + "\n" for row in rows]).encode()
+
+
+def encode_csv(rows: Rows, header: Optional[Sequence[str]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+class _DrainableSink:
+    """Write-only file that hands out the bytes written since the last drain"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet records file offsets in its footer, so this counts all
+        # bytes ever written, not only the undrained ones
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+class ParquetEncoder:
+    """Writes each chunk as one row group and returns the new file bytes"""
+
+    def __init__(self, columns: Sequence[Tuple[str, str]]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        types = {
+            "string": pa.string(),
+            "double": pa.float64(),
+            "int64": pa.int64(),
+            "bool": pa.bool_(),
+            "timestamp": pa.timestamp("us"),
+        }
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self.timestamps = [kind == "timestamp" for _, kind in columns]
+        self.sink = _DrainableSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+
+    def encode(self, rows: Rows) -> bytes:
+        arrays = []
+        for values, field, is_time in zip(zip(*rows), self.schema, self.timestamps):
+            if is_time:
+                values = [
+                    datetime.fromisoformat(value) if value is not None else None
+                    for value in values
+                ]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        """Finish the file (footer); the bytes not handed out yet"""
+        self.writer.close()
+        return self.sink.drain()
+
+
+async def _read_chunks(gateway, dataset: str, chunk_size: int, **query):
+    cursor = None
+    while True:
+        chunk = await gateway.export_chunk(
+            dataset, cursor=cursor, limit=chunk_size, **query
+        )
+        if chunk["rows"]:
+            yield chunk["rows"]
+        cursor = chunk["cursor"]
+        if cursor is None:
+            return
+
+
+async def _encode(dataset: str, format: str, first: Optional[Rows], chunks):
+    columns = EXPORT_COLUMNS[dataset]
+    names = [name for name, _ in columns]
+    encoder = ParquetEncoder(columns) if format == "parquet" else None
+    total = 0
+    rows = first
+    while rows is not None:
+        # Reads stay on the event loop (consistent with scans); encoding
+        # runs in a thread so large chunks don't stall other requests
+        if format == "ndjson":
+            data = await asyncio.to_thread(encode_ndjson, names, rows)
+        elif format == "csv":
+            data = await asyncio.to_thread(
+                encode_csv, rows, names if total == 0 else None
+            )
+        else:
+            data = await asyncio.to_thread(encoder.encode, rows)
+        total += len(rows)
+        yield data
+        rows = await anext(chunks, None)
+
+    if format == "csv" and total == 0:
+        yield encode_csv([], names)
+    elif encoder is not None:
+        yield encoder.close()
+    logger.info("📤 Exported %s %s rows as %s", total, dataset, format)
+
+
+async def start_export(
+    gateway,
+    dataset: str,
+    format: str,
+    chunk_size: int = 5000,
+    **query,
+) -> AsyncIterator[bytes]:
+    """
+    Stream a dataset in `format`. The first chunk is read before returning,
+    so an unavailable scanner is reported as an error response rather than
+    a truncated download.
+    """
+    chunks = _read_chunks(gateway, dataset, chunk_size, **query)
+    first = await anext(chunks, None)
+    return _encode(dataset, format, first, chunks)
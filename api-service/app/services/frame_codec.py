@@ -0,0 +1,190 @@
+"""
+WebSocket frame encodings negotiated per client
+Clients of /api/ws/network may offer a subprotocol to receive compact
+binary frames instead of JSON text:
+- `aetherlink.msgpack`: MessagePack (needs the msgpack package)
+- `aetherlink.cbor`: CBOR (needs the cbor2 package)
+- `aetherlink.json`: JSON text, the same as offering nothing
+
+In binary frames, object keys listed in KEYS are sent as their index in
+the table, so the field names repeated for every device cost one byte.
+Binary clients first receive a `hello` message with the table (with plain
+keys) and may send control messages as JSON text or in their encoding.
+"""
+
+import json
+from typing import Any, Callable, Dict, Optional, Sequence, Union
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional
+    cbor2 = None
+
+# Interned keys; only ever append, clients get the table in `hello`
+KEYS = (
+    # Message envelopes
+    "type",
+    "timestamp",
+    "data",
+    "topic",
+    "event",
+    "message",
+    "version",
+    "topics",
+    "fields",
+    # Status
+    "stats",
+    "devices",
+    "device",
+    "activities",
+    "chart_data",
+    "alerts",
+    "alert",
+    "resolved",
+    "unacknowledged_alerts",
+    # Devices
+    "id",
+    "name",
+    "ip",
+    "mac",
+    "status",
+    "vendor",
+    "last_seen",
+    "latency",
+    "packet_loss",
+    "connection_quality",
+    "first_seen",
+    "total_connections",
+    # Stats, activities and chart points
+    "connected_devices",
+    "network_speed",
+    "data_usage",
+    "uptime",
+    "device_id",
+    "action",
+    "time",
+    "download",
+    "upload",
+    # Alerts
+    "severity",
+    "title",
+    "device_name",
+    "acknowledged",
+    "acknowledged_at",
+    "fingerprint",
+    "occurrences",
+    "last_occurrence",
+    "resolved_at",
+    # Added later
+    "anomaly_score",
+)
+KEY_INDEX = {key: index for index, key in enumerate(KEYS)}
+
+_CONTAINERS = (dict, list)
+
+Frame = Union[str, bytes]
+
+
+def intern_keys(value: Any) -> Any:
+    """Copy of a JSON-ready value with KEYS replaced by their index"""
+    cls = type(value)
+    if cls is dict:
+        index = KEY_INDEX
+        return {
+            index.get(key, key): (
+                intern_keys(item) if type(item) in _CONTAINERS else item
+            )
+            for key, item in value.items()
+        }
+    if cls is list:
+        return [
+            intern_keys(item) if type(item) in _CONTAINERS else item for item in value
+        ]
+    return value
+
+
+def expand_keys(value: Any) -> Any:
+    """Inverse of intern_keys, for messages from binary clients"""
+    if isinstance(value, dict):
+        return {
+            (KEYS[key] if isinstance(key, int) and 0 <= key < len(KEYS) else key): (
+                expand_keys(item)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [expand_keys(item) for item in value]
+    return value
+
+
+class FrameCodec:
+    """Encodes messages to frames for one subprotocol"""
+
+    def __init__(
+        self,
+        name: str,
+        subprotocol: Optional[str],
+        dumps: Callable[[Any], Frame],
+        loads: Callable[[Frame], Any],
+        binary: bool = False,
+    ):
+        self.name = name
+        self.subprotocol = subprotocol
+        self.dumps = dumps
+        self.loads = loads
+        self.binary = binary
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        return self.dumps(intern_keys(message) if self.binary else message)
+
+    def decode(self, frame: Frame) -> Any:
+        """Decode a client frame; text frames are always JSON"""
+        if isinstance(frame, str) or not self.binary:
+            return json.loads(frame)
+        return expand_keys(self.loads(frame))
+
+    async def send(self, websocket, frame: Frame):
+        if self.binary:
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+
+    def hello(self) -> Optional[Frame]:
+        """First frame for binary clients: the key table, not interned"""
+        if not self.binary:
+            return None
+        return self.dumps({"type": "hello", "encoding": self.name, "keys": KEYS})
+
+
+# Clients that offer no known subprotocol
+JSON_CODEC = FrameCodec("json", None, json.dumps, json.loads)
+
+CODECS: Dict[str, FrameCodec] = {
+    "aetherlink.json": FrameCodec("json", "aetherlink.json", json.dumps, json.loads)
+}
+if msgpack is not None:
+    CODECS["aetherlink.msgpack"] = FrameCodec(
+        "msgpack",
+        "aetherlink.msgpack",
+        msgpack.packb,
+        lambda frame: msgpack.unpackb(frame, strict_map_key=False),
+        binary=True,
+    )
+if cbor2 is not None:
+    CODECS["aetherlink.cbor"] = FrameCodec(
+        "cbor", "aetherlink.cbor", cbor2.dumps, cbor2.loads, binary=True
+    )
+
+
+def negotiate(offered: Sequence[str]) -> FrameCodec:
+    """The first offered subprotocol this server supports, else JSON"""
+    for subprotocol in offered:
+        codec = CODECS.get(subprotocol)
+        if codec is not None:
+            return codec
+    return JSON_CODEC
@@ -0,0 +1,557 @@
+"""
+Monitor gateways used by the API routes
+Standalone processes (and the scanner) answer from a NetworkMonitorService
+in the same process. API workers in a multi-worker deployment answer reads
+from the status the scanner publishes on the broker, and forward other
+queries and writes to the scanner as calls over broker channels.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from app.models.network import AlertRule, NetworkDevice, NetworkStats
+from app.services.broker import BrokerClient
+from app.services.device_registry import DeviceRegistry
+from app.services.export import read_chunk
+from app.services.metrics import QUEUE_DEPTH
+from app.services.network_monitor import NetworkMonitorService
+from app.services.websocket_manager import manager as websocket_manager
+
+logger = logging.getLogger(__name__)
+
+# Broker keys and channels shared by the scanner and API workers
+STATE_KEY = "aetherlink:state"
+EVENTS_CHANNEL = "aetherlink:events"
+CALLS_CHANNEL = "aetherlink:calls"
+REPLY_CHANNEL_PREFIX = "aetherlink:reply:"
+
+# Gateway methods API workers may call on the scanner, and the ones that
+# change state (workers are sent fresh versions after these)
+CALL_METHODS = {
+    "get_activities",
+    "get_device_history",
+    "get_device_history_version",
+    "get_device_activities",
+    "get_device_baseline",
+    "get_devices_history",
+    "get_devices_activities",
+    "get_devices_availability",
+    "get_devices_online",
+    "export_chunk",
+    "get_diagnostics",
+    "get_alerts",
+    "get_unacknowledged_count",
+    "query_alert_history",
+    "acknowledge_alert",
+    "get_alert_rules",
+    "update_alert_rule",
+}
+WRITE_METHODS = {"acknowledge_alert", "update_alert_rule"}
+
+
+class ScannerUnavailable(HTTPException):
+    """The scanner process can't be reached through the broker"""
+
+    def __init__(self, detail: str = "Scanner process unavailable"):
+        super().__init__(status_code=503, detail=detail)
+
+
+class LocalGateway:
+    """Gateway to a NetworkMonitorService running in this process"""
+
+    role = "standalone"
+
+    def __init__(self, monitor: NetworkMonitorService):
+        self.monitor = monitor
+
+    async def get_versions(self) -> Dict[str, int]:
+        """Versions the polling endpoints build their ETags from"""
+        return {
+            "snapshot": self.monitor.snapshot_version,
+            "activities": self.monitor.activity_counter,
+            "alerts": self.monitor.alert_manager.version,
+            "stats": self.monitor.stats_version,
+        }
+
+    async def scan_network(self) -> List[NetworkDevice]:
+        """
+        The publish loop's latest snapshot (scanning only if none exists
+        yet); scans follow the cadence, not API traffic
+        """
+        if self.monitor.last_scan_time is None:
+            return await self.monitor.scan_network()
+        return self.monitor.cached_devices
+
+    async def get_system_stats(self) -> NetworkStats:
+        return await self.monitor.get_system_stats()
+
+    async def get_activities(self, limit: int = 10):
+        return await self.monitor.get_activities(limit=limit)
+
+    async def generate_chart_data(self):
+        return self.monitor.generate_chart_data()
+
+    async def get_registry(self) -> DeviceRegistry:
+        """Index of the latest snapshot (scanning only if none exists yet)"""
+        if self.monitor.last_scan_time is None:
+            await self.monitor.scan_network()
+        return self.monitor.registry
+
+    async def get_device_history(self, device_id: str, limit: int = 100):
+        mac = self.monitor.registry.mac_for(device_id)
+        return self.monitor.get_device_history(mac, limit) if mac else []
+
+    async def get_device_history_version(self, device_id: str) -> int:
+        """Timestamp (ms) of the newest snapshot recorded for a device"""
+        mac = self.monitor.registry.mac_for(device_id)
+        snapshots = self.monitor.device_history.get(mac)
+        return int(snapshots[-1][0] * 1000) if snapshots else 0
+
+    async def get_device_activities(self, device_id: str, limit: int = 50):
+        """Activities of a current or known device, None if it's unknown"""
+        if self.monitor.registry.mac_for(device_id) is None:
+            return None
+        return self.monitor.get_device_activities(device_id, limit)
+
+    async def get_device_baseline(self, device_id: str, hour: Optional[int] = None):
+        """Latency/loss baseline of a known device, None if it has none"""
+        mac = self.monitor.registry.mac_for(device_id)
+        return self.monitor.baselines.get_baseline(mac, hour) if mac else None
+
+    def _resolve(self, device_ids: List[str]):
+        """MACs of known devices by id, and the ids that are unknown"""
+        macs = {}
+        missing = []
+        for device_id in dict.fromkeys(device_ids):
+            mac = self.monitor.registry.mac_for(device_id)
+            if mac is None:
+                missing.append(device_id)
+            else:
+                macs[device_id] = mac
+        return macs, missing
+
+    @staticmethod
+    def _time_range(since, until):
+        # Time bounds arrive as ISO strings when forwarded by API workers
+        return tuple(
+            datetime.fromisoformat(value) if isinstance(value, str) else value
+            for value in (since, until)
+        )
+
+    async def get_devices_history(
+        self,
+        device_ids: List[str],
+        since=None,
+        until=None,
+        limit: int = 100,
+        columns: bool = False,
+    ) -> Dict[str, Any]:
+        """Histories of several devices; unknown ids are listed as missing"""
+        macs, missing = self._resolve(device_ids)
+        since, until = self._time_range(since, until)
+        histories = self.monitor.get_devices_history(macs, since, until, limit, columns)
+        return {"histories": histories, "missing": missing}
+
+    async def get_devices_activities(
+        self, device_ids: List[str], since=None, until=None, limit: int = 50
+    ) -> Dict[str, Any]:
+        """Activities of several devices; unknown ids are listed as missing"""
+        macs, missing = self._resolve(device_ids)
+        since, until = self._time_range(since, until)
+        activities = self.monitor.get_devices_activities(
+            list(macs), since, until, limit
+        )
+        return {"activities": activities, "missing": missing}
+
+    async def get_devices_availability(
+        self, device_ids: List[str], since=None, until=None
+    ) -> Dict[str, Any]:
+        """Availability of several devices; unknown ids are listed as missing"""
+        macs, missing = self._resolve(device_ids)
+        since, until = self._time_range(since, until)
+        return dict(self.monitor.get_availability(macs, since, until), missing=missing)
+
+    async def get_devices_online(self, since=None, until=None) -> Dict[str, Any]:
+        """Ids of devices online at any time between since and until"""
+        since, until = self._time_range(since, until)
+        return self.monitor.get_online_between(since, until)
+
+    async def export_chunk(
+        self,
+        dataset: str,
+        since=None,
+        until=None,
+        device_ids: Optional[List[str]] = None,
+        cursor=None,
+        limit: int = 5000,
+    ) -> Dict[str, Any]:
+        """One chunk of export rows and the cursor for the next one"""
+        macs = None
+        if device_ids is not None:
+            # Unknown ids still match alerts and activities
+            registry = self.monitor.registry
+            macs = {device_id: registry.mac_for(device_id) for device_id in device_ids}
+        since, until = self._time_range(since, until)
+        rows, cursor = read_chunk(
+            self.monitor, dataset, since, until, macs, cursor, limit
+        )
+        return {"rows": rows, "cursor": cursor}
+
+    async def get_diagnostics(self) -> Dict[str, Any]:
+        return self.monitor.get_diagnostics()
+
+    async def get_alerts(self, **filters):
+        return self.monitor.get_alerts(**filters)
+
+    async def get_unacknowledged_count(self) -> int:
+        return self.monitor.alert_manager.get_unacknowledged_count()
+
+    async def query_alert_history(self, **filters):
+        # Time bounds arrive as ISO strings when forwarded by API workers
+        for key in ("since", "until"):
+            if isinstance(filters.get(key), str):
+                filters[key] = datetime.fromisoformat(filters[key])
+        return self.monitor.query_alert_history(**filters)
+
+    async def acknowledge_alert(self, alert_id: str) -> bool:
+        return self.monitor.acknowledge_alert(alert_id)
+
+    async def get_alert_rules(self):
+        return self.monitor.get_alert_rules()
+
+    async def update_alert_rule(self, rule):
+        if isinstance(rule, dict):
+            rule = AlertRule(**rule)
+        self.monitor.update_alert_rule(rule)
+        return rule
+
+    def collect_metrics(self):
+        self.monitor.collect_metrics()
+
+    async def handle_call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a call forwarded by an API worker and build its reply"""
+        reply: Dict[str, Any] = {"id": request.get("id")}
+        method = request.get("method")
+        try:
+            if method not in CALL_METHODS:
+                raise HTTPException(status_code=400, detail=f"Unknown call {method}")
+            result = await getattr(self, method)(**request.get("kwargs", {}))
+            reply["result"] = jsonable_encoder(result)
+        except HTTPException as e:
+            reply.update(error=e.detail, status=e.status_code)
+        except Exception as e:
+            logger.error("Error handling call %s: %s", method, e)
+            reply.update(error=str(e), status=500)
+        return reply
+
+
+class RemoteGateway:
+    """
+    Gateway for stateless API workers. Device lists, stats, chart data and
+    versions come from the latest status the scanner published; anything
+    else is a call to the scanner, answered on this worker's reply channel.
+    """
+
+    role = "api"
+
+    def __init__(self, client: BrokerClient, call_timeout: float = 10.0):
+        self.client = client
+        self.call_timeout = call_timeout
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.reply_channel = REPLY_CHANNEL_PREFIX + self.worker_id
+        # Receives published status and alert batches (the replica publisher)
+        self.listener = None
+        self.task: Optional[asyncio.Task] = None
+        self.ready: Optional[asyncio.Event] = None
+        self.state: Optional[Dict[str, Any]] = None
+        self.versions: Dict[str, str] = {}
+        self.devices: Optional[List[NetworkDevice]] = None
+        self.registry = DeviceRegistry()
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.call_ids = itertools.count(1)
+        self.calls = 0
+
+    @property
+    def connected(self) -> bool:
+        return self.ready is not None and self.ready.is_set()
+
+    def start(self):
+        """Subscribe to the scanner's events if not subscribed yet"""
+        if self.task is None or self.task.done():
+            self.ready = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(
+                self.client.subscribe(
+                    [EVENTS_CHANNEL, self.reply_channel],
+                    self._on_message,
+                    on_connect=self._on_connect,
+                )
+            )
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.client.close()
+
+    async def _wait_ready(self):
+        self.start()
+        try:
+            await asyncio.wait_for(self.ready.wait(), self.call_timeout)
+        except asyncio.TimeoutError:
+            raise ScannerUnavailable("Broker unreachable")
+
+    async def _require_state(self) -> Dict[str, Any]:
+        await self._wait_ready()
+        if self.state is None:
+            raise ScannerUnavailable("No status published by the scanner yet")
+        return self.state
+
+    async def _on_connect(self):
+        # Catch up on the status published while we weren't subscribed
+        payload = await self.client.get(STATE_KEY)
+        if payload is not None:
+            await self._apply_state(json.loads(payload))
+        self.ready.set()
+
+    async def _on_message(self, channel: str, payload: bytes):
+        message = json.loads(payload)
+        if channel == self.reply_channel:
+            future = self.pending.get(message.get("id"))
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+
+        op = message.get("op")
+        if op == "state":
+            await self._apply_state(message)
+        elif op == "versions":
+            self._set_versions(message["scanner"], message["versions"])
+        elif op == "alert_batch" and self.listener is not None:
+            await self.listener.on_alert_batch(
+                message["alerts"],
+                message["resolved"],
+                message.get("resolved_devices"),
+            )
+
+    async def _apply_state(self, state: Dict[str, Any]):
+        current = self.state
+        if (
+            current is not None
+            and state["scanner"] == current["scanner"]
+            and state["sequence"] <= current["sequence"]
+        ):
+            # Older than what we have (the catch-up read raced a publish)
+            return
+        self.state = state
+        self._set_versions(state["scanner"], state["versions"])
+        self.devices = None
+        if self.listener is not None:
+            await self.listener.on_state(state["status"], state["versions"]["snapshot"])
+
+    def _set_versions(self, scanner: str, versions: Dict[str, int]):
+        # Versions start over when the scanner restarts, so the ETags
+        # built from them also carry the scanner's id
+        self.versions = {key: f"{scanner}.{value}" for key, value in versions.items()}
+
+    async def call(self, method: str, **kwargs):
+        """Run a gateway method on the scanner and return its result"""
+        await self._wait_ready()
+        call_id = next(self.call_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[call_id] = future
+        request = {
+            "id": call_id,
+            "reply": self.reply_channel,
+            "method": method,
+            "kwargs": jsonable_encoder(kwargs),
+        }
+        try:
+            try:
+                receivers = await self.client.publish(
+                    CALLS_CHANNEL, json.dumps(request)
+                )
+            except (OSError, ConnectionError, asyncio.TimeoutError):
+                raise ScannerUnavailable("Broker unreachable")
+            if not receivers:
+                raise ScannerUnavailable()
+            self.calls += 1
+            reply = await asyncio.wait_for(future, self.call_timeout)
+        except asyncio.TimeoutError:
+            raise ScannerUnavailable("Scanner did not answer in time")
+        finally:
+            self.pending.pop(call_id, None)
+        if "error" in reply:
+            raise HTTPException(status_code=reply["status"], detail=reply["error"])
+        return reply["result"]
+
+    async def report_demand(self, watchers: int):
+        """Tell the scanner this worker has callers or streaming clients"""
+        request = {
+            "method": "report_demand",
+            "kwargs": {"worker": self.worker_id, "watchers": watchers},
+        }
+        try:
+            await self.client.publish(CALLS_CHANNEL, json.dumps(request))
+        except (OSError, ConnectionError, asyncio.TimeoutError):
+            pass
+
+    async def get_versions(self) -> Dict[str, str]:
+        await self._require_state()
+        return self.versions
+
+    async def scan_network(self) -> List[NetworkDevice]:
+        state = await self._require_state()
+        if self.devices is None:
+            # Parsed on first use, at most once per published status
+            self.devices = [
+                NetworkDevice(**device) for device in state["status"]["devices"]
+            ]
+            self.registry.update(self.devices, self.versions["snapshot"])
+        return self.devices
+
+    async def get_registry(self) -> DeviceRegistry:
+        await self.scan_network()
+        return self.registry
+
+    async def get_system_stats(self) -> NetworkStats:
+        state = await self._require_state()
+        return NetworkStats(**state["status"]["stats"])
+
+    async def get_activities(self, limit: int = 10):
+        state = await self._require_state()
+        activities = state["status"]["activities"]
+        if limit <= len(activities):
+            return activities[:limit]
+        return await self.call("get_activities", limit=limit)
+
+    async def generate_chart_data(self):
+        state = await self._require_state()
+        return state["status"]["chart_data"]
+
+    async def get_device_history(self, device_id: str, limit: int = 100):
+        return await self.call("get_device_history", device_id=device_id, limit=limit)
+
+    async def get_device_history_version(self, device_id: str) -> int:
+        return await self.call("get_device_history_version", device_id=device_id)
+
+    async def get_device_baseline(self, device_id: str, hour: Optional[int] = None):
+        return await self.call("get_device_baseline", device_id=device_id, hour=hour)
+
+    async def get_device_activities(self, device_id: str, limit: int = 50):
+        return await self.call(
+            "get_device_activities", device_id=device_id, limit=limit
+        )
+
+    async def get_devices_history(
+        self,
+        device_ids: List[str],
+        since=None,
+        until=None,
+        limit: int = 100,
+        columns: bool = False,
+    ) -> Dict[str, Any]:
+        return await self.call(
+            "get_devices_history",
+            device_ids=device_ids,
+            since=since,
+            until=until,
+            limit=limit,
+            columns=columns,
+        )
+
+    async def get_devices_activities(
+        self, device_ids: List[str], since=None, until=None, limit: int = 50
+    ) -> Dict[str, Any]:
+        return await self.call(
+            "get_devices_activities",
+            device_ids=device_ids,
+            since=since,
+            until=until,
+            limit=limit,
+        )
+
+    async def get_devices_availability(
+        self, device_ids: List[str], since=None, until=None
+    ) -> Dict[str, Any]:
+        return await self.call(
+            "get_devices_availability", device_ids=device_ids, since=since, until=until
+        )
+
+    async def get_devices_online(self, since=None, until=None) -> Dict[str, Any]:
+        return await self.call("get_devices_online", since=since, until=until)
+
+    async def export_chunk(
+        self,
+        dataset: str,
+        since=None,
+        until=None,
+        device_ids: Optional[List[str]] = None,
+        cursor=None,
+        limit: int = 5000,
+    ) -> Dict[str, Any]:
+        return await self.call(
+            "export_chunk",
+            dataset=dataset,
+            since=since,
+            until=until,
+            device_ids=device_ids,
+            cursor=cursor,
+            limit=limit,
+        )
+
+    async def get_diagnostics(self) -> Dict[str, Any]:
+        diagnostics = await self.call("get_diagnostics")
+        diagnostics["worker"] = self.get_stats()
+        return diagnostics
+
+    async def get_alerts(self, **filters):
+        return await self.call("get_alerts", **filters)
+
+    async def get_unacknowledged_count(self) -> int:
+        return await self.call("get_unacknowledged_count")
+
+    async def query_alert_history(self, **filters):
+        return await self.call("query_alert_history", **filters)
+
+    async def acknowledge_alert(self, alert_id: str) -> bool:
+        return await self.call("acknowledge_alert", alert_id=alert_id)
+
+    async def get_alert_rules(self):
+        return await self.call("get_alert_rules")
+
+    async def update_alert_rule(self, rule):
+        return await self.call("update_alert_rule", rule=rule)
+
+    def collect_metrics(self):
+        # Scan and alert metrics are recorded by the scanner process
+        QUEUE_DEPTH.set(
+            websocket_manager.get_connection_count(), queue="websocket_clients"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Broker connection state for diagnostics"""
+        state = self.state
+        return {
+            "worker_id": self.worker_id,
+            "broker_url": self.client.url,
+            "connected": self.connected,
+            "state_sequence": state["sequence"] if state else None,
+            "state_age_seconds": (
+                datetime.now().timestamp() - state["published_at"] if state else None
+            ),
+            "calls": self.calls,
+            "pending_calls": len(self.pending),
+        }
@@ -0,0 +1,271 @@
+"""
+Memory governor for per-device state
+Device records, presence, histories, baselines, sessions and alert state
+gain an entry for every MAC ever seen, and phones with randomized MACs keep
+adding new ones. The governor periodically estimates each subsystem's
+footprint per device and, when the total is over budget, evicts all state
+of the devices that were seen least recently (never of devices that are
+present) until it is back under the low-water mark. With a spill file,
+evicted state is written to disk and loaded again when the device
+reconnects; otherwise it is dropped and the device comes back as new.
+
+Spilled state is encoded with marshal, so it must only hold built-in
+types.
+"""
+
+import dbm
+import logging
+import marshal
+import sys
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Eviction stops once usage is below this fraction of the budget, so the
+# governor doesn't evict a device or two on every check
+LOW_WATER = 0.9
+
+# Containers larger than this are sized from a sample of their items
+SAMPLE_ABOVE = 8
+
+_SCALARS = (int, float, str, bytes, bool, type(None))
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate deep size in bytes of built-in containers and scalars;
+    large containers are extrapolated from their first, middle and last
+    items. Shared objects (interned strings, small ints) are counted for
+    every reference, so estimates err on the high side.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, _SCALARS):
+        return size
+    if isinstance(value, dict):
+        items = list(value.items())
+        if len(items) > SAMPLE_ABOVE:
+            sample = [items[0], items[len(items) // 2], items[-1]]
+            per_item = sum(estimate_size(k) + estimate_size(v) for k, v in sample)
+            return size + per_item * len(items) // len(sample)
+        return size + sum(estimate_size(k) + estimate_size(v) for k, v in items)
+    if isinstance(value, (list, tuple, deque)):
+        count = len(value)
+        if count > SAMPLE_ABOVE:
+            sample = [value[0], value[count // 2], value[-1]]
+            return size + sum(map(estimate_size, sample)) * count // len(sample)
+        return size + sum(map(estimate_size, value))
+    return size
+
+
+class DeviceState:
+    """
+    One subsystem's per-device state as the governor sees it: how many
+    bytes a device holds, and how to take its state out (as built-in
+    types) and put it back
+    """
+
+    def __init__(
+        self,
+        name: str,
+        size_of: Callable[[str], int],
+        take: Callable[[str], Any],
+        put: Callable[[str, Any], None],
+    ):
+        self.name = name
+        self.size_of = size_of
+        self.take = take
+        self.put = put
+
+    @classmethod
+    def of_dict(
+        cls,
+        name: str,
+        mapping: Callable[[], Dict[str, Any]],
+        dump: Callable[[Any], Any] = lambda value: value,
+        load: Callable[[Any], Any] = lambda value: value,
+    ) -> "DeviceState":
+        """State kept in a MAC-keyed dict (looked up on every use)"""
+
+        def size_of(mac: str) -> int:
+            value = mapping().get(mac)
+            return estimate_size(value) if value is not None else 0
+
+        def take(mac: str) -> Any:
+            value = mapping().pop(mac, None)
+            return dump(value) if value is not None else None
+
+        def put(mac: str, value: Any):
+            # State gathered since the device reconnected wins
+            if value is not None and mac not in mapping():
+                mapping()[mac] = load(value)
+
+        return cls(name, size_of, take, put)
+
+
+class MemoryGovernor:
+    """
+    Keeps per-device state of all registered subsystems under `budget`
+    bytes. `devices` lists every device's MAC, `last_seen` says when one
+    was last seen and `is_present` protects present devices from eviction.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        devices: Callable[[], Iterable[str]],
+        last_seen: Callable[[str], Optional[float]],
+        is_present: Callable[[str], bool],
+        spill_path: Optional[str] = None,
+        check_interval: float = 60.0,
+    ):
+        self.budget = budget
+        self.devices = devices
+        self.last_seen = last_seen
+        self.is_present = is_present
+        self.spill_path = spill_path
+        self.check_interval = check_interval
+        self.subsystems: List[DeviceState] = []
+        self._spill = None
+
+        self.last_check: Optional[float] = None
+        self.last_check_seconds: Optional[float] = None
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self.total = 0
+        self.over_budget = False
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self.spilled = 0
+        self.recalled = 0
+
+    def register(self, subsystem: DeviceState):
+        self.subsystems.append(subsystem)
+
+    @property
+    def spill(self):
+        """The spill file, opened on first use"""
+        if self._spill is None and self.spill_path:
+            self._spill = dbm.open(self.spill_path, "c")
+        return self._spill
+
+    def maybe_enforce(self, now: float) -> int:
+        """Enforce the budget if check_interval passed since the last check"""
+        if self.last_check is not None and now - self.last_check < self.check_interval:
+            return 0
+        return self.enforce(now)
+
+    def measure(self) -> Dict[str, Dict[str, int]]:
+        """Bytes per device and subsystem, for devices holding any state"""
+        sizes = {}
+        for mac in list(self.devices()):
+            device = {
+                subsystem.name: subsystem.size_of(mac) for subsystem in self.subsystems
+            }
+            if any(device.values()):
+                sizes[mac] = device
+        return sizes
+
+    def enforce(self, now: float) -> int:
+        """Evict least recently seen devices while over budget; the count"""
+        start = time.perf_counter()
+        sizes = self.measure()
+        totals = {subsystem.name: 0 for subsystem in self.subsystems}
+        for device in sizes.values():
+            for name, size in device.items():
+                totals[name] += size
+        total = sum(totals.values())
+
+        evicted = []
+        if total > self.budget:
+            target = self.budget * LOW_WATER
+            candidates = sorted(
+                (self.last_seen(mac) or 0.0, mac)
+                for mac in sizes
+                if not self.is_present(mac)
+            )
+            for _, mac in candidates:
+                if total <= target:
+                    break
+                self._evict(mac)
+                evicted.append(mac)
+                for name, size in sizes.pop(mac).items():
+                    totals[name] -= size
+                    total -= size
+                    self.evicted_bytes += size
+            if evicted:
+                if self.spill is not None and hasattr(self.spill, "sync"):
+                    self.spill.sync()
+                logger.info(
+                    "🧹 Evicted state of %s devices (%s)",
+                    len(evicted),
+                    "spilled to disk" if self.spill is not None else "dropped",
+                )
+
+        # Warn once when present devices alone exceed the budget
+        over_budget = total > self.budget
+        if over_budget and not self.over_budget:
+            logger.warning(
+                "⚠️ Per-device state of present devices uses %s bytes, over the "
+                "%s byte budget",
+                total,
+                self.budget,
+            )
+        self.over_budget = over_budget
+
+        self.usage = {
+            name: {
+                "bytes": totals[name],
+                "devices": sum(1 for device in sizes.values() if device[name]),
+            }
+            for name in totals
+        }
+        self.total = total
+        self.evicted += len(evicted)
+        self.last_check = now
+        self.last_check_seconds = time.perf_counter() - start
+        return len(evicted)
+
+    def _evict(self, mac: str):
+        states = {}
+        for subsystem in self.subsystems:
+            state = subsystem.take(mac)
+            if state is not None:
+                states[subsystem.name] = state
+        if self.spill is not None:
+            self.spill[mac] = marshal.dumps(states)
+            self.spilled += 1
+
+    def recall(self, mac: str) -> bool:
+        """
+        A device the subsystems don't know showed up: put back the state
+        spilled when it was evicted (subsystems without spilled state get
+        None). Returns False if nothing was spilled for it.
+        """
+        if self.spill is None or mac not in self.spill:
+            return False
+        states = marshal.loads(self.spill[mac])
+        del self.spill[mac]
+        self.recalled += 1
+        for subsystem in self.subsystems:
+            subsystem.put(mac, states.get(subsystem.name))
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "budget_bytes": self.budget,
+            "used_bytes": self.total,
+            "over_budget": self.over_budget,
+            "subsystems": self.usage,
+            "evicted_devices": self.evicted,
+            "evicted_bytes": self.evicted_bytes,
+            "spilled_devices": self.spilled,
+            "recalled_devices": self.recalled,
+            "spill_path": self.spill_path,
+            "last_check_seconds": self.last_check_seconds,
+        }
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
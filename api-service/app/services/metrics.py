@@ -0,0 +1,268 @@
+"""
+In-process metrics for AetherLink
+Minimal counters, gauges and histograms rendered in the Prometheus text
+exposition format. Recording a sample is a dict lookup plus a bisect, so
+instrumenting the hot path costs microseconds per scan.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+LabelKey = Tuple[str, ...]
+
+# Latency buckets in seconds, from sub-millisecond to tens of seconds
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelKey, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, tuple(labelnames))
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self.values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, tuple(labelnames))
+        self.values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str):
+        self.values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self.values.items()
+        ]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observed values"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, tuple(labelnames))
+        self.bounds = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self.values: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels) if labels else ()
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+        entry[0][bisect_left(self.bounds, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the enclosed block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                labels = _format_labels(self.labelnames, key, le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them for scraping"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and hot path metrics
+registry = MetricsRegistry()
+
+SCAN_DURATION = registry.histogram(
+    "aetherlink_scan_duration_seconds",
+    "Time spent in device discovery per scan",
+    ("backend",),
+)
+SCAN_PROCESSING = registry.histogram(
+    "aetherlink_scan_processing_seconds",
+    "Time spent processing discovery results per scan",
+)
+SCAN_DEVICES = registry.gauge(
+    "aetherlink_scan_devices", "Devices reported by the latest scan"
+)
+PING_SWEEP_DURATION = registry.histogram(
+    "aetherlink_ping_sweep_duration_seconds",
+    "Total time spent pinging devices during one scan",
+)
+DNS_LOOKUP_DURATION = registry.histogram(
+    "aetherlink_dns_lookup_duration_seconds", "Reverse DNS lookup latency"
+)
+ALERT_EVALUATION_DURATION = registry.histogram(
+    "aetherlink_alert_evaluation_duration_seconds",
+    "Time spent evaluating alert rules for one scan",
+)
+ANOMALY_SCORING_DURATION = registry.histogram(
+    "aetherlink_anomaly_scoring_duration_seconds",
+    "Time spent scoring and learning device baselines for one scan",
+)
+BROADCAST_DURATION = registry.histogram(
+    "aetherlink_broadcast_duration_seconds",
+    "Time spent fanning a message out to WebSocket clients",
+    ("type",),
+)
+BROADCAST_FRAMES = registry.counter(
+    "aetherlink_broadcast_frames_total",
+    "WebSocket frames sent, by message type",
+    ("type",),
+)
+BROADCAST_FAILURES = registry.counter(
+    "aetherlink_broadcast_failures_total", "WebSocket sends that failed"
+)
+QUEUE_DEPTH = registry.gauge(
+    "aetherlink_queue_depth", "Items waiting in internal queues", ("queue",)
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "aetherlink_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route HTTP request latency"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Use the route template so ids don't explode label cardinality
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status["code"]),
+            )
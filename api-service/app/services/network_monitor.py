@@ -4,23 +4,68 @@ Handles device discovery, network statistics, and activity tracking
 Enhanced version with extensive data collection and caching
 """
 
+import asyncio
+import logging
 import subprocess
 import re
 import psutil
 import time
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from functools import cached_property
+from itertools import islice
+from operator import itemgetter
+from typing import List, Dict, Optional, Any, Set, Union
 from collections import deque, defaultdict
+from app.config import settings
+from app.logging_setup import get_logging_stats
 from app.models.network import (
     NetworkDevice,
     NetworkStats,
     NetworkActivity,
     ChartDataPoint,
+    Alert,
 )
-from app.services.mac_vendors import MAC_VENDORS
 from app.services.alert_manager import AlertManager
+from app.services.alert_notifier import AlertNotifier
+from app.services.baselines import DeviceBaselines
+from app.services.device_registry import DeviceRegistry, device_id
+from app.services.discovery import (
+    ArpTableBackend,
+    DiscoveryBackend,
+    NeighborTableBackend,
+    create_backend,
+)
+from app.services.memory_governor import DeviceState, MemoryGovernor, estimate_size
+from app.services.metrics import (
+    ALERT_EVALUATION_DURATION,
+    ANOMALY_SCORING_DURATION,
+    DNS_LOOKUP_DURATION,
+    PING_SWEEP_DURATION,
+    SCAN_DEVICES,
+    SCAN_DURATION,
+    SCAN_PROCESSING,
+    QUEUE_DEPTH,
+)
+from app.services.presence import PresenceTracker
+from app.services.sessions import PresenceSessions
 from app.services.websocket_manager import manager as websocket_manager
 
+logger = logging.getLogger(__name__)
+
+# Fields of the tuples kept in device_history
+HISTORY_FIELDS = (
+    "timestamp",
+    "status",
+    "latency",
+    "packet_loss",
+    "connection_quality",
+    "ip",
+)
+
+# Seconds a confirm probe may take before the device counts as not answering
+PROBE_TIMEOUT = 3.0
+
 
 class NetworkMonitorService:
     """
@@ -29,23 +74,67 @@ class NetworkMonitorService:
     - Historical data tracking (24h network history)
     - Per-device bandwidth monitoring
     - Activity tracking (connects, disconnects, IP changes)
+    - Presence grace period so transient misses don't cause churn
     """
 
-    def __init__(self, network_prefix: str = "192.168.1"):
+    def __init__(
+        self,
+        network_prefix: str = "192.168.1",
+        offline_grace: float = 60.0,
+        confirm_probes: int = 2,
+        alert_history_size: int = 10000,
+        alert_history_path: Optional[str] = None,
+        discovery: Union[str, DiscoveryBackend] = "auto",
+        discovery_options: Optional[Dict[str, Any]] = None,
+        memory_budget_mb: float = 256.0,
+        memory_spill_path: Optional[str] = None,
+        memory_check_interval: float = 60.0,
+        connection_manager=None,
+    ):
         self.network_prefix = network_prefix
-        self.network_interface = self._detect_network_interface()
 
-        # Device tracking
+        # Device discovery: a backend instance or a backend name
+        # (arp-scan with arp -a fallback by default). Named backends, and the
+        # interface detection they need, are built on first use.
+        if isinstance(discovery, str):
+            self.discovery_config = (discovery, discovery_options or {})
+        else:
+            self.discovery = discovery
+
+        # Device tracking (entries are kept while a device is offline)
         self.known_devices: Dict[str, Dict[str, Any]] = {}
+        # Per-device snapshots as compact HISTORY_FIELDS tuples
         self.device_history: Dict[str, deque] = {}
+        # Latest snapshot indexed by id, MAC, IP and name
+        self.registry = DeviceRegistry()
+
+        # Presence state machine (online -> suspect -> offline); suspect
+        # devices are probed by the scan, see _probe_devices
+        self.presence = PresenceTracker(
+            offline_grace=offline_grace, confirm_probes=confirm_probes
+        )
+        # Confirmed offline devices still waiting for the offline alert
+        # rule, as their last snapshot with status "offline"
+        self.offline_pending: Dict[str, NetworkDevice] = {}
+
+        # Online intervals per device, for availability queries
+        self.sessions = PresenceSessions()
 
         # Activity tracking
         self.activity_log: List[NetworkActivity] = []
         self.activity_counter = 0
 
+        # Snapshot version: bumped when a scan changes the device list in a
+        # way clients care about (membership, addresses, status, quality)
+        self.snapshot_version = 0
+        self.snapshot_key: Optional[int] = None
+
         # Network history (24h @ 1 minute intervals)
         self.network_history: deque = deque(maxlen=1440)
 
+        # Hour-of-day latency/loss baselines and anomaly scores per device
+        self.baselines = DeviceBaselines()
+
         # Bandwidth tracking per device
         self.device_bandwidth: Dict[str, deque] = defaultdict(lambda: deque(maxlen=60))
 
@@ -55,15 +144,54 @@ class NetworkMonitorService:
         # Caching mechanism
         self.cache_duration = 5  # Cache for 5 seconds
         self.last_scan_time: Optional[float] = None
+        self.ping_seconds = 0.0
         self.cached_devices: List[NetworkDevice] = []
         self.cached_stats: Optional[NetworkStats] = None
+        self.stats_time: Optional[float] = None
+        # Bumped for every stats sample (chart data follows the samples)
+        self.stats_version = 0
 
-        # Initial network I/O baseline for speed calculation
-        self.last_net_io = psutil.net_io_counters()
+        # Network I/O baseline for speed calculation, taken on first use
+        self.last_net_io = None
         self.last_net_io_time = time.time()
 
         # Alert management
-        self.alert_manager = AlertManager()
+        self.alert_manager = AlertManager(
+            max_history=alert_history_size,
+            history_path=alert_history_path,
+            clock=self.clock,
+        )
+        # Alert batches go to WebSocket clients (or, in the scanner process,
+        # to the API workers through the broker)
+        self.alert_notifier = AlertNotifier(connection_manager or websocket_manager)
+
+        # Keeps per-device state (device records, presence, histories,
+        # baselines, sessions, alert state) within a memory budget
+        self.governor = MemoryGovernor(
+            budget=int(memory_budget_mb * 1024 * 1024),
+            devices=lambda: self.known_devices,
+            last_seen=self.presence.get_last_seen,
+            is_present=self.presence.is_present,
+            spill_path=memory_spill_path,
+            check_interval=memory_check_interval,
+        )
+        self._register_device_state()
+
+    @cached_property
+    def network_interface(self) -> Optional[str]:
+        return self._detect_network_interface()
+
+    @cached_property
+    def discovery(self) -> DiscoveryBackend:
+        name, options = self.discovery_config
+        return create_backend(name, self.network_interface, **options)
+
+    def clock(self) -> float:
+        """
+        Current time for presence, sessions, baselines and alert rules: the
+        discovery backend's clock when it has one (a replayed trace)
+        """
+        return getattr(self.discovery, "clock", time.time)()
 
     def _detect_network_interface(self) -> Optional[str]:
         """
@@ -84,7 +212,7 @@ class NetworkMonitorService:
                     if stats[iface_name].isup:
                         # Skip loopback
                         if iface_name.lower() != "lo":
-                            print(f"🌐 Detected network interface: {iface_name}")
+                            logger.info("🌐 Detected network interface: %s", iface_name)
                             return iface_name
 
             # Fall back to first active non-loopback interface
@@ -93,23 +221,26 @@ class NetworkMonitorService:
                     # Skip loopback, docker, and virtual interfaces
                     skip_names = ["docker", "veth", "br-", "lo"]
                     if not any(x in iface_name.lower() for x in skip_names):
-                        print(f"🌐 Detected network interface: {iface_name}")
+                        logger.info("🌐 Detected network interface: %s", iface_name)
                         return iface_name
 
-            print("⚠️ No active network interface found")
+            logger.warning("⚠️ No active network interface found")
             return None
 
         except Exception as e:
-            print(f"❌ Error detecting network interface: {e}")
+            logger.error("❌ Error detecting network interface: %s", e)
             return None
 
     def get_mac_vendor(self, mac: str) -> Optional[Dict[str, str]]:
         """Get vendor information from MAC address OUI"""
+        from app.services.mac_vendors import MAC_VENDORS
+
         oui = mac[:8].lower()
         return MAC_VENDORS.get(oui)
 
     def reverse_dns_lookup(self, ip: str) -> Optional[str]:
         """Attempt to get hostname via reverse DNS"""
+        start = time.perf_counter()
         try:
             import socket
 
@@ -117,19 +248,22 @@ class NetworkMonitorService:
             return hostname if hostname != ip else None
         except Exception:
             return None
+        finally:
+            DNS_LOOKUP_DURATION.observe(time.perf_counter() - start)
 
-    def ping_device(self, ip: str) -> tuple[Optional[float], float]:
+    def ping_device(self, ip: str, count: int = 3) -> tuple[Optional[float], float]:
         """
         Ping a device to measure latency and packet loss
         Returns (latency_ms, packet_loss_percentage)
         """
+        start = time.perf_counter()
         try:
-            # Send 3 pings with 1 second timeout
+            # Send `count` pings with 1 second timeout
             result = subprocess.run(
-                ["ping", "-c", "3", "-W", "1", ip],
+                ["ping", "-c", str(count), "-W", "1", ip],
                 capture_output=True,
                 text=True,
-                timeout=4,
+                timeout=count + 1,
             )
 
             if result.returncode == 0:
@@ -152,6 +286,9 @@ class NetworkMonitorService:
 
         except (subprocess.TimeoutExpired, Exception):
             return None, 100.0
+        finally:
+            # Summed per scan into the ping sweep duration
+            self.ping_seconds += time.perf_counter() - start
 
     def assess_connection_quality(self, latency: Optional[float], packet_loss: float):
         """
@@ -180,8 +317,8 @@ class NetworkMonitorService:
         if hostname and hostname != ip and "?" not in hostname:
             return hostname
 
-        # Try reverse DNS lookup
-        dns_name = self.reverse_dns_lookup(ip)
+        # Try reverse DNS lookup (skipped for simulated discovery)
+        dns_name = self.reverse_dns_lookup(ip) if self.discovery.live else None
         if dns_name:
             return dns_name
 
@@ -214,152 +351,6 @@ class NetworkMonitorService:
         elapsed = time.time() - self.last_scan_time
         return elapsed < self.cache_duration
 
-    def _scan_with_arp_scan(self) -> Optional[List[Dict[str, Any]]]:
-        """
-        Use arp-scan for fast, active network scanning
-        Returns list of dicts with {ip, mac, vendor, response_time}
-        Returns None if arp-scan fails
-        """
-        if not self.network_interface:
-            print("⚠️ No network interface detected for arp-scan")
-            return None
-
-        try:
-            # Run arp-scan with retry and timeout
-            # Note: Requires cap_net_raw capability or sudo
-            cmd = [
-                "arp-scan",
-                "--interface",
-                self.network_interface,
-                "--localnet",
-                "--retry",
-                "2",
-                "--timeout",
-                "500",
-                "--quiet",
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-
-            if result.returncode != 0:
-                print(f"⚠️ arp-scan failed: {result.stderr}")
-                return None
-
-            devices = []
-            duplicate_ips = []
-
-            # Parse arp-scan output
-            # Format: IP\tMAC\tVendor\tResponse_time
-            # Example: 192.168.1.1\t00:11:22:33:44:55\tApple\t0.123ms
-            lines = result.stdout.strip().split("\n")
-
-            for line in lines:
-                # Skip empty lines and headers
-                if not line or line.startswith("#"):
-                    continue
-
-                # Check for duplicate IP warnings
-                if "DUP" in line or "duplicate" in line.lower():
-                    # Extract IP from duplicate warning
-                    ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", line)
-                    if ip_match:
-                        duplicate_ips.append(ip_match.group(1))
-                    continue
-
-                # Parse device line
-                parts = line.split("\t")
-                if len(parts) < 2:
-                    continue
-
-                ip = parts[0].strip()
-                mac = parts[1].strip().lower()
-                vendor = parts[2].strip() if len(parts) > 2 else None
-
-                # Parse response time (e.g., "0.123ms")
-                response_time = None
-                if len(parts) > 3:
-                    time_str = parts[3].strip()
-                    time_match = re.search(r"([\d.]+)", time_str)
-                    if time_match:
-                        response_time = float(time_match.group(1))
-
-                devices.append(
-                    {
-                        "ip": ip,
-                        "mac": mac,
-                        "vendor": vendor,
-                        "response_time": response_time,
-                    }
-                )
-
-            # Log duplicate IPs
-            for dup_ip in duplicate_ips:
-                self.activity_counter += 1
-                activity = NetworkActivity(
-                    id=f"activity-{self.activity_counter}-"
-                    f"{int(datetime.now().timestamp())}",
-                    device=f"Multiple devices at {dup_ip}",
-                    action="⚠️ Duplicate IP address detected",
-                    timestamp=datetime.now(),
-                )
-                self.activity_log.insert(0, activity)
-                print(f"⚠️ Duplicate IP detected: {dup_ip}")
-
-            print(f"✅ arp-scan found {len(devices)} devices")
-            return devices
-
-        except subprocess.TimeoutExpired:
-            print("⚠️ arp-scan timed out")
-            return None
-        except FileNotFoundError:
-            print("⚠️ arp-scan not found in PATH")
-            return None
-        except Exception as e:
-            print(f"⚠️ arp-scan error: {e}")
-            return None
-
-    def _scan_with_arp_table(self) -> List[Dict[str, Any]]:
-        """
-        Fallback: Use traditional arp -a scanning
-        Returns list of dicts with {ip, mac, hostname}
-        """
-        devices = []
-
-        try:
-            result = subprocess.run(
-                ["arp", "-a"], capture_output=True, text=True, timeout=3
-            )
-
-            if result.returncode != 0:
-                return devices
-
-            for line in result.stdout.split("\n"):
-                ip_match = re.search(r"\((\d+\.\d+\.\d+\.\d+)\)", line)
-                mac_match = re.search(
-                    r"([0-9a-f]{1,2}[:-]){5}[0-9a-f]{1,2}", line, re.IGNORECASE
-                )
-
-                if ip_match and mac_match:
-                    ip = ip_match.group(1)
-                    mac = mac_match.group(0).lower()
-
-                    if mac == "00:00:00:00:00:00":
-                        continue
-                    if "incomplete" in line.lower():
-                        continue
-
-                    hostname_match = re.match(r"^(\S+)\s+\(", line)
-                    hostname = hostname_match.group(1) if hostname_match else None
-
-                    devices.append({"ip": ip, "mac": mac, "hostname": hostname})
-
-            print(f"✅ arp -a found {len(devices)} devices")
-            return devices
-
-        except Exception as e:
-            print(f"❌ Error with arp -a: {e}")
-            return devices
-
     async def scan_network(self) -> List[NetworkDevice]:
         """
         Scan network for connected devices using arp-scan (with fallback)
@@ -367,27 +358,34 @@ class NetworkMonitorService:
         """
         # Return cached data if valid
         if self.is_cache_valid():
-            print("📦 Returning cached devices")
+            logger.info("📦 Returning cached devices", extra={"sample": 0.01})
             return self.cached_devices
 
         devices = []
         seen_macs = set()
-        current_macs = set()
 
-        # Try arp-scan first (faster, more reliable)
-        scan_results = self._scan_with_arp_scan()
-
-        # Fall back to arp -a if arp-scan fails
-        if scan_results is None:
-            print("📋 Falling back to arp -a scanning")
-            scan_results = self._scan_with_arp_table()
+        # Discover devices with the configured backend
+        with SCAN_DURATION.time(backend=self.discovery.name):
+            scan_results = self.discovery.discover() or []
 
+        processing_start = time.perf_counter()
+        self.ping_seconds = 0.0
         try:
+            scan_time = self.clock()
+
             # Process scan results
             for result in scan_results:
                 ip = result.get("ip")
                 mac = result.get("mac")
 
+                if result.get("duplicate"):
+                    self._log_activity(
+                        f"Multiple devices at {ip}",
+                        "⚠️ Duplicate IP address detected",
+                    )
+                    logger.warning("⚠️ Duplicate IP detected: %s", ip, extra={"ip": ip})
+                    continue
+
                 # Skip if already seen or invalid
                 if not ip or not mac:
                     continue
@@ -395,7 +393,10 @@ class NetworkMonitorService:
                     continue
 
                 seen_macs.add(mac)
-                current_macs.add(mac)
+                if mac not in self.presence.devices:
+                    # New, or evicted while away: bring back its spilled
+                    # state so it reconnects as the known device it is
+                    self.governor.recall(mac)
 
                 # Get hostname from result or None
                 hostname = result.get("hostname")
@@ -442,138 +443,145 @@ class NetworkMonitorService:
                     connection_quality = self.assess_connection_quality(
                         latency, packet_loss
                     )
-                else:
+                elif mac not in self.known_devices and self.discovery.live:
                     # Fallback: ping only if arp-scan didn't provide time
-                    if mac not in self.known_devices:
-                        latency, packet_loss = self.ping_device(ip)
-                        connection_quality = self.assess_connection_quality(
-                            latency, packet_loss
-                        )
+                    latency, packet_loss = self.ping_device(ip)
+                    connection_quality = self.assess_connection_quality(
+                        latency, packet_loss
+                    )
 
-                    # Get first_seen and total_connections from history
-                    first_seen = None
-                    total_connections = None
-                    if mac in self.known_devices:
-                        first_seen = self.known_devices[mac].get("first_seen")
-                        total_connections = self.known_devices[mac].get(
-                            "connections", 1
-                        )
+                # Advance presence state machine before touching history
+                previous_state = self.presence.mark_seen(mac, scan_time)
+                self.offline_pending.pop(mac, None)
+                if previous_state is None or previous_state == "offline":
+                    self.sessions.open_session(mac, scan_time)
 
-                    device = NetworkDevice(
-                        id=mac.replace(":", "").replace("-", ""),
-                        name=device_name,
-                        ip=ip,
-                        mac=mac,
-                        status="online",
-                        type=device_type,
-                        vendor=vendor_name,
-                        last_seen=datetime.now(),
-                        latency=latency,
-                        packet_loss=packet_loss,
-                        connection_quality=connection_quality,
-                        first_seen=first_seen,
-                        total_connections=total_connections,
-                    )
-                    devices.append(device)
-
-                    # Track device history for trend analysis (keep last 100 snapshots)
-                    if mac not in self.device_history:
-                        self.device_history[mac] = deque(maxlen=100)
-
-                    history_snapshot = {
-                        "timestamp": datetime.now(),
-                        "status": "online",
-                        "latency": latency,
-                        "packet_loss": packet_loss,
-                        "connection_quality": connection_quality,
+                # Track device info
+                if mac not in self.known_devices:
+                    # New device connected
+                    self.known_devices[mac] = {
                         "ip": ip,
+                        "name": device_name,
+                        "first_seen": datetime.now(),
+                        "connections": 1,
+                        "last_latency": latency,
+                        "last_packet_loss": packet_loss,
                     }
-                    self.device_history[mac].append(history_snapshot)
-
-                    # Evaluate device for alerts
-                    alerts = self.alert_manager.evaluate_device(device)
-                    for alert in alerts:
-                        # Add to activity log for visibility
-                        self.activity_counter += 1
-                        activity = NetworkActivity(
-                            id=(
-                                f"activity-{self.activity_counter}-"
-                                f"{int(datetime.now().timestamp())}"
-                            ),
-                            device=device_name,
-                            action=f"Alert: {alert.title}",
-                            timestamp=datetime.now(),
-                        )
-                        self.activity_log.insert(0, activity)
+                    self._log_activity(
+                        device_name, "Connected to network", device_id(mac)
+                    )
+                    logger.info(
+                        "🆕 New device: %s (%s)", device_name, mac, extra={"mac": mac}
+                    )
+                elif previous_state == "offline":
+                    # Known device came back after being confirmed offline
+                    info = self.known_devices[mac]
+                    info["ip"] = ip
+                    info["name"] = device_name
+                    info["connections"] = info.get("connections", 1) + 1
+                    self._log_activity(
+                        device_name, "Reconnected to network", device_id(mac)
+                    )
+                    logger.info(
+                        "🟢 Reconnected: %s (%s)", device_name, mac, extra={"mac": mac}
+                    )
+                elif self.known_devices[mac]["ip"] != ip:
+                    # IP address changed
+                    old_ip = self.known_devices[mac]["ip"]
+                    self.known_devices[mac]["ip"] = ip
+                    self._log_activity(
+                        device_name,
+                        f"IP changed from {old_ip} to {ip}",
+                        device_id(mac),
+                    )
+                    logger.info("🔄 IP change: %s %s -> %s", device_name, old_ip, ip)
+
+                info = self.known_devices[mac]
+                info["last_latency"] = latency
+                info["last_packet_loss"] = packet_loss
+
+                device = NetworkDevice(
+                    id=device_id(mac),
+                    name=device_name,
+                    ip=ip,
+                    mac=mac,
+                    status="online",
+                    type=device_type,
+                    vendor=vendor_name,
+                    last_seen=datetime.now(),
+                    latency=latency,
+                    packet_loss=packet_loss,
+                    connection_quality=connection_quality,
+                    first_seen=info.get("first_seen"),
+                    total_connections=info.get("connections", 1),
+                )
+                devices.append(device)
+                info["device"] = device
 
-                        # Broadcast alert via WebSocket for real-time updates
-                        import asyncio
+                # Track device history for trend analysis (keep last 100 snapshots)
+                if mac not in self.device_history:
+                    self.device_history[mac] = deque(maxlen=100)
 
-                        asyncio.create_task(
-                            websocket_manager.broadcast_alert(
-                                alert.model_dump(mode="json")
-                            )
-                        )
+                self.device_history[mac].append(
+                    (scan_time, "online", latency, packet_loss, connection_quality, ip)
+                )
 
-                    # Track device info
-                    if mac not in self.known_devices:
-                        # New device connected
-                        self.known_devices[mac] = {
-                            "ip": ip,
-                            "name": device_name,
-                            "first_seen": datetime.now(),
-                            "connections": 1,
-                            "last_latency": latency,
-                            "last_packet_loss": packet_loss,
-                        }
-                        self.activity_counter += 1
-                        activity = NetworkActivity(
-                            id=(
-                                f"activity-{self.activity_counter}-"
-                                f"{int(datetime.now().timestamp())}"
-                            ),
-                            device=device_name,
-                            action="Connected to network",
-                            timestamp=datetime.now(),
-                        )
-                        self.activity_log.insert(0, activity)
-                        print(f"🆕 New device: {device_name} ({mac})")
-                    elif self.known_devices[mac]["ip"] != ip:
-                        # IP address changed
-                        old_ip = self.known_devices[mac]["ip"]
-                        self.known_devices[mac]["ip"] = ip
-                        self.activity_counter += 1
-                        activity = NetworkActivity(
-                            id=(
-                                f"activity-{self.activity_counter}-"
-                                f"{int(datetime.now().timestamp())}"
-                            ),
-                            device=device_name,
-                            action=f"IP changed from {old_ip} to {ip}",
-                            timestamp=datetime.now(),
+            # Devices missing from this scan go through the grace period,
+            # probing the suspect ones whose grace period is over
+            responded = await self._probe_devices(
+                self.presence.due_for_probe(seen_macs, scan_time)
+            )
+            for mac, state in self.presence.sweep(seen_macs, scan_time, responded):
+                if state == "offline":
+                    # The session ends when the device was last seen, not
+                    # when the grace period confirmed it gone
+                    self.sessions.close_session(mac, self.presence.get_last_seen(mac))
+                    info = self.known_devices[mac]
+                    if "device" in info:
+                        self.offline_pending[mac] = info["device"].model_copy(
+                            update={"status": "offline"}
                         )
-                        self.activity_log.insert(0, activity)
-                        print(f"🔄 IP change: {device_name} {old_ip} -> {ip}")
-
-            # Check for disconnected devices
-            for mac, info in list(self.known_devices.items()):
-                if mac not in current_macs:
-                    self.activity_counter += 1
-                    activity = NetworkActivity(
-                        id=(
-                            f"activity-{self.activity_counter}-"
-                            f"{int(datetime.now().timestamp())}"
-                        ),
-                        device=info["name"],
-                        action="Disconnected from network",
-                        timestamp=datetime.now(),
+                    self._log_activity(
+                        info["name"], "Disconnected from network", device_id(mac)
+                    )
+                    logger.info(
+                        "🔴 Disconnected: %s (%s)",
+                        info["name"],
+                        mac,
+                        extra={"mac": mac},
                     )
-                    self.activity_log.insert(0, activity)
-                    print(f"🔴 Disconnected: {info['name']} ({mac})")
-                    del self.known_devices[mac]
+
+            # Score this scan against every device's usual latency and loss
+            # for the hour, all devices at once
+            with ANOMALY_SCORING_DURATION.time():
+                self.baselines.observe(devices, scan_time)
+
+            # Missing devices that are still present (within the grace
+            # window, or answering probes) keep being reported online
+            for mac, info in self.known_devices.items():
+                if (
+                    mac not in seen_macs
+                    and "device" in info
+                    and self.presence.is_present(mac)
+                ):
+                    devices.append(info["device"])
+
+            # Evaluate the whole scan against alert rules in one pass; offline
+            # devices only until the offline threshold rule has decided
+            with ALERT_EVALUATION_DURATION.time():
+                alerts = self.alert_manager.evaluate_devices(
+                    [d for d in devices if d.mac in seen_macs]
+                    + list(self.offline_pending.values())
+                )
+            self._handle_alerts(alerts)
+            for mac, device in list(self.offline_pending.items()):
+                if not self.alert_manager.awaits_offline_alert(device.id):
+                    del self.offline_pending[mac]
 
             # Update cache
             self.cached_devices = devices
+            self._update_snapshot_version(devices)
+            self.registry.update(devices, self.snapshot_version)
             self.last_scan_time = time.time()
 
             # Store in network history
@@ -585,21 +593,241 @@ class NetworkMonitorService:
                 }
             )
 
-            print(f"✅ Found {len(devices)} devices from ARP table")
+            # Evict least recently seen devices' state when over budget
+            self.governor.maybe_enforce(scan_time)
+
+            PING_SWEEP_DURATION.observe(self.ping_seconds)
+            SCAN_PROCESSING.observe(time.perf_counter() - processing_start)
+            SCAN_DEVICES.set(len(devices))
+
+            logger.info("✅ Found %s devices from ARP table", len(devices))
 
         except subprocess.TimeoutExpired:
-            print("⚠️ ARP scan timed out")
+            logger.warning("⚠️ ARP scan timed out")
             return self.cached_devices if self.cached_devices else []
         except Exception as e:
-            print(f"❌ Error scanning network: {e}")
+            logger.error("❌ Error scanning network: %s", e)
             return self.cached_devices if self.cached_devices else []
 
         return devices
 
+    def _register_device_state(self):
+        """Per-device state the memory governor may evict and spill"""
+        governor = self.governor
+        governor.register(
+            DeviceState(
+                "known_devices",
+                self._known_device_bytes,
+                self._evict_known_device,
+                self._restore_known_device,
+            )
+        )
+        governor.register(
+            DeviceState.of_dict("presence", lambda: self.presence.devices)
+        )
+        known_ids = DeviceState.of_dict("registry", lambda: self.registry.known)
+        governor.register(
+            DeviceState(
+                "registry",
+                lambda mac: known_ids.size_of(device_id(mac)),
+                lambda mac: known_ids.take(device_id(mac)),
+                lambda mac, known: known_ids.put(device_id(mac), known),
+            )
+        )
+        governor.register(
+            DeviceState.of_dict(
+                "device_history",
+                lambda: self.device_history,
+                dump=list,
+                load=lambda rows: deque(map(tuple, rows), maxlen=100),
+            )
+        )
+        governor.register(
+            DeviceState.of_dict(
+                "device_bandwidth",
+                lambda: self.device_bandwidth,
+                dump=list,
+                load=lambda samples: deque(samples, maxlen=60),
+            )
+        )
+        governor.register(
+            DeviceState(
+                "baselines",
+                self.baselines.device_bytes,
+                self.baselines.evict,
+                self.baselines.restore_device,
+            )
+        )
+        governor.register(
+            DeviceState(
+                "sessions",
+                self.sessions.device_bytes,
+                self.sessions.evict,
+                self.sessions.restore_device,
+            )
+        )
+        governor.register(
+            DeviceState(
+                "alerts",
+                lambda mac: self.alert_manager.device_bytes(device_id(mac)),
+                lambda mac: self.alert_manager.evict_device(device_id(mac)),
+                lambda mac, state: self.alert_manager.restore_device(
+                    device_id(mac), state
+                ),
+            )
+        )
+
+    def _known_device_bytes(self, mac: str) -> int:
+        info = self.known_devices.get(mac)
+        if info is None:
+            return 0
+        size = estimate_size({key: info[key] for key in info if key != "device"})
+        if "device" in info:
+            size += estimate_size(vars(info["device"]))
+        return size
+
+    def _evict_known_device(self, mac: str) -> Optional[Dict[str, Any]]:
+        info = self.known_devices.pop(mac, None)
+        self.offline_pending.pop(mac, None)
+        return self._dump_known_device(info) if info is not None else None
+
+    def _restore_known_device(self, mac: str, entry: Optional[Dict[str, Any]]):
+        if entry is not None and mac not in self.known_devices:
+            self.known_devices[mac] = self._load_known_device(entry)
+
+    @staticmethod
+    def _dump_known_device(info: Dict[str, Any]) -> Dict[str, Any]:
+        """A known_devices entry as built-in types (checkpoints, spilling)"""
+        entry = {
+            "ip": info["ip"],
+            "name": info["name"],
+            "first_seen": info["first_seen"].timestamp(),
+            "connections": info.get("connections", 1),
+            "last_latency": info.get("last_latency"),
+            "last_packet_loss": info.get("last_packet_loss"),
+        }
+        if "device" in info:
+            entry["device"] = info["device"].model_dump_json()
+        return entry
+
+    @staticmethod
+    def _load_known_device(entry: Dict[str, Any]) -> Dict[str, Any]:
+        info = dict(entry, first_seen=datetime.fromtimestamp(entry["first_seen"]))
+        if "device" in entry:
+            info["device"] = NetworkDevice.model_validate_json(entry["device"])
+        return info
+
+    def _update_snapshot_version(self, devices: List[NetworkDevice]):
+        """
+        Bump the snapshot version if the scan changed anything beyond
+        per-scan measurements (last_seen, latency, packet loss, anomaly score)
+        """
+        key = hash(
+            tuple(
+                (
+                    d.id,
+                    d.name,
+                    d.ip,
+                    d.status,
+                    d.connection_quality,
+                    d.total_connections,
+                )
+                for d in devices
+            )
+        )
+        if key != self.snapshot_key:
+            self.snapshot_key = key
+            self.snapshot_version += 1
+
+    def _log_activity(
+        self, device_name: str, action: str, device_id: Optional[str] = None
+    ):
+        """Prepend an activity entry to the activity log"""
+        self.activity_counter += 1
+        activity = NetworkActivity(
+            id=f"activity-{self.activity_counter}-{int(datetime.now().timestamp())}",
+            device=device_name,
+            device_id=device_id,
+            action=action,
+            timestamp=datetime.now(),
+        )
+        self.activity_log.insert(0, activity)
+
+    def _handle_alerts(self, alerts: List[Alert]):
+        """Log alert events as activities and queue them for broadcast"""
+        for alert in alerts:
+            # Add to activity log for visibility
+            if alert.resolved:
+                action = f"Alert resolved: {alert.title}"
+            else:
+                action = f"Alert: {alert.title}"
+            self._log_activity(alert.device_name or "Network", action, alert.device_id)
+
+        # Delivered to WebSocket clients in batches
+        self.alert_notifier.notify(alerts)
+
+    @cached_property
+    def neighbor_tables(self) -> List[DiscoveryBackend]:
+        """Readers of the kernel IP -> MAC cache, to check who answered a probe"""
+        return [NeighborTableBackend(), ArpTableBackend()]
+
+    def _read_neighbor_table(self) -> List[Dict[str, Any]]:
+        """Neighbor cache entries; a reader that fails is not tried again"""
+        tables = self.neighbor_tables
+        while len(tables) > 1:
+            entries = tables[0].discover()
+            if entries is not None:
+                return entries
+            tables.pop(0)
+        return tables[0].discover() or []
+
+    async def _probe_devices(self, macs: List[str]) -> Set[str]:
+        """
+        Confirm probes for suspect devices, run concurrently in threads: a
+        device answers if its last known IP replies to a ping and the kernel
+        then maps that IP to the device's MAC, since DHCP may have handed
+        the address to another device
+        Returns the MACs of the devices that answered
+        """
+        if not macs or not self.discovery.live:
+            return set()
+        targets = {
+            mac: self.known_devices[mac]["ip"]
+            for mac in macs
+            if mac in self.known_devices
+        }
+
+        async def ping(ip: str) -> bool:
+            try:
+                latency, _ = await asyncio.wait_for(
+                    asyncio.to_thread(self.ping_device, ip, 1), PROBE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                return False
+            return latency is not None
+
+        answers = await asyncio.gather(*(ping(ip) for ip in targets.values()))
+        replied = {
+            mac: ip for (mac, ip), answered in zip(targets.items(), answers) if answered
+        }
+        if not replied:
+            return set()
+        table = await asyncio.to_thread(self._read_neighbor_table)
+        owners = {entry["ip"]: entry["mac"] for entry in table}
+        return {mac for mac, ip in replied.items() if owners.get(ip) == mac}
+
     async def get_system_stats(self) -> NetworkStats:
         """
         Get detailed system network statistics with speed calculation
+        Sampled at most once per cache window, so polling clients share a
+        sample (and its ETag) instead of each adding a chart point
         """
+        if (
+            self.cached_stats is not None
+            and time.time() - self.stats_time < self.cache_duration
+        ):
+            return self.cached_stats.model_copy()
+
         try:
             # Get uptime
             uptime_seconds = int(psutil.boot_time())
@@ -627,7 +855,9 @@ class NetworkMonitorService:
 
             # Calculate network speed (Mbps)
             time_delta = current_time_precise - self.last_net_io_time
-            if time_delta > 0:
+            if self.last_net_io is None:
+                network_speed = 0.0
+            elif time_delta > 0:
                 bytes_delta = (net_io.bytes_sent + net_io.bytes_recv) - (
                     self.last_net_io.bytes_sent + self.last_net_io.bytes_recv
                 )
@@ -640,8 +870,10 @@ class NetworkMonitorService:
             self.last_net_io = net_io
             self.last_net_io_time = current_time_precise
 
+            presence_counts = self.presence.get_counts()
             stats = NetworkStats(
-                connected_devices=len(self.known_devices),
+                connected_devices=presence_counts["online"]
+                + presence_counts["suspect"],
                 network_speed=network_speed,
                 data_usage=data_usage,
                 uptime=uptime_str,
@@ -654,11 +886,14 @@ class NetworkMonitorService:
                     "stats": stats.model_dump(mode="json"),
                 }
             )
+            self.cached_stats = stats
+            self.stats_time = current_time_precise
+            self.stats_version += 1
 
-            return stats
+            return stats.model_copy()
 
         except Exception as e:
-            print(f"❌ Error getting system stats: {e}")
+            logger.error("❌ Error getting system stats: %s", e)
             return NetworkStats(
                 connected_devices=0, network_speed=0.0, data_usage=0.0, uptime="0m"
             )
@@ -700,6 +935,31 @@ class NetworkMonitorService:
 
         return data
 
+    def build_status_data(
+        self,
+        devices: List[NetworkDevice],
+        stats: NetworkStats,
+        activities: List[NetworkActivity],
+        chart_data: List[ChartDataPoint],
+    ) -> Dict[str, Any]:
+        """
+        Build the JSON-ready network status payload sent to WebSocket clients
+        """
+        active_alerts = self.get_alerts()
+        return {
+            "stats": {
+                "connected_devices": stats.connected_devices,
+                "network_speed": stats.network_speed,
+                "data_usage": stats.data_usage,
+                "uptime": stats.uptime,
+            },
+            "devices": [device.model_dump(mode="json") for device in devices],
+            "activities": [act.model_dump(mode="json") for act in activities],
+            "chart_data": [point.model_dump(mode="json") for point in chart_data],
+            "alerts": [alert.model_dump(mode="json") for alert in active_alerts],
+            "unacknowledged_alerts": self.alert_manager.get_unacknowledged_count(),
+        }
+
     def get_device_history(self, mac: str, limit: int = 100) -> List[Dict[str, Any]]:
         """
         Get historical data for a specific device
@@ -712,28 +972,167 @@ class NetworkMonitorService:
         history = list(self.device_history[mac])
         if limit:
             history = history[-limit:]
+        return self._history_rows(history)
 
-        # Convert to serializable format
+    @staticmethod
+    def format_times(timestamps, formatted: Dict[float, str]) -> List[str]:
+        """
+        ISO times for epoch timestamps, cached in `formatted`: rows recorded
+        by the same scan share their timestamp across devices
+        """
+        times = []
+        for timestamp in timestamps:
+            text = formatted.get(timestamp)
+            if text is None:
+                text = formatted[timestamp] = datetime.fromtimestamp(
+                    timestamp
+                ).isoformat()
+            times.append(text)
+        return times
+
+    def _history_rows(
+        self, history, formatted: Optional[Dict[float, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Serializable dicts for HISTORY_FIELDS tuples"""
+        history = list(history)
+        times = self.format_times(
+            (row[0] for row in history), {} if formatted is None else formatted
+        )
         return [
             {
-                "timestamp": snapshot["timestamp"].isoformat(),
-                "status": snapshot["status"],
-                "latency": snapshot.get("latency"),
-                "packet_loss": snapshot.get("packet_loss"),
-                "connection_quality": snapshot.get("connection_quality"),
-                "ip": snapshot.get("ip"),
+                "timestamp": time_text,
+                "status": status,
+                "latency": latency,
+                "packet_loss": packet_loss,
+                "connection_quality": quality,
+                "ip": ip,
             }
-            for snapshot in history
+            for time_text, (_, status, latency, packet_loss, quality, ip) in zip(
+                times, history
+            )
         ]
 
+    def _history_columns(self, history, formatted: Dict[float, str]) -> Dict[str, list]:
+        """HISTORY_FIELDS tuples as one list per field"""
+        columns = list(zip(*history)) or [()] * len(HISTORY_FIELDS)
+        values = dict(zip(HISTORY_FIELDS, map(list, columns)))
+        values["timestamp"] = self.format_times(values["timestamp"], formatted)
+        return values
+
+    def get_devices_history(
+        self,
+        macs: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        columns: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        History of several devices (device id -> MAC) in one pass: the last
+        `limit` snapshots of each between `since` and `until`, as rows or
+        (with `columns`) one list per HISTORY_FIELDS field
+        """
+        # Rows are appended in time order, so bounds are found by bisection
+        timestamp_of = itemgetter(0)
+        build = self._history_columns if columns else self._history_rows
+        formatted: Dict[float, str] = {}
+        histories = {}
+        for dev_id, mac in macs.items():
+            rows = self.device_history.get(mac, ())
+            start = 0
+            end = len(rows)
+            if since is not None:
+                start = bisect_left(rows, since.timestamp(), key=timestamp_of)
+            if until is not None:
+                end = bisect_right(rows, until.timestamp(), key=timestamp_of)
+            start = max(start, end - limit)
+            histories[dev_id] = build(islice(rows, start, end), formatted)
+        return histories
+
+    def get_devices_activities(
+        self,
+        device_ids: List[str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 50,
+    ) -> Dict[str, List[NetworkActivity]]:
+        """
+        Activities of several devices in one pass over the activity log,
+        up to `limit` (newest first) per device between `since` and `until`
+        """
+        # Activity timestamps are naive local times
+        if since is not None:
+            since = datetime.fromtimestamp(since.timestamp())
+        if until is not None:
+            until = datetime.fromtimestamp(until.timestamp())
+
+        activities: Dict[str, List[NetworkActivity]] = {
+            device_id: [] for device_id in device_ids
+        }
+        for activity in self.activity_log:
+            if until is not None and activity.timestamp > until:
+                continue
+            if since is not None and activity.timestamp < since:
+                # The log is newest first
+                break
+            matches = activities.get(activity.device_id)
+            if matches is not None and len(matches) < limit:
+                matches.append(activity)
+        return activities
+
+    def get_availability(
+        self,
+        macs: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Uptime percentage and longest outage of devices (device id -> MAC)
+        between `since` (default: a day before `until`) and `until`
+        (default: now), from their presence sessions
+        """
+        now = self.clock()
+        until_ts = min(until.timestamp(), now) if until is not None else now
+        since_ts = since.timestamp() if since is not None else until_ts - 86400
+        fromtimestamp = datetime.fromtimestamp
+        devices = {}
+        for dev_id, mac in macs.items():
+            availability = self.sessions.availability(mac, since_ts, until_ts, now)
+            outage = availability and availability["longest_outage"]
+            if outage is not None:
+                outage["start"] = fromtimestamp(outage["start"]).isoformat()
+                outage["end"] = fromtimestamp(outage["end"]).isoformat()
+            devices[dev_id] = availability
+        return {
+            "since": fromtimestamp(since_ts).isoformat(),
+            "until": fromtimestamp(until_ts).isoformat(),
+            "devices": devices,
+        }
+
+    def get_online_between(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Ids of devices online at any time between `since` and `until`"""
+        now = self.clock()
+        until_ts = until.timestamp() if until is not None else now
+        since_ts = since.timestamp() if since is not None else until_ts
+        macs = self.sessions.online_between(since_ts, until_ts, now)
+        return {
+            "since": datetime.fromtimestamp(since_ts).isoformat(),
+            "until": datetime.fromtimestamp(until_ts).isoformat(),
+            "device_ids": [device_id(mac) for mac in macs],
+        }
+
     def get_device_activities(
-        self, device_name: str, limit: int = 50
+        self, device_id: str, limit: int = 50
     ) -> List[NetworkActivity]:
         """
         Get activity log entries for a specific device
         """
         device_activities = [
-            activity for activity in self.activity_log if activity.device == device_name
+            activity
+            for activity in self.activity_log
+            if activity.device_id == device_id
         ]
 
         if limit:
@@ -741,11 +1140,26 @@ class NetworkMonitorService:
 
         return device_activities
 
+    def collect_metrics(self):
+        """
+        Refresh queue depth gauges, called when metrics are scraped
+        """
+        QUEUE_DEPTH.set(
+            len(self.alert_notifier.pending) + len(self.alert_notifier.resolved),
+            queue="alert_notifications",
+        )
+        QUEUE_DEPTH.set(len(self.activity_log), queue="activity_log")
+        QUEUE_DEPTH.set(len(self.alert_manager.active_alerts), queue="active_alerts")
+        QUEUE_DEPTH.set(
+            websocket_manager.get_connection_count(), queue="websocket_clients"
+        )
+
     def get_diagnostics(self) -> Dict[str, Any]:
         """
         Get service diagnostics for troubleshooting
         """
         return {
+            "discovery_backend": self.discovery.name,
             "cache_valid": self.is_cache_valid(),
             "last_scan_time": self.last_scan_time,
             "cache_age_seconds": (
@@ -757,17 +1171,107 @@ class NetworkMonitorService:
             "network_history_count": len(self.network_history),
             "stats_history_count": len(self.stats_history),
             "known_devices": list(self.known_devices.keys()),
+            "presence": self.presence.get_counts(),
+            "sessions": self.sessions.get_stats(),
             "active_alerts": self.alert_manager.get_unacknowledged_count(),
+            "baselines": self.baselines.get_stats(),
+            "memory": self.governor.get_stats(),
+            "alert_pipeline": {
+                **self.alert_manager.get_stats(),
+                **self.alert_notifier.get_stats(),
+            },
+            "logging": get_logging_stats(),
+        }
+
+    def export_state(self) -> Dict[str, Any]:
+        """
+        State for warm-start checkpoints, using only plain built-in types:
+        device tracking, presence and sessions, histories, activities, alert
+        lifecycle and connection baselines
+        """
+        return {
+            "known_devices": {
+                mac: self._dump_known_device(info)
+                for mac, info in self.known_devices.items()
+            },
+            "presence": self.presence.export_state(),
+            "sessions": self.sessions.export_state(),
+            "device_history": {
+                mac: list(snapshots) for mac, snapshots in self.device_history.items()
+            },
+            # Per-scan device lists are not kept, only the counts
+            "network_history": [
+                [entry["timestamp"].timestamp(), entry["device_count"]]
+                for entry in self.network_history
+            ],
+            "stats_history": [
+                [entry["timestamp"].timestamp(), entry["stats"]]
+                for entry in self.stats_history
+            ],
+            "activity_log": [
+                activity.model_dump_json() for activity in self.activity_log
+            ],
+            "activity_counter": self.activity_counter,
+            "alerts": self.alert_manager.export_state(),
+            "baselines": self.baselines.export_state(),
         }
 
-    def get_alerts(self):
-        """Get all active alerts"""
-        return self.alert_manager.get_active_alerts()
+    def restore_state(self, state: Dict[str, Any]):
+        """Restore state saved by export_state, before the first scan"""
+        fromtimestamp = datetime.fromtimestamp
+        self.known_devices = {
+            mac: self._load_known_device(entry)
+            for mac, entry in state["known_devices"].items()
+        }
+        self.registry.remember(self.known_devices)
+        self.presence.restore_state(state["presence"])
+        if "sessions" in state:
+            self.sessions.restore_state(state["sessions"])
+        else:
+            # Older checkpoint: start sessions for devices still present
+            for mac, entry in self.presence.devices.items():
+                if entry["state"] != "offline":
+                    self.sessions.open_session(mac, entry["changed_at"])
+
+        self.device_history = {
+            mac: deque(map(tuple, rows), maxlen=100)
+            for mac, rows in state["device_history"].items()
+        }
+        self.network_history.extend(
+            {"timestamp": fromtimestamp(ts), "device_count": count, "devices": []}
+            for ts, count in state["network_history"]
+        )
+        self.stats_history.extend(
+            {"timestamp": fromtimestamp(ts), "stats": stats}
+            for ts, stats in state["stats_history"]
+        )
+        self.activity_log = [
+            NetworkActivity.model_validate_json(line) for line in state["activity_log"]
+        ]
+        self.activity_counter = state["activity_counter"]
+        self.alert_manager.restore_state(state["alerts"])
+        self.offline_pending = {
+            mac: info["device"].model_copy(update={"status": "offline"})
+            for mac, info in self.known_devices.items()
+            if "device" in info
+            and self.presence.get_state(mac) == "offline"
+            and self.alert_manager.awaits_offline_alert(device_id(mac))
+        }
+        if "baselines" in state:
+            self.baselines.restore_state(state["baselines"])
+
+    def get_alerts(self, **filters):
+        """Get active alerts, optionally filtered by device/type/severity"""
+        return self.alert_manager.get_active_alerts(**filters)
 
     def get_alert_history(self, limit: int = 50):
         """Get alert history"""
         return self.alert_manager.get_alert_history(limit)
 
+    def query_alert_history(self, **filters):
+        """Query indexed alert history with filters and cursor pagination"""
+        return self.alert_manager.query_alert_history(**filters)
+
     def acknowledge_alert(self, alert_id: str) -> bool:
         """Acknowledge an alert"""
         return self.alert_manager.acknowledge_alert(alert_id)
@@ -779,3 +1283,24 @@ class NetworkMonitorService:
     def update_alert_rule(self, rule):
         """Update an alert rule"""
         self.alert_manager.update_rule(rule)
+
+
+def create_network_monitor(connection_manager=None) -> NetworkMonitorService:
+    """Build the network monitor from the service settings"""
+    return NetworkMonitorService(
+        network_prefix=settings.network_prefix,
+        discovery=settings.discovery_backend,
+        discovery_options={
+            "replay_path": settings.discovery_replay_path,
+            "replay_speed": settings.discovery_replay_speed,
+            "record_path": settings.discovery_record_path,
+        },
+        offline_grace=settings.presence_offline_grace,
+        confirm_probes=settings.presence_confirm_probes,
+        alert_history_size=settings.alert_history_size,
+        alert_history_path=settings.alert_history_path,
+        memory_budget_mb=settings.memory_budget_mb,
+        memory_spill_path=settings.memory_spill_path,
+        memory_check_interval=settings.memory_check_interval,
+        connection_manager=connection_manager,
+    )
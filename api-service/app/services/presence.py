@@ -0,0 +1,181 @@
+"""
+Device presence tracking for AetherLink
+Implements an online -> suspect -> offline state machine so that a device
+missing from a single scan is not immediately reported as disconnected
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Literal, Optional, Set, Tuple
+
+PresenceState = Literal["online", "suspect", "offline"]
+
+
+class PresenceTracker:
+    """
+    Per-device presence state machine with hysteresis:
+    - A device seen in a scan is "online"
+    - A device missing from a scan becomes "suspect" (still reported online)
+    - A suspect device becomes "offline" only after it has been unseen for
+      `offline_grace` seconds AND failed `confirm_probes` consecutive probes
+    - A suspect device that reappears (or answers a probe) returns to
+      "online" without any disconnect/reconnect being reported; one that
+      answered a probe stays online for another grace window before it is
+      suspect (and probed) again
+
+    Probes are either run by sweep() through `probe`, or run by the caller
+    (for the devices from due_for_probe) and passed to sweep() as
+    `responded`.
+    """
+
+    def __init__(
+        self,
+        offline_grace: float = 60.0,
+        confirm_probes: int = 2,
+        probe: Optional[Callable[[str], bool]] = None,
+    ):
+        self.offline_grace = offline_grace
+        self.confirm_probes = confirm_probes
+        # Called with a MAC address, returns True if the device responded
+        self.probe = probe
+        self.devices: Dict[str, Dict[str, Any]] = {}
+
+    def get_state(self, mac: str) -> Optional[PresenceState]:
+        """Return the presence state of a device, or None if never seen"""
+        entry = self.devices.get(mac)
+        return entry["state"] if entry else None
+
+    def get_last_seen(self, mac: str) -> Optional[float]:
+        """Return when a device was last seen, or None if never seen"""
+        entry = self.devices.get(mac)
+        return entry["last_seen"] if entry else None
+
+    def is_present(self, mac: str) -> bool:
+        """Online and suspect devices both count as present"""
+        return self.get_state(mac) in ("online", "suspect")
+
+    def mark_seen(self, mac: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        Record that a device was seen in the current scan
+        Returns the previous state (None for a never-seen device)
+        """
+        now = now if now is not None else time.time()
+        entry = self.devices.get(mac)
+
+        if entry is None:
+            self.devices[mac] = {
+                "state": "online",
+                "last_seen": now,
+                "changed_at": now,
+                "failed_probes": 0,
+            }
+            return None
+
+        previous = entry["state"]
+        entry["last_seen"] = now
+        entry["failed_probes"] = 0
+        entry["probed"] = False
+        if previous != "online":
+            entry["state"] = "online"
+            entry["changed_at"] = now
+        return previous
+
+    def due_for_probe(self, seen: Set[str], now: Optional[float] = None) -> List[str]:
+        """Suspect devices the next sweep will probe"""
+        now = now if now is not None else time.time()
+        return [
+            mac
+            for mac, entry in self.devices.items()
+            if mac not in seen
+            and entry["state"] == "suspect"
+            and now - entry["last_seen"] >= self.offline_grace
+        ]
+
+    def sweep(
+        self,
+        seen: Set[str],
+        now: Optional[float] = None,
+        responded: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, PresenceState]]:
+        """
+        Advance the state machine for devices missing from the current scan
+        `responded` holds the devices that answered probes run by the caller;
+        without it `probe` is called for each device due
+        Returns a list of (mac, new_state) transitions
+        """
+        now = now if now is not None else time.time()
+        transitions: List[Tuple[str, PresenceState]] = []
+
+        for mac, entry in self.devices.items():
+            if mac in seen or entry["state"] == "offline":
+                continue
+
+            if entry["state"] == "online":
+                # Answering a probe counts as being seen for a grace window
+                if (
+                    entry.get("probed")
+                    and now - entry["last_seen"] < self.offline_grace
+                ):
+                    continue
+                entry["state"] = "suspect"
+                entry["changed_at"] = now
+                transitions.append((mac, "suspect"))
+                continue
+
+            # Suspect: wait out the grace window before probing
+            if now - entry["last_seen"] < self.offline_grace:
+                continue
+
+            if responded is not None:
+                answered = mac in responded
+            else:
+                answered = self.probe is not None and self.probe(mac)
+            if answered:
+                entry["state"] = "online"
+                entry["last_seen"] = now
+                entry["changed_at"] = now
+                entry["failed_probes"] = 0
+                entry["probed"] = True
+                transitions.append((mac, "online"))
+                continue
+
+            entry["failed_probes"] += 1
+            if entry["failed_probes"] >= self.confirm_probes:
+                entry["state"] = "offline"
+                entry["changed_at"] = now
+                transitions.append((mac, "offline"))
+
+        return transitions
+
+    def export_state(self) -> Dict[str, list]:
+        """
+        Compact state for checkpoints:
+        mac -> [state, last_seen, changed_at, failed_probes]
+        """
+        return {
+            mac: [
+                entry["state"],
+                entry["last_seen"],
+                entry["changed_at"],
+                entry["failed_probes"],
+            ]
+            for mac, entry in self.devices.items()
+        }
+
+    def restore_state(self, state: Dict[str, list]):
+        """Restore state saved by export_state"""
+        self.devices = {
+            mac: {
+                "state": presence,
+                "last_seen": last_seen,
+                "changed_at": changed_at,
+                "failed_probes": failed_probes,
+            }
+            for mac, (presence, last_seen, changed_at, failed_probes) in state.items()
+        }
+
+    def get_counts(self) -> Dict[str, int]:
+        """Return the number of devices in each presence state"""
+        counts = {"online": 0, "suspect": 0, "offline": 0}
+        for entry in self.devices.values():
+            counts[entry["state"]] += 1
+        return counts
@@ -0,0 +1,274 @@
+"""
+Runtime sampling profiler for AetherLink
+Samples stacks of the running service for a bounded time, keeps only those
+passing through the monitor, alert or WebSocket subsystems, and reports
+them as collapsed stacks (the `frame;frame;frame count` format read by
+flamegraph.pl, speedscope and similar tools). While profiling, a heartbeat
+task detects event loop stalls and records what the loop was running.
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Module prefixes making up each profiled subsystem
+SUBSYSTEMS = {
+    "monitor": (
+        "app.services.network_monitor",
+        "app.services.discovery",
+        "app.services.presence",
+    ),
+    "alerts": (
+        "app.services.alert_manager",
+        "app.services.alert_store",
+        "app.services.alert_notifier",
+        "app.services.rule_engine",
+        "app.services.streaming_stats",
+    ),
+    "websocket": ("app.services.websocket_manager",),
+}
+
+PROFILE_MODES = ("wall", "cpu")
+MAX_DURATION = 300.0  # seconds
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def fold_stack(frame) -> List[str]:
+    """Frame labels from outermost to innermost"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class SamplingProfiler:
+    """
+    Collects stack samples in one of two modes:
+    - wall: a background thread samples every thread each `interval`
+      seconds, so time spent blocked (subprocesses, sockets) shows up
+    - cpu: SIGPROF fires every `interval` seconds of process CPU time and
+      samples the main (event loop) thread; Unix only
+    """
+
+    def __init__(
+        self,
+        mode: str = "wall",
+        interval: float = 0.005,
+        subsystems: Optional[Sequence[str]] = None,
+        slow_callback: float = 0.1,
+    ):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        unknown = set(subsystems or ()) - set(SUBSYSTEMS)
+        if unknown:
+            raise ValueError(f"Unknown subsystems: {', '.join(sorted(unknown))}")
+
+        self.mode = mode
+        self.interval = interval
+        self.subsystems = list(subsystems or SUBSYSTEMS)
+        self.prefixes = tuple(
+            prefix for name in self.subsystems for prefix in SUBSYSTEMS[name]
+        )
+        self.slow_callback = slow_callback
+        self.beat_interval = max(0.005, slow_callback / 4)
+
+        # Guards `stacks`, written by the sampler while the loop reads it
+        self.lock = threading.Lock()
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.slow_callbacks: List[Dict[str, Any]] = []
+        self.running = False
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+
+        self.loop_thread: Optional[int] = None
+        self.last_beat = 0.0
+        self.block: Optional[Dict[str, Any]] = None
+        self.sampler: Optional[threading.Thread] = None
+        self.heartbeat: Optional[asyncio.Task] = None
+        self.previous_handler = None
+
+    def _record(self, frame, wait: bool = True):
+        """Fold one stack, keeping it only if it enters a profiled subsystem"""
+        self.samples += 1
+        labels = fold_stack(frame)
+        if not any(label.startswith(self.prefixes) for label in labels):
+            return
+        # Trim server and event loop frames below the first app frame
+        first_app = next(i for i, name in enumerate(labels) if name.startswith("app."))
+        key = ";".join(labels[first_app:])
+        if not self.lock.acquire(blocking=wait):
+            return
+        try:
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+        finally:
+            self.lock.release()
+
+    def _on_signal(self, signum, frame):
+        # Runs on the loop thread, which may be holding the lock to read the
+        # profile: drop the sample rather than wait on ourselves
+        if frame is not None:
+            self._record(frame, wait=False)
+
+    def _stacks(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stacks)
+
+    async def _beat(self):
+        while self.running:
+            self.last_beat = time.perf_counter()
+            await asyncio.sleep(self.beat_interval)
+
+    def _check_loop(self, now: float):
+        """Detect a stalled event loop and capture what it is running"""
+        beat = self.last_beat
+        stalled = now - beat - self.beat_interval
+        if stalled > self.slow_callback:
+            if self.block is None or self.block["beat"] != beat:
+                self._finish_block(beat)
+                frame = sys._current_frames().get(self.loop_thread)
+                self.block = {
+                    "beat": beat,
+                    "started_at": datetime.now().isoformat(),
+                    "stack": ";".join(fold_stack(frame)) if frame else None,
+                }
+        elif self.block is not None and beat != self.block["beat"]:
+            self._finish_block(beat)
+
+    def _finish_block(self, resumed_at: float):
+        if self.block is None:
+            return
+        duration = resumed_at - self.block["beat"] - self.beat_interval
+        self.slow_callbacks.append(
+            {
+                "started_at": self.block["started_at"],
+                "duration_ms": round(max(duration, self.slow_callback) * 1000, 1),
+                "stack": self.block["stack"],
+            }
+        )
+        self.block = None
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while self.running:
+            now = time.perf_counter()
+            if self.mode == "wall":
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own:
+                        self._record(frame)
+            self._check_loop(now)
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start sampling; must be called from the event loop thread"""
+        self.running = True
+        self.started_at = time.time()
+        self.loop_thread = threading.get_ident()
+        self.last_beat = time.perf_counter()
+
+        if self.mode == "cpu":
+            self.previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+        self.heartbeat = asyncio.get_running_loop().create_task(self._beat())
+        self.sampler = threading.Thread(
+            target=self._sample_loop, name="aetherlink-profiler", daemon=True
+        )
+        self.sampler.start()
+        logger.info(
+            "🔬 Profiling started (%s, %s)", self.mode, ", ".join(self.subsystems)
+        )
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and return the profile"""
+        if self.running:
+            self.running = False
+            self.stopped_at = time.time()
+            if self.mode == "cpu":
+                signal.setitimer(signal.ITIMER_PROF, 0, 0)
+                signal.signal(signal.SIGPROF, self.previous_handler or signal.SIG_DFL)
+            if self.heartbeat is not None:
+                self.heartbeat.cancel()
+            if self.sampler is not None:
+                self.sampler.join(timeout=1)
+            self._finish_block(time.perf_counter())
+            logger.info("🔬 Profiling stopped after %s samples", self.samples)
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        end = self.stopped_at or time.time()
+        stacks = self._stacks()
+        return {
+            "mode": self.mode,
+            "running": self.running,
+            "subsystems": self.subsystems,
+            "interval_ms": self.interval * 1000,
+            "duration_seconds": (
+                round(end - self.started_at, 3) if self.started_at else 0
+            ),
+            "samples": self.samples,
+            "scoped_samples": sum(stacks.values()),
+            "stacks": [
+                {"stack": stack, "count": count}
+                for stack, count in sorted(
+                    stacks.items(), key=lambda item: item[1], reverse=True
+                )
+            ],
+            "slow_callbacks": sorted(
+                self.slow_callbacks, key=lambda item: item["duration_ms"], reverse=True
+            ),
+        }
+
+    def collapsed(self) -> str:
+        """Profile in collapsed stack format for flamegraph tools"""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks().items())
+
+
+class ProfilingController:
+    """Runs at most one profiling session, stopping it after its duration"""
+
+    def __init__(self):
+        self.profiler: Optional[SamplingProfiler] = None
+        self.stop_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def running(self) -> bool:
+        return self.profiler is not None and self.profiler.running
+
+    def start(self, duration: float, **options) -> SamplingProfiler:
+        if self.running:
+            raise RuntimeError("A profiling session is already running")
+        if not 0 < duration <= MAX_DURATION:
+            raise ValueError(f"Duration must be between 0 and {MAX_DURATION} seconds")
+
+        profiler = SamplingProfiler(**options)
+        profiler.start()
+        self.profiler = profiler
+        self.stop_handle = asyncio.get_running_loop().call_later(duration, self.stop)
+        return profiler
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        if self.stop_handle is not None:
+            self.stop_handle.cancel()
+            self.stop_handle = None
+        if self.profiler is None:
+            return None
+        return self.profiler.stop()
+
+
+# Global profiling controller instance
+profiling = ProfilingController()
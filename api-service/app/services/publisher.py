@@ -0,0 +1,305 @@
+"""
+Single status publisher for streaming clients
+One background loop scans the network and publishes status, device events
+and topic events to every WebSocket and SSE client, instead of each
+connection running its own scan loop. In multi-worker deployments the loop
+runs in the scanner process and API workers replay its status.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from app.services.broker import BrokerClient
+from app.services.cadence import ScanCadence
+from app.services.gateway import (
+    EVENTS_CHANNEL,
+    STATE_KEY,
+    LocalGateway,
+    RemoteGateway,
+)
+from app.services.network_monitor import NetworkMonitorService
+from app.services.websocket_manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between demand reports from an API worker to the scanner
+DEMAND_REPORT_INTERVAL = 1.0
+
+
+class StatusPublisher:
+    """
+    Scans at the cadence's interval while running and publishes:
+    - `network_update` (full status) and `device_event` to WebSocket clients
+    - `devices` snapshots (when the snapshot version changes), `stats`
+      and device events to the event hub topics
+    - the same topics, plus `device:<id>` updates for subscribed devices,
+      to WebSocket clients with topic subscriptions
+    """
+
+    def __init__(
+        self,
+        monitor: NetworkMonitorService,
+        connection_manager: ConnectionManager,
+        interval: float = 5.0,
+        cadence: Optional[ScanCadence] = None,
+    ):
+        self.monitor = monitor
+        self.connection_manager = connection_manager
+        # Fixed interval unless a demand-driven cadence is given
+        self.cadence = cadence or ScanCadence(
+            active_interval=interval, idle_interval=interval
+        )
+        self.task: Optional[asyncio.Task] = None
+        self.last_device_state: Optional[Dict[str, Dict[str, Any]]] = None
+        self.last_devices_version: Optional[int] = None
+        self.last_status: Optional[Dict[str, Any]] = None
+        self.snapshot_version = 0
+        self.devices_by_id: Dict[str, Dict[str, Any]] = {}
+        self.cycles = 0
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def ensure_running(self):
+        """Start the publish loop if it isn't running yet"""
+        if not self.running:
+            self.task = asyncio.get_running_loop().create_task(self._run())
+            logger.info("📡 Status publisher started")
+
+    def touch(self):
+        """Record demand from an API caller or a new streaming client"""
+        self.cadence.touch()
+
+    async def stop(self):
+        if self.running:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+
+    async def _run(self):
+        while True:
+            await self.cadence.wait()
+            try:
+                await self.publish_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error in publisher loop: %s", e)
+
+    async def publish_once(self):
+        """Scan once and publish the resulting status and events"""
+        status_data = await self.collect()
+        await self.publish_status(status_data, self.monitor.snapshot_version)
+
+    async def collect(self) -> Dict[str, Any]:
+        """Scan once and build the JSON-ready status"""
+        monitor = self.monitor
+        devices = await monitor.scan_network()
+        stats = await monitor.get_system_stats()
+        stats.connected_devices = len(devices)
+        activities = await monitor.get_activities(limit=10)
+        chart_data = monitor.generate_chart_data()
+        self.cycles += 1
+        return monitor.build_status_data(devices, stats, activities, chart_data)
+
+    async def publish_status(self, status_data: Dict[str, Any], snapshot_version: int):
+        """Publish a status and the events derived from it to clients"""
+        self.last_status = status_data
+        self.snapshot_version = snapshot_version
+        self.devices_by_id = {device["id"]: device for device in status_data["devices"]}
+
+        await self._publish_device_events(status_data["devices"])
+
+        manager = self.connection_manager
+        if snapshot_version != self.last_devices_version:
+            self.last_devices_version = snapshot_version
+            devices_message = self.snapshot_for("devices")
+            manager.events.publish("devices", "devices", devices_message, snapshot=True)
+            await manager.publish("devices", {"type": "devices", **devices_message})
+
+        stats_message = self.snapshot_for("stats")
+        manager.events.publish("stats", "stats", stats_message, snapshot=True)
+        await manager.publish("stats", {"type": "stats", **stats_message})
+
+        # Per-device updates only for devices someone is watching
+        for topic in manager.device_topics():
+            device = self.devices_by_id.get(topic[len("device:") :])
+            if device is not None:
+                await manager.publish(
+                    topic, {"type": "device_update", "device": device}
+                )
+
+        await manager.broadcast_network_update(status_data)
+
+    def snapshot_for(self, topic: str) -> Optional[Dict[str, Any]]:
+        """Latest state for a topic, sent to clients when they subscribe"""
+        status = self.last_status
+        if status is None:
+            return None
+        if topic == "devices":
+            return {
+                "version": self.snapshot_version,
+                "devices": status["devices"],
+            }
+        if topic == "stats":
+            return {
+                "stats": status["stats"],
+                "activities": status["activities"],
+                "chart_data": status["chart_data"],
+            }
+        if topic == "alerts":
+            return {"alerts": status["alerts"], "resolved": []}
+        if topic.startswith("device:"):
+            device = self.devices_by_id.get(topic[len("device:") :])
+            return {"device": device} if device is not None else None
+        return None
+
+    async def _publish_device_events(self, devices):
+        """Diff against the previous cycle and send device events"""
+        current = {
+            device["mac"]: {
+                "status": device["status"],
+                "quality": device["connection_quality"],
+            }
+            for device in devices
+        }
+        previous = self.last_device_state
+        self.last_device_state = current
+        if previous is None:
+            # First cycle: clients get the full list in the status update
+            return
+
+        for device in devices:
+            state = previous.get(device["mac"])
+            if state is None:
+                await self.connection_manager.broadcast_device_event(
+                    "connected", device
+                )
+            elif state["quality"] != device["connection_quality"]:
+                await self.connection_manager.broadcast_device_event(
+                    "quality_change", device
+                )
+
+        for mac in previous.keys() - current.keys():
+            await self.connection_manager.broadcast_device_event(
+                "disconnected",
+                {"mac": mac, "id": mac.replace(":", "").replace("-", "")},
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "cycles": self.cycles,
+            "cadence": self.cadence.get_stats(),
+        }
+
+
+class BrokerPublisher(StatusPublisher):
+    """
+    Scanner side of a multi-worker deployment: each cycle's status is
+    stored on the broker (for workers that connect later) and published to
+    the API workers, which derive events and fan out to their own clients
+    """
+
+    def __init__(
+        self,
+        monitor: NetworkMonitorService,
+        client: BrokerClient,
+        interval: float = 5.0,
+        cadence: Optional[ScanCadence] = None,
+    ):
+        super().__init__(
+            monitor, connection_manager=None, interval=interval, cadence=cadence
+        )
+        self.client = client
+        self.gateway = LocalGateway(monitor)
+        self.scanner_id = f"{os.getpid()}-{int(time.time())}"
+
+    async def publish_status(self, status_data: Dict[str, Any], snapshot_version: int):
+        self.last_status = status_data
+        self.snapshot_version = snapshot_version
+        payload = json.dumps(
+            {
+                "op": "state",
+                "scanner": self.scanner_id,
+                "sequence": self.cycles,
+                "published_at": time.time(),
+                "versions": await self.gateway.get_versions(),
+                "status": status_data,
+            },
+            default=str,
+        )
+        await self.client.set(STATE_KEY, payload)
+        await self.client.publish(EVENTS_CHANNEL, payload)
+
+    async def publish_versions(self):
+        """Send fresh versions after a write, so worker ETags change"""
+        message = {
+            "op": "versions",
+            "scanner": self.scanner_id,
+            "versions": await self.gateway.get_versions(),
+        }
+        await self.client.publish(EVENTS_CHANNEL, json.dumps(message))
+
+
+class ReplicaPublisher(StatusPublisher):
+    """
+    API worker side of a multi-worker deployment: publishes the status the
+    scanner sends through the broker to this worker's WebSocket and SSE
+    clients, instead of scanning
+    """
+
+    def __init__(self, gateway: RemoteGateway, connection_manager: ConnectionManager):
+        super().__init__(None, connection_manager)
+        self.gateway = gateway
+        gateway.listener = self
+        self.last_report = float("-inf")
+        self.report_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.gateway.task is not None and not self.gateway.task.done()
+
+    def ensure_running(self):
+        if not self.running:
+            self.gateway.start()
+            logger.info(
+                "📡 Replica publisher subscribed to %s", self.gateway.client.url
+            )
+
+    async def stop(self):
+        await self.gateway.stop()
+
+    def touch(self):
+        """Report this worker's demand so the scanner keeps its cadence up"""
+        now = time.monotonic()
+        if now - self.last_report < DEMAND_REPORT_INTERVAL:
+            return
+        self.last_report = now
+        self.report_task = asyncio.get_running_loop().create_task(
+            self.gateway.report_demand(self.connection_manager.watcher_count())
+        )
+
+    async def on_state(self, status_data: Dict[str, Any], snapshot_version: int):
+        self.cycles += 1
+        if self.connection_manager.watcher_count():
+            self.touch()
+        await self.publish_status(status_data, snapshot_version)
+
+    async def on_alert_batch(
+        self, alerts: list, resolved: list, resolved_devices: Optional[dict] = None
+    ):
+        await self.connection_manager.broadcast_alert_batch(
+            alerts, resolved, resolved_devices
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "cycles": self.cycles, "role": "api"}
@@ -0,0 +1,360 @@
+"""
+Rule engine for alert evaluation
+Compiles AlertRule configurations into predicate closures indexed by
+metric and scope, so a whole scan is evaluated in a single batch pass
+"""
+
+import logging
+import operator
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.models.network import AlertRule, AlertType, NetworkDevice
+from app.services.memory_governor import estimate_size
+from app.services.streaming_stats import EWMA, MOfN, SlidingWindow
+
+logger = logging.getLogger(__name__)
+
+# Window used by aggregating rules that don't specify one (seconds)
+DEFAULT_WINDOW = 300
+
+# Metric name -> value extractor for a device
+METRIC_GETTERS: Dict[str, Callable[[NetworkDevice], Optional[float]]] = {
+    "latency": lambda device: device.latency,
+    "packet_loss": lambda device: device.packet_loss,
+    "anomaly_score": lambda device: device.anomaly_score,
+}
+
+# Legacy rule types and the metric/threshold field they map to
+LEGACY_METRICS: Dict[AlertType, Tuple[str, str]] = {
+    AlertType.HIGH_LATENCY: ("latency", "latency_threshold"),
+    AlertType.PACKET_LOSS: ("packet_loss", "packet_loss_threshold"),
+    AlertType.POOR_CONNECTION: ("latency", "latency_threshold"),
+    AlertType.ANOMALY: ("anomaly_score", "threshold"),
+}
+
+OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+class CompiledRule:
+    """
+    An AlertRule compiled into a predicate over (device, value, now)
+    `device_state` lists the predicate's per-device dicts (keyed by device
+    id), so a forgotten device's windows and counters can be dropped
+    """
+
+    __slots__ = (
+        "rule",
+        "metric",
+        "threshold",
+        "predicate",
+        "device_state",
+        "vendors",
+        "types",
+    )
+
+    def __init__(
+        self,
+        rule: AlertRule,
+        metric: str,
+        threshold: float,
+        predicate: Callable[[NetworkDevice, float, float], bool],
+        device_state: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.rule = rule
+        self.metric = metric
+        self.threshold = threshold
+        self.predicate = predicate
+        self.device_state = device_state or []
+        self.vendors = frozenset(v.lower() for v in rule.vendors)
+        self.types = frozenset(rule.device_types)
+
+    def forget(self, device_id: str):
+        """Drop a device's windows and counters"""
+        for states in self.device_state:
+            states.pop(device_id, None)
+
+    def device_bytes(self, device_id: str) -> int:
+        """Approximate size of a device's windows and counters"""
+        total = 0
+        for states in self.device_state:
+            value = states.get(device_id)
+            if isinstance(value, SlidingWindow):
+                total += sys.getsizeof(value) + estimate_size(value.ring)
+            elif value is not None:
+                total += estimate_size(value)
+        return total
+
+
+def resolve_metric(rule: AlertRule) -> Optional[Tuple[str, Optional[float]]]:
+    """
+    Return (metric, threshold) for a metric rule, or None for lifecycle
+    rules (new device, offline, duplicate IP) handled outside the engine
+    """
+    if rule.metric:
+        threshold = rule.threshold
+        if threshold is None:
+            for legacy_metric, field in LEGACY_METRICS.values():
+                if legacy_metric == rule.metric:
+                    threshold = getattr(rule, field)
+                    break
+        return rule.metric, threshold
+
+    if rule.type in LEGACY_METRICS:
+        metric, field = LEGACY_METRICS[rule.type]
+        threshold = rule.threshold
+        return metric, threshold if threshold is not None else getattr(rule, field)
+
+    return None
+
+
+def compile_rule(rule: AlertRule) -> Optional[CompiledRule]:
+    """Compile a metric rule into a predicate closure"""
+    resolved = resolve_metric(rule)
+    if resolved is None:
+        return None
+
+    metric, threshold = resolved
+    if metric not in METRIC_GETTERS or threshold is None:
+        logger.warning(
+            "⚠️ Skipping alert rule %s: unsupported metric %s", rule.id, metric
+        )
+        return None
+
+    compare = OPERATORS[rule.operator]
+    device_state: List[Dict[str, Any]] = []
+    aggregate = _compile_aggregate(rule, device_state)
+
+    if rule.condition == "rate_of_change":
+        # device_id -> (previous value, previous timestamp)
+        previous: Dict[str, Tuple[float, float]] = {}
+        device_state.append(previous)
+
+        def condition(device: NetworkDevice, value: float, now: float) -> bool:
+            last = previous.get(device.id)
+            previous[device.id] = (value, now)
+            if last is None or now <= last[1]:
+                return False
+            rate = (value - last[0]) / (now - last[1])
+            return compare(rate, threshold)
+
+    elif rule.condition == "sustained":
+        duration = rule.duration or 0
+        # device_id -> timestamp the condition started holding
+        since: Dict[str, float] = {}
+        device_state.append(since)
+
+        def condition(device: NetworkDevice, value: float, now: float) -> bool:
+            if not compare(value, threshold):
+                since.pop(device.id, None)
+                return False
+            started = since.setdefault(device.id, now)
+            return now - started >= duration
+
+    else:
+
+        def condition(device: NetworkDevice, value: float, now: float) -> bool:
+            return compare(value, threshold)
+
+    if aggregate is not None:
+        base_condition = condition
+
+        def condition(device: NetworkDevice, value: float, now: float) -> bool:
+            aggregated = aggregate(device, value, now)
+            return aggregated is not None and base_condition(device, aggregated, now)
+
+    if rule.samples:
+        samples = rule.samples
+        breaches = rule.breaches or samples
+        # device_id -> outcomes of the last `samples` evaluations
+        outcomes: Dict[str, MOfN] = {}
+        device_state.append(outcomes)
+        sample_condition = condition
+
+        def predicate(device: NetworkDevice, value: float, now: float) -> bool:
+            window = outcomes.get(device.id)
+            if window is None:
+                window = outcomes[device.id] = MOfN(samples)
+            return window.push(sample_condition(device, value, now)) >= breaches
+
+    else:
+        predicate = condition
+
+    return CompiledRule(rule, metric, threshold, predicate, device_state)
+
+
+def _compile_aggregate(
+    rule: AlertRule, device_state: List[Dict[str, Any]]
+) -> Optional[Callable[[NetworkDevice, float, float], Optional[float]]]:
+    """
+    Build a per-device streaming aggregate for windowed rules, adding its
+    per-device dicts to `device_state`
+    Returns None when the rule evaluates each sample directly
+    """
+    if rule.aggregate == "last":
+        return None
+
+    window = rule.window or DEFAULT_WINDOW
+    min_samples = rule.min_samples
+
+    if rule.aggregate == "ewma":
+        averages: Dict[str, EWMA] = {}
+        counts: Dict[str, int] = defaultdict(int)
+        device_state.extend((averages, counts))
+
+        def aggregate(device: NetworkDevice, value: float, now: float):
+            average = averages.get(device.id)
+            if average is None:
+                average = averages[device.id] = EWMA(window)
+            counts[device.id] += 1
+            smoothed = average.update(value, now)
+            return smoothed if counts[device.id] >= min_samples else None
+
+        return aggregate
+
+    windows: Dict[str, SlidingWindow] = {}
+    device_state.append(windows)
+    if rule.aggregate == "mean":
+        query = SlidingWindow.mean
+    elif rule.aggregate == "max":
+        query = SlidingWindow.max
+    else:
+        q = int(rule.aggregate[1:]) / 100
+
+        def query(sliding: SlidingWindow, now: float) -> Optional[float]:
+            return sliding.quantile(q, now)
+
+    def aggregate(device: NetworkDevice, value: float, now: float):
+        sliding = windows.get(device.id)
+        if sliding is None:
+            sliding = windows[device.id] = SlidingWindow(window)
+        sliding.update(value, now)
+        if sliding.count(now) < min_samples:
+            return None
+        return query(sliding, now)
+
+    return aggregate
+
+
+class RuleEngine:
+    """
+    Evaluates compiled metric rules against a batch of devices
+
+    Rules are indexed by metric and then by scope (global, device id,
+    vendor, device type), so each device only visits the rules that can
+    apply to it and each metric is read once per device
+    """
+
+    def __init__(self):
+        self.compiled: Dict[str, CompiledRule] = {}
+        self.index: Dict[str, Dict[str, Any]] = {}
+
+    def load(self, rules: List[AlertRule]):
+        """Compile all rules and rebuild the index"""
+        self.compiled = {}
+        for rule in rules:
+            compiled = compile_rule(rule) if rule.enabled else None
+            if compiled is not None:
+                self.compiled[rule.id] = compiled
+        self._rebuild_index()
+
+    def update(self, rule: AlertRule):
+        """Recompile a single rule (takes effect on the next evaluation)"""
+        self.compiled.pop(rule.id, None)
+        compiled = compile_rule(rule) if rule.enabled else None
+        if compiled is not None:
+            self.compiled[rule.id] = compiled
+        self._rebuild_index()
+
+    def forget(self, device_id: str):
+        """Drop a device's per-device state in every rule"""
+        for compiled in self.compiled.values():
+            compiled.forget(device_id)
+
+    def device_bytes(self, device_id: str) -> int:
+        """Approximate size of a device's per-device state in every rule"""
+        return sum(
+            compiled.device_bytes(device_id) for compiled in self.compiled.values()
+        )
+
+    def _rebuild_index(self):
+        index: Dict[str, Dict[str, Any]] = {}
+        for compiled in self.compiled.values():
+            rule = compiled.rule
+            scopes = index.setdefault(
+                compiled.metric,
+                {
+                    "global": [],
+                    "device": defaultdict(list),
+                    "vendor": defaultdict(list),
+                    "type": defaultdict(list),
+                },
+            )
+            # A rule is indexed under its most selective scope and the
+            # remaining scopes are checked when it is visited
+            if rule.device_ids:
+                for device_id in rule.device_ids:
+                    scopes["device"][device_id].append(compiled)
+            elif rule.vendors:
+                for vendor in rule.vendors:
+                    scopes["vendor"][vendor.lower()].append(compiled)
+            elif rule.device_types:
+                for device_type in rule.device_types:
+                    scopes["type"][device_type].append(compiled)
+            else:
+                scopes["global"].append(compiled)
+        self.index = index
+
+    def _candidates(
+        self, scopes: Dict[str, Any], device: NetworkDevice
+    ) -> List[CompiledRule]:
+        candidates = list(scopes["global"])
+        if device.id in scopes["device"]:
+            candidates.extend(scopes["device"][device.id])
+        if device.vendor and device.vendor.lower() in scopes["vendor"]:
+            candidates.extend(scopes["vendor"][device.vendor.lower()])
+        if device.type in scopes["type"]:
+            candidates.extend(scopes["type"][device.type])
+        return candidates
+
+    @staticmethod
+    def _in_scope(compiled: CompiledRule, device: NetworkDevice) -> bool:
+        if compiled.vendors and (
+            not device.vendor or device.vendor.lower() not in compiled.vendors
+        ):
+            return False
+        if compiled.types and device.type not in compiled.types:
+            return False
+        return True
+
+    def evaluate(
+        self, devices: List[NetworkDevice], now: Optional[float] = None
+    ) -> List[Tuple[CompiledRule, NetworkDevice, float]]:
+        """
+        Evaluate all online devices in one pass
+        Returns (rule, device, value) for every rule whose condition holds
+        """
+        now = now if now is not None else time.time()
+        matches: List[Tuple[CompiledRule, NetworkDevice, float]] = []
+
+        for device in devices:
+            if device.status != "online":
+                continue
+            for metric, scopes in self.index.items():
+                value = METRIC_GETTERS[metric](device)
+                if value is None:
+                    continue
+                for compiled in self._candidates(scopes, device):
+                    if not self._in_scope(compiled, device):
+                        continue
+                    if compiled.predicate(device, value, now):
+                        matches.append((compiled, device, value))
+
+        return matches
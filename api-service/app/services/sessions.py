@@ -0,0 +1,383 @@
+"""
+Presence sessions: when each device was online, as intervals
+A session opens when a device connects (first seen or back from offline)
+and closes when the presence state machine confirms it offline, at the
+time it was last seen. Availability questions are answered from the
+intervals by bisection and range-maximum trees instead of scanning
+snapshots:
+- uptime over a window: prefix sums of session lengths
+- longest outage in a window: a max tree over the gaps between sessions
+- devices online between two times: closed sessions in the order they
+  closed, bisected by the latest end so far, with a max tree over their
+  negated starts, plus the open sessions
+"""
+
+import sys
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+NEGATIVE_INFINITY = float("-inf")
+
+
+class _MaxTree:
+    """
+    Segment tree over an append-only list of numbers: the maximum of any
+    index range in O(log n), and the indices of values above a bound
+    """
+
+    __slots__ = ("size", "count", "tree")
+
+    def __init__(self, values: Iterable[float] = ()):
+        self.rebuild(list(values))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def rebuild(self, values: List[float]):
+        size = 1
+        while size < len(values):
+            size *= 2
+        tree = [NEGATIVE_INFINITY] * size + values
+        tree.extend([NEGATIVE_INFINITY] * (size - len(values)))
+        for node in range(size - 1, 0, -1):
+            left = tree[2 * node]
+            right = tree[2 * node + 1]
+            tree[node] = left if left >= right else right
+        self.size = size
+        self.count = len(values)
+        self.tree = tree
+
+    def values(self) -> List[float]:
+        return self.tree[self.size : self.size + self.count]
+
+    def append(self, value: float):
+        if self.count == self.size:
+            # Full: double the leaves
+            self.rebuild(self.values() + [value])
+            return
+        tree = self.tree
+        node = self.size + self.count
+        self.count += 1
+        tree[node] = value
+        node //= 2
+        while node and tree[node] < value:
+            tree[node] = value
+            node //= 2
+
+    def max(self, lo: int, hi: int) -> float:
+        """Maximum of values[lo:hi], -inf when empty"""
+        tree = self.tree
+        best = NEGATIVE_INFINITY
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                best = max(best, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                best = max(best, tree[hi])
+            lo //= 2
+            hi //= 2
+        return best
+
+    def at_least(self, lo: int, hi: int, bound: float) -> List[int]:
+        """Indices in [lo, hi) whose value is at least `bound`, in order"""
+        found: List[int] = []
+        tree = self.tree
+        size = self.size
+        # Nodes to visit as (node, first leaf, leaf count), leftmost first
+        stack = [(1, 0, size)]
+        while stack:
+            node, first, width = stack.pop()
+            if first >= hi or first + width <= lo or tree[node] < bound:
+                continue
+            if width == 1:
+                found.append(first)
+                continue
+            half = width // 2
+            stack.append((2 * node + 1, first + half, half))
+            stack.append((2 * node, first, half))
+        return found
+
+
+class DeviceSessions:
+    """
+    One device's sessions: closed ones as sorted `starts`/`ends`, plus the
+    start of the open one while the device is online
+    """
+
+    __slots__ = ("starts", "ends", "elapsed", "gaps", "open_start")
+
+    def __init__(self):
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        # elapsed[i]: total length of the first i closed sessions
+        self.elapsed: List[float] = [0.0]
+        # gaps[i]: offline time between closed session i and the next one
+        self.gaps = _MaxTree()
+        self.open_start: Optional[float] = None
+
+    def open(self, now: float):
+        if self.open_start is not None:
+            return
+        if self.ends:
+            self.gaps.append(now - self.ends[-1])
+        self.open_start = now
+
+    def close(self, end: float):
+        if self.open_start is None:
+            return
+        self.starts.append(self.open_start)
+        self.ends.append(max(end, self.open_start))
+        self.elapsed.append(self.elapsed[-1] + self.ends[-1] - self.open_start)
+        self.open_start = None
+
+    def trim(self, count: int):
+        """Forget the oldest `count` closed sessions"""
+        del self.starts[:count]
+        del self.ends[:count]
+        del self.elapsed[:count]
+        self.gaps.rebuild(self.gaps.values()[count:])
+
+    def first_start(self) -> Optional[float]:
+        if self.starts:
+            return self.starts[0]
+        return self.open_start
+
+    def online_seconds(self, since: float, until: float) -> float:
+        """Time online between `since` and `until` (at most now)"""
+        starts, ends = self.starts, self.ends
+        # Closed sessions overlapping the window: first ends after since,
+        # last starts before until
+        first = bisect_right(ends, since)
+        last = bisect_left(starts, until)
+        total = 0.0
+        if first < last:
+            total = self.elapsed[last] - self.elapsed[first]
+            total -= max(0.0, since - starts[first])
+            total -= max(0.0, ends[last - 1] - until)
+        if self.open_start is not None and self.open_start < until:
+            total += until - max(self.open_start, since)
+        return total
+
+    def _gap(self, index: int, now: float) -> Tuple[float, float]:
+        """Offline interval after closed session `index`"""
+        if index + 1 < len(self.starts):
+            return self.ends[index], self.starts[index + 1]
+        if self.open_start is not None:
+            return self.ends[index], self.open_start
+        # Still offline
+        return self.ends[index], now
+
+    def longest_outage(
+        self, since: float, until: float, now: float
+    ) -> Optional[Tuple[float, float]]:
+        """Longest offline interval (clipped to the window), None if none"""
+        ends = self.ends
+        # Gaps follow closed sessions; the ones overlapping the window start
+        # before until and end after since (at the latest the one right
+        # before since, which may reach into the window)
+        first = max(bisect_right(ends, since) - 1, 0)
+        last = bisect_left(ends, until)
+        if first >= last:
+            return None
+
+        best: Optional[Tuple[float, float]] = None
+        # Edge gaps are clipped to the window
+        for index in {first, last - 1}:
+            start, end = self._gap(index, now)
+            start, end = max(start, since), min(end, until)
+            if end > start and (best is None or end - start > best[1] - best[0]):
+                best = (start, end)
+
+        # Gaps strictly inside, but only those with a known end are in the
+        # tree: the one after the last closed session may still be open
+        inner_last = min(last - 1, len(self.gaps))
+        if first + 1 < inner_last:
+            longest = self.gaps.max(first + 1, inner_last)
+            if best is None or longest > best[1] - best[0]:
+                index = self.gaps.at_least(first + 1, inner_last, longest)[0]
+                best = self._gap(index, now)
+        return best
+
+
+class PresenceSessions:
+    """Sessions of every device, and an index of closed sessions by end"""
+
+    def __init__(self, max_sessions: int = 1000, max_index: int = 100000):
+        # Per device and in the index; the oldest half is dropped when full
+        self.max_sessions = max_sessions
+        self.max_index = max_index
+        self.devices: Dict[str, DeviceSessions] = {}
+        # Open sessions, oldest start first (mac -> start)
+        self.open: Dict[str, float] = {}
+        # Closed sessions of all devices in the order they closed; ends are
+        # when devices were last seen, so not sorted: index_reach holds the
+        # latest end so far, for bisection
+        self.index_ends: List[float] = []
+        self.index_reach: List[float] = []
+        self.index_macs: List[str] = []
+        self.index_starts = _MaxTree()  # negated, to find starts below a bound
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def open_session(self, mac: str, now: float):
+        """Device connected (first seen, or back after being offline)"""
+        sessions = self.devices.get(mac)
+        if sessions is None:
+            sessions = self.devices[mac] = DeviceSessions()
+        if sessions.open_start is None:
+            sessions.open(now)
+            self.open[mac] = now
+
+    def close_session(self, mac: str, end: float):
+        """Device confirmed offline; `end` is when it was last seen"""
+        sessions = self.devices.get(mac)
+        if sessions is None or sessions.open_start is None:
+            return
+        start = sessions.open_start
+        sessions.close(end)
+        del self.open[mac]
+        if len(sessions.starts) > self.max_sessions:
+            sessions.trim(len(sessions.starts) - self.max_sessions // 2)
+        self._index(mac, start, sessions.ends[-1])
+
+    def _index(self, mac: str, start: float, end: float):
+        reach = self.index_reach
+        self.index_ends.append(end)
+        reach.append(max(end, reach[-1]) if reach else end)
+        self.index_macs.append(mac)
+        self.index_starts.append(-start)
+        if len(self.index_ends) > self.max_index:
+            drop = len(self.index_ends) - self.max_index // 2
+            del self.index_ends[:drop]
+            del self.index_macs[:drop]
+            self.index_reach = list(accumulate(self.index_ends, max))
+            self.index_starts.rebuild(self.index_starts.values()[drop:])
+
+    def availability(
+        self, mac: str, since: float, until: float, now: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Uptime and longest outage of a device between `since` and `until`,
+        counting only time since it was first seen; None if never seen
+        """
+        sessions = self.devices.get(mac)
+        if sessions is None:
+            return None
+        until = min(until, now)
+        first_start = sessions.first_start()
+        monitored_since = max(since, first_start) if first_start is not None else until
+        monitored = max(until - monitored_since, 0.0)
+        online = sessions.online_seconds(monitored_since, until) if monitored else 0.0
+        longest = sessions.longest_outage(monitored_since, until, now)
+        outage = None
+        if longest is not None:
+            start, end = longest
+            outage = {"start": start, "end": end, "seconds": round(end - start, 3)}
+        return {
+            "monitored_seconds": round(monitored, 3),
+            "online_seconds": round(online, 3),
+            "uptime_percent": (
+                round(100.0 * online / monitored, 3) if monitored else None
+            ),
+            "sessions": len(sessions.starts) + (sessions.open_start is not None),
+            "online": sessions.open_start is not None,
+            "longest_outage": outage,
+        }
+
+    def online_between(self, since: float, until: float, now: float) -> List[str]:
+        """MACs of devices online at any time between `since` and `until`"""
+        found: Dict[str, None] = {}
+        # Closed sessions that ended at or after since and started by until;
+        # the ones closed before the first end reaching since are all older
+        first = bisect_left(self.index_reach, since)
+        ends, macs = self.index_ends, self.index_macs
+        for index in self.index_starts.at_least(first, len(macs), -until):
+            if ends[index] >= since:
+                found[macs[index]] = None
+        # Open sessions run until now; they are ordered by start
+        if since <= now:
+            for mac, start in self.open.items():
+                if start > until:
+                    break
+                found[mac] = None
+        return list(found)
+
+    def export_state(self) -> Dict[str, list]:
+        """mac -> [closed starts, closed ends, open start]"""
+        return {
+            mac: [sessions.starts, sessions.ends, sessions.open_start]
+            for mac, sessions in self.devices.items()
+        }
+
+    @staticmethod
+    def _load(
+        starts: List[float], ends: List[float], open_start: Optional[float]
+    ) -> DeviceSessions:
+        sessions = DeviceSessions()
+        for start, end in zip(starts, ends):
+            sessions.open(start)
+            sessions.close(end)
+        if open_start is not None:
+            sessions.open(open_start)
+        return sessions
+
+    def restore_state(self, state: Dict[str, list]):
+        self.devices = {}
+        closed = []
+        opened = []
+        for mac, (starts, ends, open_start) in state.items():
+            self.devices[mac] = self._load(starts, ends, open_start)
+            closed.extend(zip(ends, starts, [mac] * len(starts)))
+            if open_start is not None:
+                opened.append((open_start, mac))
+        self.open = {mac: start for start, mac in sorted(opened)}
+        closed.sort()
+        self.index_ends = [end for end, _, _ in closed]
+        self.index_reach = list(self.index_ends)
+        self.index_macs = [mac for _, _, mac in closed]
+        self.index_starts = _MaxTree(-start for _, start, _ in closed)
+
+    def device_bytes(self, mac: str) -> int:
+        """Approximate size of a device's sessions, 0 without any"""
+        sessions = self.devices.get(mac)
+        if sessions is None:
+            return 0
+        lists = (sessions.starts, sessions.ends, sessions.elapsed, sessions.gaps.tree)
+        # Each list entry points to a float object of its own
+        floats = sys.getsizeof(0.0) * sum(map(len, lists))
+        return sys.getsizeof(sessions) + sum(map(sys.getsizeof, lists)) + floats
+
+    def evict(self, mac: str) -> Optional[list]:
+        """
+        Forget a device's sessions; [closed starts, closed ends, open start],
+        None without any. Its closed sessions stay in the index.
+        """
+        sessions = self.devices.pop(mac, None)
+        if sessions is None:
+            return None
+        self.open.pop(mac, None)
+        return [sessions.starts, sessions.ends, sessions.open_start]
+
+    def restore_device(self, mac: str, state: Optional[list]):
+        """Put back sessions returned by evict, before the device reconnects"""
+        if state is None or mac in self.devices:
+            return
+        starts, ends, open_start = state
+        self.devices[mac] = self._load(starts, ends, open_start)
+        if open_start is not None:
+            self.open[mac] = open_start
+            # Keep open sessions ordered by start
+            self.open = dict(sorted(self.open.items(), key=lambda item: item[1]))
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "devices": len(self.devices),
+            "open": len(self.open),
+            "closed": sum(len(sessions.starts) for sessions in self.devices.values()),
+            "indexed": len(self.index_ends),
+        }
@@ -0,0 +1,123 @@
+"""
+Streaming statistics used by windowed alert rules
+Every structure updates in O(1) and answers queries in time bounded by
+its configuration, independent of how many samples it has seen
+"""
+
+import math
+from typing import Any, Dict, List, Optional
+
+
+class EWMA:
+    """
+    Time-aware exponentially weighted moving average
+    `half_life` is the number of seconds after which a sample's weight halves
+    """
+
+    __slots__ = ("half_life", "value", "last_time")
+
+    def __init__(self, half_life: float):
+        self.half_life = max(half_life, 1e-9)
+        self.value: Optional[float] = None
+        self.last_time: Optional[float] = None
+
+    def update(self, value: float, now: float) -> float:
+        if self.value is None or self.last_time is None:
+            self.value = value
+        else:
+            elapsed = max(now - self.last_time, 0.0)
+            alpha = 1.0 - math.pow(0.5, elapsed / self.half_life)
+            self.value += alpha * (value - self.value)
+        self.last_time = now
+        return self.value
+
+
+class SlidingWindow:
+    """
+    Sliding time window of samples summarised as a ring of sub-window slices
+
+    Each slice keeps a count, sum, max and a sparse log-bucketed histogram
+    (relative accuracy `accuracy`), so quantiles over the whole window are
+    answered by merging at most `slices` small histograms
+    """
+
+    __slots__ = ("window", "slice_width", "gamma", "log_gamma", "ring")
+
+    def __init__(self, window: float, slices: int = 10, accuracy: float = 0.02):
+        self.window = window
+        self.slice_width = window / slices
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # Each slot: [slice_number, count, total, max, {bucket: count}]
+        self.ring: List[Optional[List[Any]]] = [None] * slices
+
+    def _bucket(self, value: float) -> int:
+        if value <= 0:
+            return -(2**31)
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _bucket_value(self, bucket: int) -> float:
+        if bucket == -(2**31):
+            return 0.0
+        return 2 * math.pow(self.gamma, bucket) / (self.gamma + 1)
+
+    def update(self, value: float, now: float):
+        number = int(now // self.slice_width)
+        index = number % len(self.ring)
+        slot = self.ring[index]
+        if slot is None or slot[0] != number:
+            slot = [number, 0, 0.0, value, {}]
+            self.ring[index] = slot
+        slot[1] += 1
+        slot[2] += value
+        if value > slot[3]:
+            slot[3] = value
+        bucket = self._bucket(value)
+        slot[4][bucket] = slot[4].get(bucket, 0) + 1
+
+    def _live_slots(self, now: float) -> List[List[Any]]:
+        oldest = int(now // self.slice_width) - len(self.ring) + 1
+        return [slot for slot in self.ring if slot is not None and slot[0] >= oldest]
+
+    def count(self, now: float) -> int:
+        return sum(slot[1] for slot in self._live_slots(now))
+
+    def mean(self, now: float) -> Optional[float]:
+        slots = self._live_slots(now)
+        count = sum(slot[1] for slot in slots)
+        return sum(slot[2] for slot in slots) / count if count else None
+
+    def max(self, now: float) -> Optional[float]:
+        slots = self._live_slots(now)
+        return max(slot[3] for slot in slots) if slots else None
+
+    def quantile(self, q: float, now: float) -> Optional[float]:
+        merged: Dict[int, int] = {}
+        for slot in self._live_slots(now):
+            for bucket, count in slot[4].items():
+                merged[bucket] = merged.get(bucket, 0) + count
+        total = sum(merged.values())
+        if not total:
+            return None
+
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(merged):
+            seen += merged[bucket]
+            if seen > rank:
+                return self._bucket_value(bucket)
+        return self._bucket_value(max(merged))
+
+
+class MOfN:
+    """Counts how many of the last `n` boolean outcomes were True"""
+
+    __slots__ = ("mask", "bits")
+
+    def __init__(self, n: int):
+        self.mask = (1 << n) - 1
+        self.bits = 0
+
+    def push(self, hit: bool) -> int:
+        self.bits = ((self.bits << 1) | int(hit)) & self.mask
+        return bin(self.bits).count("1")
@@ -3,64 +3,274 @@ WebSocket manager for real-time network updates
 Manages WebSocket connections and broadcasts updates to connected clients
 """
 
+import logging
 import asyncio
-from typing import Set
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from fastapi import WebSocket
 from datetime import datetime
+from app.config import settings
+from app.services.event_hub import EventHub
+from app.services.frame_codec import JSON_CODEC, Frame, FrameCodec, negotiate
+from app.services.metrics import (
+    BROADCAST_DURATION,
+    BROADCAST_FAILURES,
+    BROADCAST_FRAMES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Topics a WebSocket client can subscribe to, besides device:<id>
+TOPICS = ("devices", "alerts", "stats")
+MAX_TOPICS_PER_CLIENT = 100
+
+# A client that doesn't accept a frame within this many seconds is dropped,
+# so one slow consumer can't hold up a broadcast
+SEND_TIMEOUT = 5.0
+
+# Device fields always kept by projections so clients can key updates
+KEY_FIELDS = ("id", "mac")
+
+
+def is_valid_topic(topic: str) -> bool:
+    return topic in TOPICS or (topic.startswith("device:") and len(topic) > 7)
+
+
+def project_devices(message: dict, fields: Optional[Tuple[str, ...]]) -> dict:
+    """Keep only the requested fields of the device objects in a message"""
+    if fields is None:
+        return message
+    projected = dict(message)
+    if "devices" in projected:
+        projected["devices"] = [
+            {key: device[key] for key in fields if key in device}
+            for device in projected["devices"]
+        ]
+    if "device" in projected:
+        device = projected["device"]
+        projected["device"] = {key: device[key] for key in fields if key in device}
+    return projected
 
 
 class ConnectionManager:
     """
     Manages WebSocket connections and broadcasts messages to all
     connected clients
+
+    Clients that subscribe to topics stop receiving the full broadcast and
+    only get topic messages, routed through a topic -> clients index.
+    Each client gets frames in the encoding negotiated when it connected.
     """
 
-    def __init__(self):
+    def __init__(self, replay_size: int = 1000):
         self.active_connections: Set[WebSocket] = set()
         self.broadcast_lock = asyncio.Lock()
+        # Topic events for SSE (and other streaming) subscribers
+        self.events = EventHub(replay_size=replay_size)
+        # WebSocket topic subscriptions: client -> (topics, device fields)
+        self.subscriptions: Dict[WebSocket, Dict] = {}
+        self.topic_index: Dict[str, Set[WebSocket]] = defaultdict(set)
+        # Clients that negotiated a subprotocol; the rest get JSON text
+        self.codecs: Dict[WebSocket, FrameCodec] = {}
+        # Closes of clients dropped for being too slow
+        self.closing: Set[asyncio.Task] = set()
 
     async def connect(self, websocket: WebSocket):
-        """Accept a new WebSocket connection"""
-        await websocket.accept()
+        """Accept a new WebSocket connection with the best offered encoding"""
+        codec = negotiate(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=codec.subprotocol)
         self.active_connections.add(websocket)
+        if codec is not JSON_CODEC:
+            self.codecs[websocket] = codec
+        hello = codec.hello()
+        if hello is not None:
+            await codec.send(websocket, hello)
         total = len(self.active_connections)
-        print(f"✓ WebSocket client connected. Total connections: {total}")
+        logger.info(
+            "✓ WebSocket client connected (%s). Total connections: %s",
+            codec.name,
+            total,
+        )
 
     def disconnect(self, websocket: WebSocket):
         """Remove a disconnected WebSocket"""
         self.active_connections.discard(websocket)
+        self.codecs.pop(websocket, None)
+        self.unsubscribe(websocket)
         total = len(self.active_connections)
-        print(f"✗ WebSocket client disconnected. Total: {total}")
+        logger.info("✗ WebSocket client disconnected. Total: %s", total)
+
+    def codec_for(self, websocket: WebSocket) -> FrameCodec:
+        return self.codecs.get(websocket, JSON_CODEC)
+
+    def decode(self, websocket: WebSocket, frame: Frame) -> Any:
+        """Decode a message from a client (JSON text or its encoding)"""
+        return self.codec_for(websocket).decode(frame)
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Send a message to a specific client"""
+        codec = self.codec_for(websocket)
         try:
-            await websocket.send_json(message)
+            await codec.send(websocket, codec.encode(message))
         except Exception as e:
-            print(f"Error sending personal message: {e}")
+            logger.error(
+                "Error sending personal message: %s", e, extra={"key": "ws_send_error"}
+            )
             self.disconnect(websocket)
 
+    def subscribe(
+        self,
+        websocket: WebSocket,
+        topics: Iterable[str],
+        fields: Optional[Iterable[str]] = None,
+    ) -> List[str]:
+        """
+        Subscribe a client to topics (`devices`, `alerts`, `stats` or
+        `device:<id>`), optionally projecting device objects to `fields`.
+        Returns the topics that were newly added.
+        """
+        topics = list(topics)
+        invalid = [topic for topic in topics if not is_valid_topic(topic)]
+        if invalid:
+            raise ValueError(f"Unknown topics: {', '.join(invalid)}")
+
+        subscription = self.subscriptions.setdefault(
+            websocket, {"topics": set(), "fields": None}
+        )
+        added = [topic for topic in topics if topic not in subscription["topics"]]
+        if len(subscription["topics"]) + len(added) > MAX_TOPICS_PER_CLIENT:
+            raise ValueError(f"At most {MAX_TOPICS_PER_CLIENT} topics per client")
+        if fields is not None:
+            subscription["fields"] = tuple(
+                dict.fromkeys([*KEY_FIELDS, *(str(field) for field in fields)])
+            )
+        for topic in added:
+            subscription["topics"].add(topic)
+            self.topic_index[topic].add(websocket)
+        return added
+
+    def unsubscribe(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None):
+        """Drop some (or all) of a client's topic subscriptions"""
+        subscription = self.subscriptions.get(websocket)
+        if subscription is None:
+            return
+        for topic in list(topics if topics is not None else subscription["topics"]):
+            subscription["topics"].discard(topic)
+            subscribers = self.topic_index.get(topic)
+            if subscribers is not None:
+                subscribers.discard(websocket)
+                if not subscribers:
+                    del self.topic_index[topic]
+        if topics is None:
+            del self.subscriptions[websocket]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self.topic_index
+
+    def device_topics(self) -> List[str]:
+        """device:<id> topics that currently have subscribers"""
+        return [topic for topic in self.topic_index if topic.startswith("device:")]
+
+    async def _send_all(
+        self,
+        connections: List[WebSocket],
+        message_for: Callable[[Optional[Tuple[str, ...]]], dict],
+        message_type: str,
+    ):
+        """
+        Send `message_for(fields)` to all clients concurrently, encoding it
+        once per distinct encoding and field projection, and remove clients
+        whose send fails or takes longer than SEND_TIMEOUT
+        """
+        start = time.perf_counter()
+        frames: Dict[Tuple[str, Optional[Tuple[str, ...]]], Frame] = {}
+        sends = []
+
+        for connection in connections:
+            subscription = self.subscriptions.get(connection)
+            fields = subscription["fields"] if subscription else None
+            codec = self.codecs.get(connection, JSON_CODEC)
+            frame = frames.get((codec.name, fields))
+            if frame is None:
+                frame = frames[codec.name, fields] = codec.encode(message_for(fields))
+            sends.append(asyncio.wait_for(codec.send(connection, frame), SEND_TIMEOUT))
+
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if not isinstance(result, BaseException):
+                BROADCAST_FRAMES.inc(type=message_type)
+                continue
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(
+                    "⚠️ Dropping WebSocket client that did not accept a frame "
+                    "within %ss",
+                    SEND_TIMEOUT,
+                    extra={"key": "ws_slow_client"},
+                )
+                self._close(connection)
+            else:
+                logger.error(
+                    "Error broadcasting to client: %s",
+                    result,
+                    extra={"key": "ws_broadcast_error"},
+                )
+            BROADCAST_FAILURES.inc()
+            # Clean up disconnected clients
+            self.disconnect(connection)
+
+        BROADCAST_DURATION.observe(time.perf_counter() - start, type=message_type)
+
+    def _close(self, websocket: WebSocket):
+        """Close a dropped client in the background (ending its receive loop)"""
+
+        async def close():
+            try:
+                await asyncio.wait_for(websocket.close(code=1013), SEND_TIMEOUT)
+            except Exception:
+                pass
+
+        task = asyncio.create_task(close())
+        self.closing.add(task)
+        task.add_done_callback(self.closing.discard)
+
     async def broadcast(self, message: dict):
         """
-        Broadcast a message to all connected clients
+        Broadcast a message to all clients without topic subscriptions
         Automatically removes disconnected clients
         """
-        if not self.active_connections:
+        connections = [
+            connection
+            for connection in self.active_connections
+            if connection not in self.subscriptions
+        ]
+        if not connections:
             return
 
         async with self.broadcast_lock:
-            disconnected = set()
+            # Encoded once per encoding instead of once per send
+            await self._send_all(
+                connections, lambda fields: message, message.get("type", "unknown")
+            )
 
-            for connection in self.active_connections:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    print(f"Error broadcasting to client: {e}")
-                    disconnected.add(connection)
+    async def publish(self, topic: str, message: dict):
+        """
+        Send a topic message to the clients subscribed to it, encoding it
+        once per distinct field projection
+        """
+        subscribers = self.topic_index.get(topic)
+        if not subscribers:
+            return
 
-            # Clean up disconnected clients
-            for connection in disconnected:
-                self.disconnect(connection)
+        message = {"topic": topic, "timestamp": datetime.now().isoformat(), **message}
+        connections = list(subscribers)
+
+        async with self.broadcast_lock:
+            await self._send_all(
+                connections,
+                lambda fields: project_devices(message, fields),
+                message.get("type", "unknown"),
+            )
 
     async def broadcast_network_update(self, data: dict):
         """
@@ -84,6 +294,13 @@ class ConnectionManager:
             "timestamp": datetime.now().isoformat(),
             "device": device,
         }
+        self.events.publish(
+            "devices", "device_event", {"event": event_type, "device": device}
+        )
+        topic_message = {"type": "device_event", "event": event_type, "device": device}
+        await self.publish("devices", topic_message)
+        if device.get("id"):
+            await self.publish(f"device:{device['id']}", topic_message)
         await self.broadcast(message)
 
     async def broadcast_alert(self, alert: dict):
@@ -97,13 +314,60 @@ class ConnectionManager:
         }
         await self.broadcast(message)
 
+    async def broadcast_alert_batch(
+        self,
+        alerts: list,
+        resolved: list,
+        resolved_devices: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Broadcast a batch of new alerts and resolved alert ids in one frame;
+        `resolved_devices` maps resolved ids to their device for device topics
+        """
+        message = {
+            "type": "alert_batch",
+            "timestamp": datetime.now().isoformat(),
+            "alerts": alerts,
+            "resolved": resolved,
+        }
+        self.events.publish(
+            "alerts", "alert_batch", {"alerts": alerts, "resolved": resolved}
+        )
+        await self.publish(
+            "alerts", {"type": "alert_batch", "alerts": alerts, "resolved": resolved}
+        )
+
+        # Device pages subscribed to device:<id> get that device's alerts
+        by_device: Dict[str, list] = defaultdict(list)
+        resolved_by_device: Dict[str, list] = defaultdict(list)
+        for alert in alerts:
+            topic = f"device:{alert.get('device_id')}"
+            if alert.get("device_id") and self.has_subscribers(topic):
+                by_device[topic].append(alert)
+        for alert_id, device_id in (resolved_devices or {}).items():
+            topic = f"device:{device_id}"
+            if self.has_subscribers(topic):
+                resolved_by_device[topic].append(alert_id)
+        for topic in dict.fromkeys([*by_device, *resolved_by_device]):
+            await self.publish(
+                topic,
+                {
+                    "type": "alert_batch",
+                    "alerts": by_device.get(topic, []),
+                    "resolved": resolved_by_device.get(topic, []),
+                },
+            )
+
+        await self.broadcast(message)
+
     async def send_heartbeat(self, websocket: WebSocket):
         """
         Send heartbeat/ping to check connection health
         """
+        codec = self.codec_for(websocket)
         try:
             ping_msg = {"type": "ping", "timestamp": datetime.now().isoformat()}
-            await websocket.send_json(ping_msg)
+            await codec.send(websocket, codec.encode(ping_msg))
         except Exception:
             self.disconnect(websocket)
 
@@ -111,6 +375,17 @@ class ConnectionManager:
         """Return the number of active connections"""
         return len(self.active_connections)
 
+    def encoding_counts(self) -> Dict[str, int]:
+        """Connected WebSocket clients by frame encoding"""
+        counts = {"json": len(self.active_connections) - len(self.codecs)}
+        for codec in self.codecs.values():
+            counts[codec.name] = counts.get(codec.name, 0) + 1
+        return counts
+
+    def watcher_count(self) -> int:
+        """WebSocket clients plus SSE subscribers"""
+        return len(self.active_connections) + len(self.events.subscribers)
+
 
 # Global connection manager instance
-manager = ConnectionManager()
+manager = ConnectionManager(replay_size=settings.event_replay_size)
@@ -0,0 +1,71 @@
+"""
+Run the hot path benchmarks
+
+Usage (from api-service/):
+    python -m benchmarks
+    python -m benchmarks --sizes 10,100,1000,5000 --scans 5 --output results.json
+    python -m benchmarks --baseline results.json --tolerance 0.25
+    python -m benchmarks --write-trace trace.jsonl --sizes 500 --steps 720
+"""
+
+import argparse
+import json
+import sys
+
+from benchmarks.scan_hot_path import compare, format_table, run
+from benchmarks.synthetic_network import CHURN_PATTERNS, SyntheticNetwork
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="AetherLink hot path benchmarks")
+    parser.add_argument("--sizes", default="10,100,1000", help="Device counts")
+    parser.add_argument(
+        "--patterns", default="stable,churn", help=f"Any of {CHURN_PATTERNS}"
+    )
+    parser.add_argument("--scans", type=int, default=5, help="Iterations per case")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --output")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed slowdown (0.25=25%%)"
+    )
+    parser.add_argument(
+        "--write-trace",
+        help="Write a replay trace for the first size/pattern instead of running",
+    )
+    parser.add_argument("--steps", type=int, default=720, help="Trace length")
+    args = parser.parse_args()
+
+    if args.write_trace:
+        network = SyntheticNetwork(
+            int(args.sizes.split(",")[0]), pattern=args.patterns.split(",")[0]
+        )
+        network.write_trace(args.write_trace, args.steps)
+        print(f"✅ Wrote {args.steps} scans to {args.write_trace}")
+        return 0
+
+    results = run(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        patterns=args.patterns.split(","),
+        scans=args.scans,
+    )
+    print(format_table(results))
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions detected:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\n✅ No regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
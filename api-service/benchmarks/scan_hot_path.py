@@ -0,0 +1,234 @@
+"""
+Benchmarks for the scan-to-publish hot path
+
+Each scenario drives the real NetworkMonitorService code against a
+SyntheticNetwork and reports, per iteration:
+- cpu_ms: process CPU time
+- wall_ms: wall-clock time
+- peak_kb: peak traced memory allocated during the call
+- retained_kb: traced memory still held after the call
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import socket
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+from unittest import mock
+
+from app.services.discovery import ArpScanBackend
+from app.services.network_monitor import NetworkMonitorService
+from benchmarks.synthetic_network import SyntheticNetwork
+
+
+def _no_reverse_dns(ip):
+    raise socket.herror("benchmark: reverse DNS disabled")
+
+
+@contextlib.contextmanager
+def simulated(network: SyntheticNetwork):
+    """Route the monitor's subprocess and DNS calls to the simulation"""
+    with mock.patch(
+        "app.services.network_monitor.subprocess.run", network.fake_run
+    ), mock.patch(
+        "app.services.discovery.subprocess.run", network.fake_run
+    ), mock.patch(
+        "socket.gethostbyaddr", _no_reverse_dns
+    ):
+        yield
+
+
+@contextlib.contextmanager
+def quiet_logs():
+    """Silence service logging so it neither skews timings nor floods output"""
+    logger = logging.getLogger("app")
+    previous = logger.disabled
+    logger.disabled = True
+    try:
+        yield
+    finally:
+        logger.disabled = previous
+
+
+def make_monitor() -> NetworkMonitorService:
+    """Monitor with caching disabled so every call performs a full scan"""
+    with quiet_logs():
+        monitor = NetworkMonitorService(
+            offline_grace=0, confirm_probes=1, discovery=ArpScanBackend("eth0")
+        )
+    monitor.cache_duration = 0
+    return monitor
+
+
+def measure(
+    loop: asyncio.AbstractEventLoop,
+    fn: Callable[[], Any],
+    iterations: int,
+    before_each: Callable[[], None] = lambda: None,
+) -> Dict[str, float]:
+    """
+    Run `fn` (sync or async) `iterations` times, first for timing and then
+    again under tracemalloc for memory, and summarise the samples
+    """
+
+    def call():
+        result = fn()
+        if asyncio.iscoroutine(result):
+            result = loop.run_until_complete(result)
+        return result
+
+    cpu, wall = [], []
+    for _ in range(iterations):
+        before_each()
+        start_cpu, start_wall = time.process_time(), time.perf_counter()
+        call()
+        cpu.append((time.process_time() - start_cpu) * 1000)
+        wall.append((time.perf_counter() - start_wall) * 1000)
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            before_each()
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            call()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append((peak - baseline) / 1024)
+            retained.append((current - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "cpu_ms": round(statistics.mean(cpu), 3),
+        "cpu_ms_max": round(max(cpu), 3),
+        "wall_ms": round(statistics.mean(wall), 3),
+        "peak_kb": round(max(peaks), 1),
+        "retained_kb": round(statistics.mean(retained), 1),
+    }
+
+
+def bench_scan(loop, size: int, pattern: str, scans: int) -> Dict[str, float]:
+    """Full scan_network: parsing, presence, history and alert evaluation"""
+    network = SyntheticNetwork(size, pattern=pattern, duplicate_ips=size // 200)
+    monitor = make_monitor()
+    with simulated(network):
+        # Warm up so first-seen pings and new-device handling are excluded
+        loop.run_until_complete(monitor.scan_network())
+        return measure(loop, monitor.scan_network, scans, before_each=network.step)
+
+
+def bench_alert_evaluation(loop, size: int, scans: int) -> Dict[str, float]:
+    """AlertManager batch evaluation of one scan result"""
+    network = SyntheticNetwork(size)
+    monitor = make_monitor()
+    with simulated(network):
+        devices = loop.run_until_complete(monitor.scan_network())
+    alert_manager = monitor.alert_manager
+    return measure(loop, lambda: alert_manager.evaluate_devices(devices), scans)
+
+
+def bench_anomaly_scoring(loop, size: int, scans: int) -> Dict[str, float]:
+    """Baseline scoring and learning of one scan result"""
+    network = SyntheticNetwork(size)
+    monitor = make_monitor()
+    with simulated(network):
+        devices = loop.run_until_complete(monitor.scan_network())
+    baselines = monitor.baselines
+    now = time.time()
+    return measure(loop, lambda: baselines.observe(devices, now), scans)
+
+
+def bench_payload(loop, size: int, scans: int) -> Dict[str, float]:
+    """WebSocket status payload building plus JSON encoding"""
+    network = SyntheticNetwork(size)
+    monitor = make_monitor()
+    with simulated(network):
+        devices = loop.run_until_complete(monitor.scan_network())
+        stats = loop.run_until_complete(monitor.get_system_stats())
+        activities = loop.run_until_complete(monitor.get_activities(limit=10))
+    chart_data = monitor.generate_chart_data()
+
+    def build():
+        payload = monitor.build_status_data(devices, stats, activities, chart_data)
+        return json.dumps(payload)
+
+    return measure(loop, build, scans)
+
+
+def run(sizes: List[int], patterns: List[str], scans: int) -> List[Dict[str, Any]]:
+    """Run every scenario and return one result row per scenario"""
+    results = []
+    loop = asyncio.new_event_loop()
+    try:
+        with quiet_logs():
+            for size in sizes:
+                for pattern in patterns:
+                    results.append(
+                        {
+                            "name": f"scan_network[{pattern}-{size}]",
+                            **bench_scan(loop, size, pattern, scans),
+                        }
+                    )
+                results.append(
+                    {
+                        "name": f"evaluate_devices[{size}]",
+                        **bench_alert_evaluation(loop, size, scans),
+                    }
+                )
+                results.append(
+                    {
+                        "name": f"anomaly_scoring[{size}]",
+                        **bench_anomaly_scoring(loop, size, scans),
+                    }
+                )
+                results.append(
+                    {
+                        "name": f"status_payload[{size}]",
+                        **bench_payload(loop, size, scans),
+                    }
+                )
+    finally:
+        # Cancel pending batched alert notifications and other tasks
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+    return results
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float
+) -> List[str]:
+    """Return a description of every metric that regressed past tolerance"""
+    previous = {row["name"]: row for row in baseline}
+    regressions = []
+    for row in results:
+        base = previous.get(row["name"])
+        if base is None:
+            continue
+        for metric in ("cpu_ms", "peak_kb"):
+            if base[metric] > 0 and row[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{row['name']} {metric}: {base[metric]} -> {row[metric]}"
+                )
+    return regressions
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    headers = ["name", "cpu_ms", "cpu_ms_max", "wall_ms", "peak_kb", "retained_kb"]
+    width = max(len(row["name"]) for row in results) + 2
+    lines = ["".join([headers[0].ljust(width)] + [h.rjust(12) for h in headers[1:]])]
+    for row in results:
+        lines.append(
+            "".join(
+                [row["name"].ljust(width)]
+                + [str(row[h]).rjust(12) for h in headers[1:]]
+            )
+        )
+    return "\n".join(lines)
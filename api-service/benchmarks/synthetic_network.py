@@ -0,0 +1,170 @@
+"""
+Synthetic network generator for benchmarks
+Produces fake arp-scan, `arp -a` and ping output for networks of any size,
+with churn patterns and duplicate IPs, so the real parsing and scan code
+paths can be exercised without a LAN or NET_RAW capability
+"""
+
+import json
+import random
+import subprocess
+from typing import Dict, List, Optional
+
+from app.services.mac_vendors import MAC_VENDORS
+
+CHURN_PATTERNS = ("stable", "churn", "flapping", "random_mac")
+
+
+class SyntheticNetwork:
+    """
+    A simulated LAN whose membership evolves on every `step()`
+
+    Patterns:
+    - stable: the same devices answer every scan
+    - churn: `churn_rate` of devices leave and others (re)join each step
+    - flapping: `churn_rate` of devices toggle presence every step
+    - random_mac: `churn_rate` of devices get a brand new random MAC
+      each step (phones with MAC randomisation)
+    """
+
+    def __init__(
+        self,
+        size: int,
+        pattern: str = "stable",
+        churn_rate: float = 0.05,
+        duplicate_ips: int = 0,
+        missing_response_time: float = 0.1,
+        seed: int = 42,
+    ):
+        if pattern not in CHURN_PATTERNS:
+            raise ValueError(f"Unknown churn pattern: {pattern}")
+        self.size = size
+        self.pattern = pattern
+        self.churn_rate = churn_rate
+        self.duplicate_ips = duplicate_ips
+        self.missing_response_time = missing_response_time
+        self.random = random.Random(seed)
+        self.ouis = list(MAC_VENDORS.keys())
+        self.devices: List[Dict] = [self._make_device(i) for i in range(size)]
+        self.by_ip: Dict[str, Dict] = {device["ip"]: device for device in self.devices}
+        self.flapping = set(
+            self.random.sample(range(size), int(size * churn_rate))
+            if pattern == "flapping"
+            else []
+        )
+        self.step_number = 0
+        self.render()
+
+    def _random_mac(self) -> str:
+        oui = self.random.choice(self.ouis)
+        tail = ":".join(f"{self.random.randrange(256):02x}" for _ in range(3))
+        return f"{oui}:{tail}"
+
+    def _make_device(self, index: int) -> Dict:
+        # 10.x.y.z addressing leaves room for thousands of hosts
+        ip = f"10.{index // 65025 % 255}.{index // 255 % 255}.{index % 255 + 1}"
+        return {
+            "ip": ip,
+            "mac": self._random_mac(),
+            "latency": round(self.random.lognormvariate(1.5, 0.8), 3),
+            "present": True,
+        }
+
+    def step(self):
+        """Advance the simulation by one scan interval"""
+        self.step_number += 1
+        count = int(self.size * self.churn_rate)
+
+        if self.pattern == "churn":
+            for device in self.random.sample(self.devices, count):
+                device["present"] = not device["present"]
+        elif self.pattern == "flapping":
+            for index in self.flapping:
+                self.devices[index]["present"] = not self.devices[index]["present"]
+        elif self.pattern == "random_mac":
+            for device in self.random.sample(self.devices, count):
+                device["mac"] = self._random_mac()
+
+        for device in self.devices:
+            device["latency"] = round(
+                max(0.1, device["latency"] * self.random.uniform(0.8, 1.25)), 3
+            )
+        self.render()
+
+    def render(self):
+        """
+        Pre-render command output for the current step so that generating
+        it is not counted in the measured scan time
+        """
+        self.rendered = {
+            "arp-scan": self.arp_scan_output(),
+            "arp": self.arp_table_output(),
+        }
+
+    def present_devices(self) -> List[Dict]:
+        return [device for device in self.devices if device["present"]]
+
+    def arp_scan_output(self) -> str:
+        """Render output in `arp-scan --quiet` format"""
+        lines = []
+        for device in self.present_devices():
+            if self.random.random() < self.missing_response_time:
+                lines.append(f"{device['ip']}\t{device['mac']}")
+            else:
+                lines.append(
+                    f"{device['ip']}\t{device['mac']}\tUnknown\t{device['latency']}ms"
+                )
+        for device in self.devices[: self.duplicate_ips]:
+            lines.append(f"{device['ip']}\t{self._random_mac()}\tUnknown\t(DUP: 2)")
+        return "\n".join(lines) + "\n"
+
+    def arp_table_output(self) -> str:
+        """Render output in `arp -a` format"""
+        return "\n".join(
+            f"? ({device['ip']}) at {device['mac']} [ether] on eth0"
+            for device in self.present_devices()
+        )
+
+    def ping_output(self, ip: str) -> Optional[str]:
+        """Render `ping -c 3` output, or None if the host is down"""
+        device = self.by_ip.get(ip)
+        if device is None or not device["present"]:
+            return None
+        latency = device["latency"]
+        return (
+            f"3 packets transmitted, 3 received, 0% packet loss, time 2003ms\n"
+            f"rtt min/avg/max/mdev = {latency * 0.9:.3f}/{latency:.3f}/"
+            f"{latency * 1.1:.3f}/0.100 ms\n"
+        )
+
+    def fake_run(self, cmd, *args, **kwargs) -> subprocess.CompletedProcess:
+        """Drop-in replacement for subprocess.run used by the monitor"""
+        program = cmd[0]
+        if program in self.rendered:
+            return subprocess.CompletedProcess(cmd, 0, self.rendered[program], "")
+        if program == "ping":
+            output = self.ping_output(cmd[-1])
+            if output is None:
+                return subprocess.CompletedProcess(cmd, 1, "", "")
+            return subprocess.CompletedProcess(cmd, 0, output, "")
+        raise FileNotFoundError(program)
+
+    def write_trace(self, path: str, steps: int, interval: float = 5.0):
+        """
+        Write `steps` scans as a trace for the replay discovery backend
+        (DISCOVERY_BACKEND=replay, DISCOVERY_REPLAY_PATH=<path>)
+        """
+        with open(path, "w") as handle:
+            for step in range(steps):
+                devices = [
+                    {
+                        "ip": device["ip"],
+                        "mac": device["mac"],
+                        "vendor": None,
+                        "response_time": device["latency"],
+                    }
+                    for device in self.present_devices()
+                ]
+                frame = {"t": round(step * interval, 3), "devices": devices}
+                handle.write(json.dumps(frame) + "\n")
+                self.step()
@@ -0,0 +1,199 @@
+"""
+WebSocket load generator and latency profiler
+
+Opens many concurrent /api/ws/network clients against a running server and
+reports publish-to-receive latency percentiles (from each message's
+server-side `timestamp`), frame sizes, per-type message counts and the
+server process' CPU and memory while under load. A fraction of clients can
+be made slow readers to exercise broadcaster backpressure.
+
+Usage (from api-service/, with the API running locally):
+    python -m benchmarks.websocket_load --clients 1000 --duration 60
+    python -m benchmarks.websocket_load --clients 500 --slow-fraction 0.1 \\
+        --slow-delay 2 --server-pid $(pgrep -f "uvicorn app.main")
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import psutil
+import websockets
+
+
+class LoadStats:
+    """Samples collected by all clients"""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.frame_sizes: List[int] = []
+        self.message_types: Dict[str, int] = {}
+        self.connected = 0
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.server_samples: List[Dict[str, float]] = []
+
+    def record(self, raw: str, received_at: float):
+        self.frame_sizes.append(len(raw))
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        message_type = message.get("type", "unknown")
+        self.message_types[message_type] = self.message_types.get(message_type, 0) + 1
+        stamp = message.get("timestamp")
+        if stamp:
+            # The server stamps messages with naive local time
+            sent_at = datetime.fromisoformat(stamp).timestamp()
+            self.latencies_ms.append((received_at - sent_at) * 1000)
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_client(
+    uri: str, stats: LoadStats, stop_at: float, slow_delay: Optional[float]
+):
+    """A single client: connect, then read until the test ends"""
+    try:
+        # Slow readers get a tiny receive queue so backpressure reaches TCP
+        async with websockets.connect(
+            uri, max_queue=1 if slow_delay else 32, open_timeout=30
+        ) as websocket:
+            stats.connected += 1
+            while (remaining := stop_at - time.time()) > 0:
+                try:
+                    raw = await asyncio.wait_for(websocket.recv(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                stats.record(raw if isinstance(raw, str) else raw.decode(), time.time())
+                if slow_delay:
+                    await asyncio.sleep(slow_delay)
+    except websockets.ConnectionClosed:
+        stats.disconnects += 1
+    except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake):
+        stats.connect_failures += 1
+
+
+async def sample_server(pid: int, stats: LoadStats, stop_at: float):
+    """Record server CPU% and RSS once per second"""
+    try:
+        process = psutil.Process(pid)
+        process.cpu_percent(None)
+        while time.time() < stop_at:
+            await asyncio.sleep(1)
+            stats.server_samples.append(
+                {
+                    "cpu_percent": process.cpu_percent(None),
+                    "rss_mb": process.memory_info().rss / (1024 * 1024),
+                }
+            )
+    except psutil.Error as e:
+        print(f"⚠️ Stopped sampling server process {pid}: {e}")
+
+
+def raise_fd_limit(clients: int):
+    """Thousands of sockets need more than the default 1024 descriptors"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, clients + 256))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+async def run_load(args) -> Dict[str, Any]:
+    raise_fd_limit(args.clients)
+    stats = LoadStats()
+    stop_at = time.time() + args.ramp + args.duration
+    slow_clients = int(args.clients * args.slow_fraction)
+
+    tasks = []
+    if args.server_pid:
+        tasks.append(
+            asyncio.create_task(sample_server(args.server_pid, stats, stop_at))
+        )
+
+    # Ramp clients up evenly instead of opening them all at once
+    interval = args.ramp / args.clients if args.clients else 0
+    for index in range(args.clients):
+        slow_delay = args.slow_delay if index < slow_clients else None
+        tasks.append(
+            asyncio.create_task(run_client(args.uri, stats, stop_at, slow_delay))
+        )
+        if interval:
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(*tasks)
+    return summarize(stats, args)
+
+
+def summarize(stats: LoadStats, args) -> Dict[str, Any]:
+    latencies = stats.latencies_ms
+    sizes = stats.frame_sizes
+    summary: Dict[str, Any] = {
+        "clients": args.clients,
+        "slow_clients": int(args.clients * args.slow_fraction),
+        "connected": stats.connected,
+        "connect_failures": stats.connect_failures,
+        "disconnects": stats.disconnects,
+        "messages": len(sizes),
+        "message_types": stats.message_types,
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies) if latencies else None,
+        },
+        "frame_bytes": {
+            "mean": statistics.mean(sizes) if sizes else None,
+            "p99": percentile(sizes, 0.99),
+            "max": max(sizes) if sizes else None,
+            "total": sum(sizes),
+        },
+    }
+    if stats.server_samples:
+        cpu = [sample["cpu_percent"] for sample in stats.server_samples]
+        rss = [sample["rss_mb"] for sample in stats.server_samples]
+        summary["server"] = {
+            "cpu_percent_mean": round(statistics.mean(cpu), 1),
+            "cpu_percent_max": max(cpu),
+            "rss_mb_max": round(max(rss), 1),
+        }
+    return summary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="AetherLink WebSocket load test")
+    parser.add_argument("--uri", default="ws://localhost:8000/api/ws/network")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--ramp", type=float, default=5, help="Ramp-up seconds")
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument(
+        "--slow-delay", type=float, default=1.0, help="Seconds between slow reads"
+    )
+    parser.add_argument("--server-pid", type=int, help="Sample this process")
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"🚀 {args.clients} clients -> {args.uri} for {args.duration}s")
+    summary = asyncio.run(run_load(args))
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(summary, handle, indent=2)
+    return 0 if summary["connected"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+WebSocket frame encoding benchmark
+
+Builds a real `network_update` message for a synthetic network and compares
+frame size and encode time of every encoding /api/ws/network can negotiate
+(JSON text, MessagePack and CBOR with interned keys), plus the binary
+encodings without interning to show what the key table saves. Encodings
+whose optional package isn't installed are skipped.
+
+Usage (from api-service/):
+    python -m benchmarks.ws_encoding
+    python -m benchmarks.ws_encoding --devices 500,2000 --iterations 200
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from app.services.frame_codec import CODECS, JSON_CODEC
+from benchmarks.scan_hot_path import make_monitor, quiet_logs, simulated
+from benchmarks.synthetic_network import SyntheticNetwork
+
+
+def build_message(size: int) -> Dict[str, Any]:
+    """A network_update message as broadcast for a network of `size` devices"""
+    network = SyntheticNetwork(size)
+    monitor = make_monitor()
+    loop = asyncio.new_event_loop()
+    try:
+        with quiet_logs(), simulated(network):
+            devices = loop.run_until_complete(monitor.scan_network())
+            stats = loop.run_until_complete(monitor.get_system_stats())
+            activities = loop.run_until_complete(monitor.get_activities(limit=10))
+    finally:
+        # Cancel pending batched alert notifications
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+    chart_data = monitor.generate_chart_data()
+    return {
+        "type": "network_update",
+        "timestamp": datetime.now().isoformat(),
+        "data": monitor.build_status_data(devices, stats, activities, chart_data),
+    }
+
+
+def encoders() -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+    result = {"json": JSON_CODEC.encode}
+    for codec in CODECS.values():
+        if codec.binary:
+            result[codec.name] = codec.encode
+            result[f"{codec.name} (plain keys)"] = codec.dumps
+    return result
+
+
+def measure(encode: Callable, message: Dict[str, Any], iterations: int):
+    frame = encode(message)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        encode(message)
+        samples.append((time.perf_counter() - start) * 1000)
+    data = frame.encode() if isinstance(frame, str) else frame
+    return {
+        "frame_bytes": len(data),
+        "gzip_bytes": len(gzip.compress(data, compresslevel=6)),
+        "encode_ms": round(statistics.median(samples), 3),
+        "encode_ms_p95": round(sorted(samples)[int(len(samples) * 0.95)], 3),
+    }
+
+
+def run(sizes: List[int], iterations: int) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        message = build_message(size)
+        baseline = None
+        for name, encode in encoders().items():
+            row = {"name": f"{name}[{size}]", **measure(encode, message, iterations)}
+            baseline = baseline or row
+            row["size_vs_json"] = round(row["frame_bytes"] / baseline["frame_bytes"], 3)
+            results.append(row)
+    return results
+
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    headers = [
+        "name",
+        "frame_bytes",
+        "size_vs_json",
+        "gzip_bytes",
+        "encode_ms",
+        "encode_ms_p95",
+    ]
+    width = max(len(row["name"]) for row in results) + 2
+    lines = ["".join([headers[0].ljust(width)] + [h.rjust(14) for h in headers[1:]])]
+    for row in results:
+        lines.append(
+            "".join(
+                [row["name"].ljust(width)]
+                + [str(row[h]).rjust(14) for h in headers[1:]]
+            )
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="WebSocket frame encodings")
+    parser.add_argument("--devices", default="500", help="Device counts")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.devices.split(",")], args.iterations)
+    print(format_table(results))
+    if len(encoders()) == 1:
+        print("\nℹ️ Install msgpack and/or cbor2 to compare binary encodings")
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Shared fixtures for the API service tests
+The service is configured before any app module is imported: discovery
+replays tests/data/trace.jsonl, so no test touches the real network, and
+the publish loop only runs its startup cycle.
+"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+TRACE = Path(__file__).parent / "data" / "trace.jsonl"
+
+os.environ.update(
+    DISCOVERY_BACKEND="replay",
+    DISCOVERY_REPLAY_PATH=str(TRACE),
+    PUBLISH_INTERVAL="3600",
+    SCAN_IDLE_INTERVAL="3600",
+    LOG_LEVEL="WARNING",
+    LOG_JSON="false",
+)
+os.environ.pop("ADMIN_TOKEN", None)
+
+from benchmarks.scan_hot_path import quiet_logs, simulated  # noqa: E402
+from benchmarks.synthetic_network import SyntheticNetwork  # noqa: E402
+from app.services.discovery import ArpScanBackend  # noqa: E402
+from app.services.network_monitor import NetworkMonitorService  # noqa: E402
+
+
+class FakeClock:
+    """Stand-in for time.time that only moves when told to"""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(time, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def loop():
+    """An event loop kept across calls, as the service's would be"""
+    loop = asyncio.new_event_loop()
+    yield loop
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+
+
+@pytest.fixture
+def make_monitor():
+    """Build monitors scanning a simulated network with caching disabled"""
+    monitors = []
+
+    def make(**options) -> NetworkMonitorService:
+        options.setdefault("offline_grace", 0)
+        options.setdefault("confirm_probes", 1)
+        with quiet_logs():
+            monitor = NetworkMonitorService(discovery=ArpScanBackend("eth0"), **options)
+        monitor.cache_duration = 0
+        monitors.append(monitor)
+        return monitor
+
+    yield make
+    for monitor in monitors:
+        monitor.governor.close()
+
+
+@pytest.fixture
+def scan(loop):
+    """Run one scan of `monitor` against `network`"""
+
+    def run(monitor: NetworkMonitorService, network: SyntheticNetwork):
+        with simulated(network), quiet_logs():
+            return loop.run_until_complete(monitor.scan_network())
+
+    return run
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The app with its services started once for all API tests"""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
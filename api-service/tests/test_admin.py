@@ -0,0 +1,56 @@
+"""Admin endpoints: token checks and the sampling profiler"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.services.profiler import SamplingProfiler
+
+
+@pytest.fixture
+def admin_token():
+    original = settings.admin_token
+    settings.admin_token = "secret"
+    yield "secret"
+    settings.admin_token = original
+
+
+def test_admin_is_disabled_without_a_token(client):
+    assert settings.admin_token is None
+    response = client.get("/api/admin/profile", headers={"X-Admin-Token": ""})
+    assert response.status_code == 404
+
+
+def test_admin_rejects_a_wrong_token(client, admin_token):
+    assert client.get("/api/admin/profile").status_code == 403
+    response = client.get("/api/admin/profile", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+    response = client.get("/api/admin/profile", headers={"X-Admin-Token": admin_token})
+    # Authorized: no profiling session yet
+    assert response.json()["detail"] == "No profiling session"
+
+
+def app_frame(name: str):
+    code = SimpleNamespace(co_name=name, co_qualname=name)
+    globals_ = {"__name__": "app.services.network_monitor"}
+    return SimpleNamespace(f_code=code, f_globals=globals_, f_back=None)
+
+
+def test_profile_reads_while_the_sampler_records():
+    profiler = SamplingProfiler()
+    frames = [app_frame(f"scan_{i}") for i in range(5000)]
+
+    def sample():
+        for frame in frames:
+            profiler._record(frame)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    while sampler.is_alive():
+        report = profiler.report()
+        assert report["scoped_samples"] == len(report["stacks"])
+        profiler.collapsed()
+    sampler.join()
+    assert len(profiler.collapsed().splitlines()) == 5000
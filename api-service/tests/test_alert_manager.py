@@ -0,0 +1,178 @@
+"""Alert lifecycle: deduplication, auto-resolve, flood suppression and eviction"""
+
+import pytest
+
+from app.models.network import AlertRule, AlertType, NetworkDevice
+from app.services.alert_manager import PRUNE_INTERVAL, AlertManager
+
+from conftest import FakeClock
+
+
+def make_device(device_id: str = "dev1", **fields) -> NetworkDevice:
+    fields.setdefault("status", "online")
+    fields.setdefault("type", "phone")
+    return NetworkDevice(
+        id=device_id, name=device_id, ip="10.0.0.1", mac=device_id, **fields
+    )
+
+
+@pytest.fixture
+def alert_clock() -> FakeClock:
+    return FakeClock(0.0)
+
+
+@pytest.fixture
+def manager(alert_clock) -> AlertManager:
+    manager = AlertManager(clock=alert_clock)
+    # Raise on every sample above 100 ms
+    manager.update_rule(
+        AlertRule(id="high_latency", type=AlertType.HIGH_LATENCY, latency_threshold=100)
+    )
+    return manager
+
+
+def types(events):
+    return [(event.type, event.resolved) for event in events]
+
+
+def test_new_device_alerts_once(manager):
+    assert types(manager.evaluate_devices([make_device()])) == [
+        (AlertType.NEW_DEVICE, False)
+    ]
+    assert manager.evaluate_devices([make_device()]) == []
+
+
+def test_repeats_fold_into_the_open_alert(manager, alert_clock):
+    manager.evaluate_devices([make_device()])
+    events = manager.evaluate_devices([make_device(latency=300)])
+    assert types(events) == [(AlertType.HIGH_LATENCY, False)]
+
+    for _ in range(3):
+        alert_clock.advance(10)
+        assert manager.evaluate_devices([make_device(latency=300)]) == []
+    assert events[0].occurrences == 4
+
+
+def test_rule_alert_resolves_after_consecutive_clear_scans(manager):
+    manager.evaluate_devices([make_device(latency=300)])
+    assert manager.evaluate_devices([make_device(latency=10)]) == []
+    # A breach in between restarts the count
+    manager.evaluate_devices([make_device(latency=300)])
+    assert manager.evaluate_devices([make_device(latency=10)]) == []
+
+    events = manager.evaluate_devices([make_device(latency=10)])
+    assert types(events) == [(AlertType.HIGH_LATENCY, True)]
+    assert "dev1" not in manager.rule_alerts
+    assert not manager.clear_counts
+
+
+def test_offline_devices_do_not_resolve_rule_alerts(manager):
+    manager.evaluate_devices([make_device(latency=300)])
+    for _ in range(3):
+        manager.evaluate_devices([make_device(status="offline", latency=10)])
+    assert "high_latency:dev1" in manager.open_alerts
+
+
+def test_flood_limit_suppresses_flapping_alerts(manager, alert_clock):
+    manager.evaluate_devices([make_device()])
+    raised = 0
+    for _ in range(10):
+        alert_clock.advance(10)
+        raised += len(manager.evaluate_devices([make_device(latency=300)]))
+        for _ in range(manager.resolve_after):
+            manager.evaluate_devices([make_device(latency=10)])
+    assert raised == manager.flood_limit
+    assert manager.suppressed_count == 10 - manager.flood_limit
+
+    # Allowed again once the window has passed
+    alert_clock.advance(manager.flood_window)
+    assert len(manager.evaluate_devices([make_device(latency=300)])) == 1
+
+
+def test_prune_drops_expired_flood_history_and_orphaned_clear_counts(
+    manager, alert_clock
+):
+    manager.evaluate_devices([make_device(latency=300)])
+    manager.evaluate_devices([make_device(latency=10)])
+    assert manager.clear_counts == {"high_latency:dev1": 1}
+    manager.open_alerts.pop("high_latency:dev1")
+
+    alert_clock.advance(manager.flood_window + PRUNE_INTERVAL)
+    manager.evaluate_devices([])
+    assert manager.flood_history == {}
+    assert manager.clear_counts == {}
+    assert manager.pruned_at == alert_clock.now
+
+
+def test_offline_alert_waits_for_the_threshold_and_resolves(manager, alert_clock):
+    manager.rules["device_offline"].offline_threshold = 60
+    manager.evaluate_devices([make_device()])
+
+    alert_clock.advance(30)
+    assert manager.evaluate_devices([make_device(status="offline")]) == []
+    assert manager.awaits_offline_alert("dev1")
+
+    alert_clock.advance(30)
+    events = manager.evaluate_devices([make_device(status="offline")])
+    assert types(events) == [(AlertType.DEVICE_OFFLINE, False)]
+    assert not manager.awaits_offline_alert("dev1")
+
+    events = manager.evaluate_devices([make_device()])
+    assert types(events) == [(AlertType.DEVICE_OFFLINE, True)]
+
+
+def test_acknowledged_alerts_stay_open_until_resolved(manager):
+    alert = manager.evaluate_devices([make_device(latency=300)])[1]
+    assert manager.acknowledge_alert(alert.id)
+    assert manager.get_unacknowledged_count() == 1  # the new device alert
+    # Still folded, not raised again
+    assert manager.evaluate_devices([make_device(latency=300)]) == []
+
+
+def test_evicted_device_resolves_its_alerts_when_back(manager, alert_clock):
+    manager.rules["device_offline"].offline_threshold = 0
+    manager.evaluate_devices([make_device(latency=300)])
+    manager.evaluate_devices([make_device(status="offline")])
+    assert manager.device_bytes("dev1") > 0
+
+    state = manager.evict_device("dev1")
+    assert manager.device_bytes("dev1") == 0
+    assert "dev1" not in manager.device_states
+    # Evicted devices are not tracked again while offline
+    assert manager.evaluate_devices([make_device(status="offline")]) == []
+
+    manager.restore_device("dev1", state)
+    events = manager.evaluate_devices([make_device(latency=10)])
+    assert types(events) == [(AlertType.DEVICE_OFFLINE, True)]
+    events = manager.evaluate_devices([make_device(latency=10)])
+    assert types(events) == [(AlertType.HIGH_LATENCY, True)]
+
+
+def test_restored_device_without_state_is_not_new(manager, alert_clock):
+    manager.rules["device_offline"].offline_threshold = 0
+    manager.evaluate_devices([make_device()])
+    manager.evaluate_devices([make_device(status="offline")])
+    state = manager.evict_device("dev1")
+    assert not manager.open_alerts
+
+    # Lifecycle state lost; the open offline alert spilled with the device
+    alert_clock.advance(100)
+    manager.restore_device("dev1", {"open_alerts": state["open_alerts"]})
+    assert manager.device_states["dev1"]["last_seen"] == alert_clock.now
+    events = manager.evaluate_devices([make_device()])
+    assert types(events) == [(AlertType.DEVICE_OFFLINE, True)]
+
+
+def test_state_round_trips(manager, alert_clock):
+    manager.evaluate_devices([make_device(latency=300)])
+    manager.evaluate_devices([make_device(latency=10)])
+
+    restored = AlertManager(clock=alert_clock)
+    restored.restore_state(manager.export_state())
+    assert restored.rules["high_latency"].latency_threshold == 100
+    assert set(restored.open_alerts) == set(manager.open_alerts)
+    assert restored.clear_counts == manager.clear_counts
+    assert len(restored.store) == len(manager.store)
+
+    events = restored.evaluate_devices([make_device(latency=10)])
+    assert types(events) == [(AlertType.HIGH_LATENCY, True)]
@@ -0,0 +1,123 @@
+"""Alert history: indexed queries, pagination, eviction and persistence"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.network import Alert, AlertSeverity, AlertType
+from app.services.alert_store import AlertStore
+
+START = datetime(2024, 1, 1)
+TYPES = [AlertType.HIGH_LATENCY, AlertType.PACKET_LOSS, AlertType.NEW_DEVICE]
+SEVERITIES = [AlertSeverity.INFO, AlertSeverity.WARNING, AlertSeverity.ERROR]
+
+
+def make_alerts(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        Alert(
+            id=f"alert-{i}",
+            type=rng.choice(TYPES),
+            severity=rng.choice(SEVERITIES),
+            title="t",
+            message="m",
+            device_id=rng.choice(["a", "b", "c", None]),
+            timestamp=START + timedelta(seconds=10 * i),
+        )
+        for i in range(count)
+    ]
+
+
+def filled(alerts, **options) -> AlertStore:
+    store = AlertStore(**options)
+    for alert in alerts:
+        store.add(alert)
+    return store
+
+
+def matches(
+    alert, device_id=None, alert_type=None, severity=None, since=None, until=None
+):
+    return (
+        (device_id is None or alert.device_id == device_id)
+        and (alert_type is None or alert.type.value == alert_type)
+        and (severity is None or alert.severity.value == severity)
+        and (since is None or alert.timestamp >= since)
+        and (until is None or alert.timestamp <= until)
+    )
+
+
+def pages(store, limit, **filters):
+    results, cursor = store.query(limit=limit, **filters)
+    while cursor is not None:
+        page, cursor = store.query(cursor=cursor, limit=limit, **filters)
+        results.extend(page)
+    return results
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"device_id": "a"},
+        {"alert_type": "packet_loss", "severity": "error"},
+        {"device_id": "b", "since": START + timedelta(seconds=500)},
+        {"until": START + timedelta(seconds=800), "severity": "info"},
+        {"device_id": "missing"},
+    ],
+)
+def test_paginated_queries_match_a_scan(filters):
+    alerts = make_alerts(300)
+    store = filled(alerts)
+    expected = [alert.id for alert in reversed(alerts) if matches(alert, **filters)]
+    assert [alert.id for alert in pages(store, 7, **filters)] == expected
+
+
+def test_eviction_keeps_the_newest_alerts_and_their_indexes():
+    alerts = make_alerts(250)
+    store = filled(alerts, max_alerts=100)
+    assert len(store) == 100
+    assert store.get("alert-0") is None
+    kept = alerts[150:]
+    expected = [a.id for a in reversed(kept) if a.device_id == "a"]
+    assert [a.id for a in pages(store, 10, device_id="a")] == expected
+
+
+def test_query_range_walks_oldest_first():
+    alerts = make_alerts(100)
+    store = filled(alerts)
+    since = START + timedelta(seconds=100)
+    until = START + timedelta(seconds=600)
+
+    results, cursor = store.query_range(since, until, limit=20)
+    while cursor is not None:
+        page, cursor = store.query_range(since, until, after=cursor, limit=20)
+        results.extend(page)
+    assert [a.id for a in results] == [
+        a.id for a in alerts if since <= a.timestamp <= until
+    ]
+
+
+def test_history_survives_a_restart(tmp_path):
+    path = str(tmp_path / "alerts.jsonl")
+    alerts = make_alerts(20)
+    store = filled(alerts, path=path)
+    alerts[3].acknowledged = True
+    store.update(alerts[3])
+
+    reloaded = AlertStore(path=path)
+    assert len(reloaded) == 20
+    assert reloaded.get("alert-3").acknowledged
+    assert [a.id for a in reloaded.query(limit=3)[0]] == [
+        "alert-19",
+        "alert-18",
+        "alert-17",
+    ]
+
+
+def test_log_is_compacted(tmp_path):
+    path = tmp_path / "alerts.jsonl"
+    filled(make_alerts(50), max_alerts=10, path=str(path))
+    assert len(path.read_text().splitlines()) <= 2 * 10 + 1
+    assert len(AlertStore(max_alerts=10, path=str(path))) == 10
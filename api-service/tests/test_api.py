@@ -0,0 +1,49 @@
+"""Polling endpoints against the replayed trace: conditional requests"""
+
+import pytest
+
+from app.services.container import services
+
+
+def test_health(client):
+    # Answers while services are still starting
+    assert client.get("/health").json()["status"] == "healthy"
+    client.get("/api/devices")
+    assert client.get("/health").json() == {"status": "healthy", "ready": True}
+
+
+def test_devices_are_served_from_the_trace(client):
+    devices = client.get("/api/devices").json()
+    assert sorted(device["ip"] for device in devices) == [
+        "192.168.1.10",
+        "192.168.1.11",
+        "192.168.1.12",
+    ]
+
+
+@pytest.mark.parametrize("path", ["/api/devices", "/api/network/status"])
+def test_unchanged_snapshot_returns_304(client, path):
+    response = client.get(path)
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert response.headers["cache-control"] == "no-cache"
+
+    cached = client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    # Weak comparison, lists and wildcards
+    strong = etag.removeprefix("W/")
+    for header in (strong, f'"other", {etag}', "*"):
+        assert client.get(path, headers={"If-None-Match": header}).status_code == 304
+    assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_new_stats_sample_changes_the_status_etag(client):
+    etag = client.get("/api/network/status").headers["etag"]
+    # Let the stats cache expire
+    services.monitor.stats_time -= 3600
+    response = client.get("/api/network/status", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
@@ -0,0 +1,94 @@
+"""Hour-of-day baselines and anomaly scores"""
+
+from datetime import datetime
+
+import pytest
+
+from app.models.network import NetworkDevice
+from app.services.baselines import DeviceBaselines
+
+NOON = datetime(2024, 1, 1, 12).timestamp()
+
+
+def make_device(mac: str, latency: float, packet_loss: float = 0.0) -> NetworkDevice:
+    return NetworkDevice(
+        id=mac,
+        name=mac,
+        ip="10.0.0.1",
+        mac=mac,
+        status="online",
+        type="phone",
+        latency=latency,
+        packet_loss=packet_loss,
+    )
+
+
+def learn(baselines, mac, values, timestamp=NOON):
+    for value in values:
+        device = make_device(mac, value)
+        baselines.observe([device], timestamp)
+    return device
+
+
+def test_scores_wait_for_min_samples():
+    baselines = DeviceBaselines(min_samples=5)
+    device = learn(baselines, "a", [10.0] * 5)
+    assert device.anomaly_score is None
+    # Scored once five samples were learned
+    device = learn(baselines, "a", [10.0])
+    assert device.anomaly_score == 0.0
+
+
+def test_degradation_scores_in_deviations():
+    baselines = DeviceBaselines(min_samples=5)
+    learn(baselines, "a", [8.0, 12.0] * 10)
+    baseline = baselines.get_baseline("a", hour=12)
+    assert baseline["latency"]["mean"] == pytest.approx(10, abs=0.5)
+
+    spike = learn(baselines, "a", [30.0])
+    assert spike.anomaly_score == pytest.approx(10, rel=0.2)
+    # Improvements are never anomalous
+    assert learn(baselines, "a", [1.0]).anomaly_score == 0.0
+
+
+def test_steady_devices_use_the_floor():
+    baselines = DeviceBaselines(min_samples=5)
+    learn(baselines, "a", [100.0] * 20)
+    # 10% of the mean: 105 ms is half a deviation
+    assert learn(baselines, "a", [105.0]).anomaly_score == pytest.approx(0.5)
+
+
+def test_other_hours_fall_back_to_the_all_day_baseline():
+    baselines = DeviceBaselines(min_samples=5)
+    learn(baselines, "a", [100.0] * 20)
+    evening = datetime(2024, 1, 1, 20).timestamp()
+    assert learn(baselines, "a", [150.0], evening).anomaly_score == pytest.approx(5)
+    assert baselines.get_baseline("a", hour=20)["latency"]["samples"] == 1
+
+
+def test_evicted_baselines_are_restored():
+    baselines = DeviceBaselines(min_samples=5, capacity=1)
+    learn(baselines, "a", [10.0] * 10)
+    learn(baselines, "b", [50.0] * 10)
+    before = baselines.get_baseline("a")
+    assert baselines.device_bytes("a") > 0
+
+    data = baselines.evict("a")
+    assert baselines.get_baseline("a") is None
+    learn(baselines, "c", [20.0] * 10)  # takes the freed row
+    baselines.restore_device("a", data)
+    assert baselines.get_baseline("a") == before
+    assert baselines.get_baseline("c")["latency"]["mean"] == 20.0
+
+
+def test_state_round_trips():
+    baselines = DeviceBaselines()
+    learn(baselines, "a", [10.0, 20.0])
+    baselines.evict("a")
+    learn(baselines, "b", [30.0])
+
+    restored = DeviceBaselines()
+    restored.restore_state(baselines.export_state())
+    assert restored.get_baseline("b") == baselines.get_baseline("b")
+    assert restored.get_baseline("a") is None
+    assert restored.free_rows == baselines.free_rows
@@ -0,0 +1,71 @@
+"""Local broker: RESP encoding, key/value and pub/sub"""
+
+import asyncio
+
+import pytest
+
+from app.services.broker import (
+    BrokerClient,
+    BrokerError,
+    LocalBroker,
+    encode_command,
+    encode_reply,
+    parse_url,
+)
+
+
+def test_resp_encoding():
+    assert (
+        encode_command("SET", "key", 5)
+        == b"*3\r\n$3\r\nSET\r\n$3\r\nkey\r\n$1\r\n5\r\n"
+    )
+    assert encode_reply(None) == b"$-1\r\n"
+    assert encode_reply(2) == b":2\r\n"
+    assert encode_reply("OK") == b"+OK\r\n"
+    assert encode_reply([b"a", 1]) == b"*2\r\n$1\r\na\r\n:1\r\n"
+    assert encode_reply(BrokerError("nope")) == b"-ERR nope\r\n"
+
+
+def test_parse_url():
+    assert parse_url("unix:///tmp/b.sock") == ("unix", {"path": "/tmp/b.sock"})
+    kind, address = parse_url("redis://:pw@cache:6380/2")
+    assert kind == "tcp"
+    assert address == {"host": "cache", "port": 6380, "db": 2, "password": "pw"}
+    with pytest.raises(ValueError):
+        parse_url("http://example.com")
+
+
+def test_get_set_and_publish(tmp_path):
+    url = f"unix://{tmp_path / 'broker.sock'}"
+
+    async def scenario():
+        broker = LocalBroker(url)
+        await broker.start()
+        client = BrokerClient(url, timeout=2)
+        received = asyncio.Queue()
+
+        async def handler(channel, payload):
+            await received.put((channel, payload))
+
+        subscribed = asyncio.Event()
+
+        async def on_connect():
+            subscribed.set()
+
+        listener = asyncio.create_task(
+            client.subscribe(["events"], handler, on_connect)
+        )
+        try:
+            await asyncio.wait_for(subscribed.wait(), 2)
+            assert await client.get("state") is None
+            await client.set("state", b"v1")
+            assert await client.get("state") == b"v1"
+            assert await client.publish("events", b"hello") == 1
+            return await asyncio.wait_for(received.get(), 2)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            await client.close()
+            await broker.stop()
+
+    assert asyncio.run(scenario()) == ("events", b"hello")
@@ -0,0 +1,46 @@
+"""Bulk history and activity endpoints for many devices"""
+
+import pytest
+
+TRACE_MACS = ["aa:bb:cc:00:00:01", "aa:bb:cc:00:00:02"]
+TRACE_IDS = [mac.replace(":", "") for mac in TRACE_MACS]
+
+
+@pytest.fixture
+def scanned(client):
+    client.get("/api/devices")
+    return client
+
+
+@pytest.mark.parametrize("format", ["rows", "columns"])
+def test_bulk_history(scanned, format):
+    result = scanned.post(
+        "/api/devices/history",
+        params={"format": format},
+        json={"device_ids": [*TRACE_IDS, "missing"], "limit": 5},
+    ).json()
+    assert result["missing"] == ["missing"]
+    assert set(result["histories"]) == set(TRACE_IDS)
+    history = result["histories"][TRACE_IDS[0]]
+    if format == "columns":
+        assert "timestamp" in history and 1 <= len(history["timestamp"]) <= 5
+    else:
+        assert 1 <= len(history) <= 5 and "timestamp" in history[0]
+
+
+def test_bulk_activities(scanned):
+    result = scanned.post(
+        "/api/devices/activities", json={"device_ids": [*TRACE_IDS, "missing"]}
+    ).json()
+    assert result["missing"] == ["missing"]
+    for device_id in TRACE_IDS:
+        actions = result["activities"][device_id]
+        assert actions and all(a["device_id"] == device_id for a in actions)
+
+
+def test_bulk_queries_are_bounded(client):
+    response = client.post("/api/devices/history", json={"device_ids": ["x"] * 1001})
+    assert response.status_code == 422
+    assert (
+        client.post("/api/devices/history", json={"device_ids": []}).status_code == 422
+    )
@@ -0,0 +1,68 @@
+"""Demand-driven scan cadence"""
+
+import asyncio
+
+from app.services import cadence
+from app.services.cadence import ScanCadence
+
+
+class Monotonic:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cadence(monkeypatch, watchers=lambda: 0):
+    clock = Monotonic()
+    monkeypatch.setattr(cadence.time, "monotonic", clock)
+    return clock, ScanCadence(5, 60, idle_after=30, watchers=watchers)
+
+
+def test_idle_without_demand(monkeypatch):
+    _, scans = make_cadence(monkeypatch)
+    assert scans.mode == "idle"
+    assert scans.interval == 60
+
+
+def test_api_calls_keep_it_active_for_a_while(monkeypatch):
+    clock, scans = make_cadence(monkeypatch)
+    scans.touch()
+    assert scans.mode == "active" and scans.interval == 5
+    assert scans.wakeups == 1 and scans.wake_event.is_set()
+    clock.now += 30
+    assert scans.mode == "idle"
+
+
+def test_watchers_keep_it_active(monkeypatch):
+    watchers = [1]
+    _, scans = make_cadence(monkeypatch, lambda: watchers[0])
+    assert scans.mode == "active"
+    watchers[0] = 0
+    assert scans.mode == "idle"
+
+
+def test_remote_watchers_expire(monkeypatch):
+    clock, scans = make_cadence(monkeypatch)
+    scans.report("worker-1", 2)
+    assert scans.watcher_count() == 2
+    clock.now += 30
+    assert scans.watcher_count() == 0
+    assert scans.get_stats()["watchers"] == 0
+    assert scans.remote == {}
+
+
+def test_demand_wakes_an_idle_wait():
+    scans = ScanCadence(0.01, 60, idle_after=30)
+
+    async def scenario():
+        await scans.wait()  # the first cycle is due right away
+        waiting = asyncio.create_task(scans.wait())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        scans.touch()
+        await asyncio.wait_for(waiting, 1)
+
+    asyncio.run(scenario())
+    assert scans.cycles == {"active": 1, "idle": 1}
@@ -0,0 +1,65 @@
+"""Warm-start checkpoints of monitor state"""
+
+import gzip
+import marshal
+
+import msgpack
+
+from app.services.checkpoint import CHECKPOINT_FORMAT, StateCheckpointer
+from benchmarks.synthetic_network import SyntheticNetwork
+
+
+def test_restart_restores_known_devices(make_monitor, scan, loop, clock, tmp_path):
+    path = str(tmp_path / "state.gz")
+    network = SyntheticNetwork(20, missing_response_time=0)
+    monitor = make_monitor()
+    scan(monitor, network)
+    clock.advance(60)
+    scan(monitor, network)
+
+    checkpointer = StateCheckpointer(monitor, path)
+    assert loop.run_until_complete(checkpointer.save())
+    # Nothing changed since
+    assert not loop.run_until_complete(checkpointer.save())
+
+    restarted = make_monitor()
+    restored = StateCheckpointer(restarted, path)
+    assert restored.restore()
+    assert restored.restored_devices == 20
+    assert restarted.known_devices.keys() == monitor.known_devices.keys()
+    assert restarted.sessions.export_state() == monitor.sessions.export_state()
+    # Everything else comes back too (tuples are stored as lists)
+    assert msgpack.packb(restarted.export_state()) == msgpack.packb(
+        monitor.export_state()
+    )
+
+    # Known devices don't announce themselves again
+    alerts = len(restarted.alert_manager.store)
+    clock.advance(60)
+    scan(restarted, network)
+    assert len(restarted.alert_manager.store) == alerts
+
+
+def test_unreadable_or_foreign_checkpoints_are_ignored(make_monitor, tmp_path):
+    monitor = make_monitor()
+    path = tmp_path / "state.gz"
+    assert not StateCheckpointer(monitor, str(path)).restore()
+
+    path.write_bytes(b"not gzip")
+    assert not StateCheckpointer(monitor, str(path)).restore()
+
+    path.write_bytes(gzip.compress(b"\x00"))
+    assert not StateCheckpointer(monitor, str(path)).restore()
+    assert monitor.known_devices == {}
+
+
+def test_marshal_checkpoints_from_version_1_are_ignored(make_monitor, tmp_path):
+    monitor = make_monitor()
+    path = tmp_path / "state.gz"
+    legacy = {"format": CHECKPOINT_FORMAT, "version": 1, "state": {}}
+    path.write_bytes(gzip.compress(marshal.dumps(legacy)))
+    assert not StateCheckpointer(monitor, str(path)).restore()
+
+    path.write_bytes(gzip.compress(msgpack.packb(legacy)))
+    assert not StateCheckpointer(monitor, str(path)).restore()
+    assert monitor.known_devices == {}
@@ -0,0 +1,92 @@
+"""Device registry lookups and search"""
+
+import pytest
+
+from app.models.network import NetworkDevice
+from app.services.device_registry import DeviceRegistry, device_id
+
+
+def make_devices(count: int):
+    devices = []
+    for index in range(count):
+        mac = f"aa:bb:cc:00:00:{index:02x}"
+        devices.append(
+            NetworkDevice(
+                id=device_id(mac),
+                name=f"Phone {index}",
+                ip=f"192.168.1.{index + 1}",
+                mac=mac,
+                status="online",
+                type="phone",
+            )
+        )
+    return devices
+
+
+@pytest.fixture
+def registry() -> DeviceRegistry:
+    registry = DeviceRegistry()
+    registry.update(make_devices(30), version=1)
+    return registry
+
+
+def test_lookup_by_id_mac_ip_and_name(registry):
+    device = registry.devices[5]
+    for key in (device.id, device.mac, device.mac.upper().replace(":", "-"), device.ip):
+        assert registry.get(key) is device
+    assert registry.get("phone 5") is device
+    assert registry.get("nothing") is None
+
+
+@pytest.mark.parametrize(
+    "query, fields, mode",
+    [
+        ("192.168.1.1", None, "prefix"),
+        ("phone 1", ["name"], "prefix"),
+        ("00:1", ["mac"], "substring"),
+        ("1", None, "substring"),
+        ("zzz", None, "prefix"),
+    ],
+)
+def test_search_matches_a_scan(registry, query, fields, mode):
+    def match(device):
+        keys = [
+            str(getattr(device, f)).lower()
+            for f in fields or ("id", "mac", "ip", "name")
+        ]
+        if mode == "prefix":
+            return any(key.startswith(query) for key in keys)
+        return any(query in key for key in keys)
+
+    expected = [d for d in registry.devices if match(d)][:7]
+    assert registry.search(query, fields, mode, limit=7) == expected
+
+
+def test_indexes_are_rebuilt_only_for_new_versions(registry):
+    devices = make_devices(30)
+    registry.update(devices, version=1)
+    assert registry.rebuilds == 1
+    assert registry.devices is devices
+
+    registry.update(devices[:10], version=2)
+    assert registry.rebuilds == 2
+    assert registry.get(devices[20].ip) is None
+    # Devices no longer present are still known
+    assert registry.mac_for(devices[20].id) == devices[20].mac
+
+
+def test_remembered_devices_are_known():
+    registry = DeviceRegistry()
+    registry.remember(["aa:bb:cc:dd:ee:ff"])
+    assert registry.mac_for("aabbccddeeff") == "aa:bb:cc:dd:ee:ff"
+
+
+def test_search_endpoint(client):
+    found = client.get("/api/devices/search", params={"q": "192.168.1.1"}).json()
+    assert len(found) == 3
+    found = client.get(
+        "/api/devices/search", params={"q": "aa:bb:cc:00:00:02", "field": "mac"}
+    ).json()
+    assert [device["ip"] for device in found] == ["192.168.1.11"]
+    response = client.get("/api/devices/search", params={"q": "x", "mode": "fuzzy"})
+    assert response.status_code == 422
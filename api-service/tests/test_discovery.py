@@ -0,0 +1,114 @@
+"""Discovery backends: arp-scan parsing, trace replay and recording"""
+
+import json
+
+import pytest
+
+from app.services import discovery
+from app.services.discovery import (
+    ArpScanBackend,
+    RecordingBackend,
+    ReplayBackend,
+    create_backend,
+)
+
+
+class FakeTime:
+    """Monotonic and wall clocks moved together by the test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now + 1_700_000_000
+
+
+@pytest.fixture
+def fake_time(monkeypatch) -> FakeTime:
+    fake = FakeTime()
+    monkeypatch.setattr(discovery.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(discovery.time, "time", fake.time)
+    return fake
+
+
+def write_frames(path, frames):
+    path.write_text("".join(json.dumps(frame) + "\n" for frame in frames))
+    return str(path)
+
+
+def frame(t, *ips):
+    return {"t": t, "devices": [{"ip": ip, "mac": f"aa:{ip[-2:]}"} for ip in ips]}
+
+
+def test_arp_scan_output_is_parsed():
+    output = (
+        "Interface: eth0, datalink type: EN10MB\n"
+        "192.168.1.1\taa:bb:cc:dd:ee:01\tACME Corp\t1.25ms\n"
+        "192.168.1.2\tAA:BB:CC:DD:EE:02\n"
+        "192.168.1.2\taa:bb:cc:dd:ee:03\tOther (DUP: 2)\n"
+    )
+    first, second, duplicate = ArpScanBackend.parse(output)
+    assert first == {
+        "ip": "192.168.1.1",
+        "mac": "aa:bb:cc:dd:ee:01",
+        "vendor": "ACME Corp",
+        "response_time": 1.25,
+    }
+    assert second["mac"] == "aa:bb:cc:dd:ee:02" and second["response_time"] is None
+    assert duplicate == {"ip": "192.168.1.2", "duplicate": True}
+
+
+def test_replay_follows_the_trace_at_speed(tmp_path, fake_time):
+    path = write_frames(
+        tmp_path / "trace.jsonl",
+        [frame(100, "10.0.0.1"), frame(110, "10.0.0.1", "10.0.0.2"), frame(130)],
+    )
+    backend = ReplayBackend(path, speed=2.0)
+    start = fake_time.time()
+
+    assert len(backend.discover()) == 1
+    fake_time.now += 5  # 10 trace seconds
+    assert len(backend.discover()) == 2
+    assert backend.clock() == pytest.approx(start + 10)
+    fake_time.now += 4
+    assert len(backend.discover()) == 2
+    # The last frame marks where the trace loops back to the start
+    fake_time.now += 7  # 32 trace seconds in
+    assert len(backend.discover()) == 1
+
+
+def test_replay_needs_frames(tmp_path):
+    path = tmp_path / "empty.jsonl"
+    path.write_text("\n")
+    with pytest.raises(ValueError):
+        ReplayBackend(str(path))
+    with pytest.raises(ValueError):
+        create_backend("replay", None, replay_path=str(tmp_path / "missing"))
+
+
+def test_recorded_trace_replays(tmp_path, fake_time):
+    class Static:
+        name = "static"
+        live = True
+
+        def discover(self):
+            return [{"ip": "10.0.0.1", "mac": "aa:01"}]
+
+    path = str(tmp_path / "recorded.jsonl")
+    recorder = RecordingBackend(Static(), path)
+    assert recorder.name == "static+record" and recorder.live
+    recorder.discover()
+    fake_time.now += 2.5
+    recorder.discover()
+
+    frames = [json.loads(line) for line in open(path)]
+    assert [f["t"] for f in frames] == [0.0, 2.5]
+    assert ReplayBackend(path).discover() == [{"ip": "10.0.0.1", "mac": "aa:01"}]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend("carrier-pigeon", None)
@@ -0,0 +1,61 @@
+"""Numbered topic events with replay for SSE clients"""
+
+import json
+
+from app.services.event_hub import EventHub
+
+
+def event_ids(entries):
+    return [entry[0] for entry in entries]
+
+
+def test_frames_are_server_sent_events():
+    hub = EventHub()
+    event_id = hub.publish("alerts", "alert_batch", {"alerts": []})
+    _, topic, frame = hub.buffer[-1]
+    assert topic == "alerts"
+    header, data = frame.strip().rsplit("\n", 1)
+    assert header == f"id: {event_id}\nevent: alert_batch"
+    assert json.loads(data.removeprefix("data: "))["alerts"] == []
+
+
+def test_replay_after_last_event_id():
+    hub = EventHub(replay_size=10)
+    for index in range(6):
+        hub.publish("alerts" if index % 2 else "devices", "event", {})
+
+    entries, gap = hub.replay(2, {"alerts"})
+    assert event_ids(entries) == [4, 6]
+    assert not gap
+
+
+def test_replay_reports_lost_events():
+    hub = EventHub(replay_size=3)
+    for _ in range(6):
+        hub.publish("alerts", "event", {})
+    entries, gap = hub.replay(1, {"alerts"})
+    assert event_ids(entries) == [4, 5, 6] and gap
+    # An id from before a restart
+    assert hub.replay(99, {"alerts"}) == ([], True)
+
+
+def test_new_subscribers_get_snapshots_then_live_events():
+    hub = EventHub()
+    hub.publish("devices", "snapshot", {"devices": []}, snapshot=True)
+    hub.publish("devices", "device_event", {})
+    subscription, backlog, gap = hub.subscribe(["devices"])
+    assert event_ids(backlog) == [1] and not gap
+
+    hub.publish("devices", "device_event", {})
+    hub.publish("stats", "stats", {})
+    assert subscription.queue.qsize() == 1
+
+
+def test_slow_subscribers_are_ended():
+    hub = EventHub(max_queue=2)
+    subscription, _, _ = hub.subscribe(["alerts"])
+    for _ in range(5):
+        hub.publish("alerts", "event", {})
+    assert subscription.overflowed
+    items = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+    assert items[-1] is None and len(items) == 3
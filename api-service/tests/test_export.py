@@ -0,0 +1,34 @@
+"""Streaming exports over HTTP"""
+
+import json
+import sys
+
+from app.routers import export as export_router
+from app.services import export
+
+
+def test_parquet_without_pyarrow_is_501(client, monkeypatch):
+    monkeypatch.setattr(export_router, "parquet_available", lambda: False)
+    assert client.get("/api/export/history?format=parquet").status_code == 501
+
+
+def test_parquet_available_needs_pyarrow_to_import(monkeypatch):
+    export.parquet_available.cache_clear()
+    # None in sys.modules makes the import fail
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    try:
+        assert not export.parquet_available()
+    finally:
+        export.parquet_available.cache_clear()
+
+
+def test_ndjson_and_csv_exports(client):
+    response = client.get("/api/export/history")
+    assert response.headers["content-disposition"].endswith('.ndjson"')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows and {"device_id", "timestamp"} <= set(rows[0])
+
+    lines = client.get("/api/export/history?format=csv").text.splitlines()
+    columns = [name for name, _ in export.EXPORT_COLUMNS["history"]]
+    assert lines[0] == ",".join(columns)
+    assert len(lines) == len(rows) + 1
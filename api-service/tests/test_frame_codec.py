@@ -0,0 +1,43 @@
+"""Frame codecs: subprotocol negotiation and interned keys on binary frames"""
+
+import asyncio
+
+import pytest
+
+from app.services.frame_codec import CODECS, JSON_CODEC, expand_keys, negotiate
+from app.services.websocket_manager import ConnectionManager
+from test_websocket_manager import FakeSocket
+
+
+@pytest.mark.parametrize("subprotocol", sorted(CODECS))
+def test_binary_clients_get_interned_keys(subprotocol):
+    codec = negotiate(["unknown", subprotocol])
+    assert codec.subprotocol == subprotocol
+
+    async def scenario():
+        manager = ConnectionManager()
+        socket = FakeSocket([subprotocol])
+        await manager.connect(socket)
+        await manager.broadcast({"type": "network_update", "data": {"devices": []}})
+        return socket
+
+    socket = asyncio.run(scenario())
+    assert socket.subprotocol == subprotocol
+    frames = [codec.loads(frame) for frame in socket.frames]
+    if codec.binary:
+        hello, update = frames
+        assert hello["type"] == "hello"
+        assert "type" not in update
+        assert expand_keys(update) == {
+            "type": "network_update",
+            "data": {"devices": []},
+        }
+    else:
+        assert frames == [{"type": "network_update", "data": {"devices": []}}]
+
+
+def test_clients_offering_nothing_get_json():
+    assert negotiate([]) is JSON_CODEC
+    message = {"type": "subscribe", "topics": ["alerts"]}
+    for codec in CODECS.values():
+        assert codec.decode(codec.encode(message)) == message
@@ -0,0 +1,84 @@
+"""In-process gateway used by the API routes, and the scanner answering calls"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.scanner import serve_calls
+from app.services.gateway import CALLS_CHANNEL, LocalGateway
+from benchmarks.scan_hot_path import quiet_logs, simulated
+from benchmarks.synthetic_network import SyntheticNetwork
+
+
+def test_api_reads_serve_the_last_snapshot(make_monitor, loop, monkeypatch):
+    monitor = make_monitor()
+    gateway = LocalGateway(monitor)
+    network = SyntheticNetwork(10, missing_response_time=0)
+
+    # The first call scans: there is no snapshot yet
+    with simulated(network), quiet_logs():
+        loop.run_until_complete(gateway.scan_network())
+    assert monitor.last_scan_time is not None
+    scans = []
+    monkeypatch.setattr(monitor, "scan_network", lambda: scans.append(1))
+
+    devices = loop.run_until_complete(gateway.scan_network())
+    assert devices is monitor.cached_devices and len(devices) == 10
+    registry = loop.run_until_complete(gateway.get_registry())
+    assert len(registry) == 10
+    assert scans == []
+
+
+def test_versions_and_device_lookups(make_monitor, scan, loop):
+    monitor = make_monitor()
+    gateway = LocalGateway(monitor)
+    network = SyntheticNetwork(5, missing_response_time=0)
+    scan(monitor, network)
+
+    versions = loop.run_until_complete(gateway.get_versions())
+    assert versions["snapshot"] == monitor.snapshot_version
+    assert set(versions) == {"snapshot", "activities", "alerts", "stats"}
+
+    device = monitor.cached_devices[0]
+    history = loop.run_until_complete(gateway.get_device_history(device.id))
+    assert len(history) == 1
+    version = loop.run_until_complete(gateway.get_device_history_version(device.id))
+    assert version > 0
+    assert loop.run_until_complete(gateway.get_device_history("missing")) == []
+    assert loop.run_until_complete(gateway.get_device_activities("missing")) is None
+
+
+class FakeCallClient:
+    """Hands over calls one at a time like BrokerClient.subscribe"""
+
+    def __init__(self, requests):
+        self.requests = requests
+        self.replies = []
+
+    async def subscribe(self, channels, handler):
+        for request in self.requests:
+            await handler(CALLS_CHANNEL, json.dumps(request).encode())
+        await asyncio.sleep(1)
+
+    async def publish(self, channel, payload):
+        self.replies.append((channel, json.loads(payload)))
+
+
+def test_slow_calls_do_not_hold_up_the_others(loop):
+    async def handle_call(request):
+        await asyncio.sleep(0.2 if request["method"] == "get_registry" else 0)
+        return {"id": request["id"], "result": request["method"]}
+
+    publisher = SimpleNamespace(gateway=SimpleNamespace(handle_call=handle_call))
+    client = FakeCallClient(
+        [
+            {"id": 1, "method": "get_registry", "reply": "slow"},
+            {"id": 2, "method": "get_versions", "reply": "fast"},
+        ]
+    )
+    # Left running; the loop fixture cancels it
+    loop.create_task(serve_calls(client, publisher))
+    loop.run_until_complete(asyncio.sleep(0.05))
+    assert [channel for channel, _ in client.replies] == ["fast"]
+    loop.run_until_complete(asyncio.sleep(0.25))
+    assert [channel for channel, _ in client.replies] == ["fast", "slow"]
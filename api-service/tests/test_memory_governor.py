@@ -0,0 +1,160 @@
+"""Memory budget: eviction order, spilling and recall of per-device state"""
+
+from app.models.network import AlertType
+from app.services.device_registry import device_id
+from app.services.memory_governor import (
+    DeviceState,
+    MemoryGovernor,
+    estimate_size,
+)
+from benchmarks.synthetic_network import SyntheticNetwork
+
+# One byte: every device not present is evicted on each check
+TINY_BUDGET_MB = 1 / (1024 * 1024)
+
+
+def test_estimate_size_counts_nested_containers():
+    flat = estimate_size([1.5, 2.5])
+    nested = estimate_size({"rows": [[1.5, 2.5], [1.5, 2.5]]})
+    assert nested > 2 * flat
+    # Large containers are extrapolated from a sample
+    rows = [(float(i), "x" * 10) for i in range(1000)]
+    exact = estimate_size(rows[:8]) / 8 * 1000
+    assert abs(estimate_size(rows) - exact) / exact < 0.1
+
+
+def toy_governor(budget: int, present=(), spill_path=None):
+    state = {f"mac{i}": list(range(100)) for i in range(10)}
+    last_seen = {mac: float(i) for i, mac in enumerate(state)}
+    governor = MemoryGovernor(
+        budget=budget,
+        devices=lambda: list(state),
+        last_seen=last_seen.get,
+        is_present=lambda mac: mac in present,
+        spill_path=spill_path,
+    )
+    governor.register(DeviceState.of_dict("rows", lambda: state))
+    return governor, state
+
+
+def test_least_recently_seen_devices_are_evicted_first():
+    per_device = estimate_size(list(range(100)))
+    governor, state = toy_governor(budget=per_device * 5, present={"mac0"})
+
+    evicted = governor.enforce(now=0)
+    # Down to the low-water mark, oldest first, never the present device
+    assert evicted == 6
+    assert sorted(state) == ["mac0", "mac7", "mac8", "mac9"]
+    stats = governor.get_stats()
+    assert stats["used_bytes"] == per_device * 4
+    assert stats["subsystems"]["rows"] == {"bytes": per_device * 4, "devices": 4}
+    assert not stats["over_budget"]
+
+
+def test_present_devices_over_budget_are_kept():
+    governor, state = toy_governor(budget=1, present={f"mac{i}" for i in range(10)})
+    assert governor.enforce(now=0) == 0
+    assert len(state) == 10
+    assert governor.over_budget
+
+
+def test_checks_are_rate_limited():
+    governor, state = toy_governor(budget=1)
+    governor.check_interval = 60
+    assert governor.maybe_enforce(now=0) == 10
+    state["mac0"] = [1]
+    assert governor.maybe_enforce(now=30) == 0
+    assert governor.maybe_enforce(now=60) == 1
+
+
+def test_spilled_state_is_recalled(tmp_path):
+    governor, state = toy_governor(budget=1, spill_path=str(tmp_path / "spill"))
+    governor.enforce(now=0)
+    assert state == {}
+
+    assert governor.recall("mac3")
+    assert state == {"mac3": list(range(100))}
+    # Recalled once; the spill entry is gone
+    assert not governor.recall("mac3")
+    assert not governor.recall("unknown")
+    governor.close()
+
+
+def test_state_gathered_since_reconnecting_wins(tmp_path):
+    governor, state = toy_governor(budget=1, spill_path=str(tmp_path / "spill"))
+    governor.enforce(now=0)
+    state["mac3"] = ["new"]
+    governor.recall("mac3")
+    assert state["mac3"] == ["new"]
+    governor.close()
+
+
+def test_evicted_device_reconnects_as_known(make_monitor, scan, clock, tmp_path):
+    monitor = make_monitor(
+        memory_budget_mb=TINY_BUDGET_MB,
+        memory_check_interval=0,
+        memory_spill_path=str(tmp_path / "spill"),
+    )
+    monitor.alert_manager.rules["device_offline"].offline_threshold = 0
+    network = SyntheticNetwork(10, missing_response_time=0)
+    device = network.devices[0]
+    mac = device["mac"]
+    scan(monitor, network)
+    first_seen = monitor.known_devices[mac]["first_seen"]
+
+    device["present"] = False
+    network.render()
+    for _ in range(3):
+        clock.advance(120)
+        scan(monitor, network)
+    assert mac not in monitor.known_devices
+    assert mac not in monitor.presence.devices
+    assert device_id(mac) not in monitor.registry.known
+    assert device_id(mac) not in monitor.alert_manager.device_states
+    assert not any(
+        alert.device_id == device_id(mac)
+        for alert in monitor.alert_manager.open_alerts.values()
+    )
+
+    device["present"] = True
+    network.render()
+    clock.advance(30)
+    scan(monitor, network)
+
+    info = monitor.known_devices[mac]
+    assert info["first_seen"] == first_seen
+    assert info["connections"] == 2
+    assert monitor.governor.recalled == 1
+    # The offline alert left with the device and resolves on its return
+    open_alerts = monitor.alert_manager.open_alerts
+    assert f"{AlertType.DEVICE_OFFLINE.value}:{device_id(mac)}" not in open_alerts
+    offline_alerts, _ = monitor.alert_manager.store.query(
+        device_id=device_id(mac), alert_type=AlertType.DEVICE_OFFLINE.value
+    )
+    assert [alert.resolved for alert in offline_alerts] == [True]
+    new_device_alerts, _ = monitor.alert_manager.store.query(
+        device_id=device_id(mac), alert_type=AlertType.NEW_DEVICE.value
+    )
+    assert len(new_device_alerts) == 1
+
+
+def test_randomized_macs_stay_bounded(make_monitor, scan, clock):
+    monitor = make_monitor(memory_budget_mb=TINY_BUDGET_MB, memory_check_interval=0)
+    network = SyntheticNetwork(50, pattern="random_mac", churn_rate=0.2)
+    for _ in range(40):
+        clock.advance(60)
+        network.step()
+        network.render()
+        scan(monitor, network)
+
+    present = len(network.present_devices())
+    # Only devices that are present (or still suspect) keep state
+    limit = 2 * present
+    assert len(monitor.known_devices) <= limit
+    assert len(monitor.presence.devices) <= limit
+    assert len(monitor.registry.known) <= limit
+    assert len(monitor.alert_manager.device_states) <= limit
+    assert len(monitor.sessions) <= limit
+    # New-device and offline alerts of evicted devices are spilled with them
+    assert len(monitor.alert_manager.open_alerts) <= 2 * limit
+    assert monitor.governor.evicted > present
@@ -0,0 +1,8 @@
+"""Prometheus metrics endpoint"""
+
+
+def test_metrics(client):
+    client.get("/api/devices")
+    text = client.get("/metrics").text
+    assert "# TYPE" in text
+    assert "/api/devices" in text
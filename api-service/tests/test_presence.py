@@ -0,0 +1,174 @@
+"""Presence state machine and confirm probes"""
+
+from benchmarks.synthetic_network import SyntheticNetwork
+
+from app.services.presence import PresenceTracker
+
+MAC = "aa:bb:cc:00:00:01"
+
+
+def test_missing_device_is_suspect_until_grace_expires():
+    tracker = PresenceTracker(offline_grace=60, confirm_probes=1)
+    tracker.mark_seen(MAC, now=0)
+
+    assert tracker.sweep(set(), now=10) == [(MAC, "suspect")]
+    assert tracker.is_present(MAC)
+    assert tracker.due_for_probe(set(), now=59) == []
+    assert tracker.sweep(set(), now=59) == []
+    assert tracker.due_for_probe(set(), now=60) == [MAC]
+
+
+def test_offline_needs_consecutive_failed_probes():
+    tracker = PresenceTracker(offline_grace=0, confirm_probes=2)
+    tracker.mark_seen(MAC, now=0)
+    tracker.sweep(set(), now=1)
+
+    assert tracker.sweep(set(), now=2, responded=set()) == []
+    assert tracker.get_state(MAC) == "suspect"
+    assert tracker.sweep(set(), now=3, responded=set()) == [(MAC, "offline")]
+    assert not tracker.is_present(MAC)
+    assert tracker.mark_seen(MAC, now=4) == "offline"
+    assert tracker.get_state(MAC) == "online"
+
+
+def test_reappearing_resets_failed_probes():
+    tracker = PresenceTracker(offline_grace=0, confirm_probes=2)
+    tracker.mark_seen(MAC, now=0)
+    tracker.sweep(set(), now=1)
+    tracker.sweep(set(), now=2, responded=set())
+    assert tracker.mark_seen(MAC, now=3) == "suspect"
+
+    tracker.sweep(set(), now=4)
+    assert tracker.sweep(set(), now=5, responded=set()) == []
+
+
+def test_answered_probe_keeps_device_online_for_a_grace_window():
+    tracker = PresenceTracker(offline_grace=60, confirm_probes=1)
+    tracker.mark_seen(MAC, now=0)
+    tracker.sweep(set(), now=5)
+
+    assert tracker.sweep(set(), now=60, responded={MAC}) == [(MAC, "online")]
+    assert tracker.get_last_seen(MAC) == 60
+    # No online/suspect flapping on the following scans
+    assert tracker.sweep(set(), now=65) == []
+    assert tracker.sweep(set(), now=119) == []
+    assert tracker.get_state(MAC) == "online"
+    assert tracker.sweep(set(), now=120) == [(MAC, "suspect")]
+
+
+def test_probe_callback_is_used_without_responded():
+    probed = []
+    tracker = PresenceTracker(
+        offline_grace=0, confirm_probes=1, probe=lambda mac: probed.append(mac)
+    )
+    tracker.mark_seen(MAC, now=0)
+    tracker.sweep(set(), now=1)
+
+    assert tracker.sweep(set(), now=2) == [(MAC, "offline")]
+    assert probed == [MAC]
+
+
+def test_state_round_trips_through_export():
+    tracker = PresenceTracker()
+    tracker.mark_seen(MAC, now=0)
+    tracker.sweep(set(), now=1)
+
+    restored = PresenceTracker()
+    restored.restore_state(tracker.export_state())
+    assert restored.get_state(MAC) == "suspect"
+    assert restored.get_counts() == {"online": 0, "suspect": 1, "offline": 0}
+
+
+def drop_from_arp_scan(network: SyntheticNetwork, device: dict):
+    """The device misses arp-scan but still answers ping and stays cached"""
+    lines = network.rendered["arp-scan"].splitlines()
+    network.rendered["arp-scan"] = (
+        "\n".join(line for line in lines if not line.startswith(device["ip"] + "\t"))
+        + "\n"
+    )
+
+
+def live_monitor(make_monitor, monkeypatch, network, **options):
+    monitor = make_monitor(**options)
+    monkeypatch.setattr(monitor.discovery, "live", True)
+    monkeypatch.setattr(
+        monitor,
+        "_read_neighbor_table",
+        lambda: [
+            {"ip": device["ip"], "mac": device["mac"]}
+            for device in network.present_devices()
+        ],
+    )
+    return monitor
+
+
+def test_device_missing_from_scans_but_answering_probes_stays_online(
+    make_monitor, scan, clock, monkeypatch
+):
+    network = SyntheticNetwork(5, missing_response_time=0)
+    monitor = live_monitor(
+        make_monitor, monkeypatch, network, offline_grace=60, confirm_probes=1
+    )
+    device = network.devices[0]
+    scan(monitor, network)
+
+    versions = []
+    for _ in range(6):
+        clock.advance(30)
+        network.render()
+        drop_from_arp_scan(network, device)
+        devices = scan(monitor, network)
+        listed = {d.mac: d.status for d in devices}
+        assert listed[device["mac"]] == "online"
+        versions.append(monitor.snapshot_version)
+
+    assert monitor.presence.get_state(device["mac"]) == "online"
+    # Listed after the scanned devices from the first miss on, then stable
+    assert len(set(versions)) == 1
+    assert not [a for a in monitor.activity_log if "Disconnected" in a.action]
+
+
+def test_probe_reply_from_another_mac_does_not_count(
+    make_monitor, scan, clock, monkeypatch
+):
+    network = SyntheticNetwork(5, missing_response_time=0)
+    monitor = live_monitor(make_monitor, monkeypatch, network, offline_grace=60)
+    device = network.devices[0]
+    old_mac = device["mac"]
+    scan(monitor, network)
+
+    # DHCP hands the address to another device: the IP still answers pings
+    device["mac"] = "de:ad:be:ef:00:01"
+    network.render()
+    for _ in range(4):
+        clock.advance(30)
+        scan(monitor, network)
+
+    assert monitor.presence.get_state(old_mac) == "offline"
+    assert monitor.presence.get_state(device["mac"]) == "online"
+
+
+def test_offline_devices_are_evaluated_until_the_offline_alert(
+    make_monitor, scan, clock
+):
+    network = SyntheticNetwork(3, missing_response_time=0)
+    monitor = make_monitor()
+    monitor.alert_manager.rules["device_offline"].offline_threshold = 60
+    device = network.devices[0]
+    scan(monitor, network)
+
+    device["present"] = False
+    network.render()
+    clock.advance(10)
+    scan(monitor, network)
+    clock.advance(10)
+    scan(monitor, network)
+    assert device["mac"] in monitor.offline_pending
+
+    clock.advance(60)
+    scan(monitor, network)
+    assert device["mac"] not in monitor.offline_pending
+    assert any(
+        fingerprint.startswith("device_offline:")
+        for fingerprint in monitor.alert_manager.open_alerts
+    )
@@ -0,0 +1,80 @@
+"""Compiled alert rules: thresholds, scopes and recompilation"""
+
+from app.models.network import AlertRule, AlertType, NetworkDevice
+from app.services.rule_engine import RuleEngine, compile_rule
+
+
+def make_device(device_id: str = "dev1", **fields) -> NetworkDevice:
+    fields.setdefault("status", "online")
+    fields.setdefault("type", "phone")
+    return NetworkDevice(
+        id=device_id, name=device_id, ip="10.0.0.1", mac=device_id, **fields
+    )
+
+
+def latency_rule(**fields) -> AlertRule:
+    return AlertRule(
+        id=fields.pop("id", "latency"),
+        type=AlertType.HIGH_LATENCY,
+        metric="latency",
+        **fields,
+    )
+
+
+def fires(compiled, device, value, now) -> bool:
+    return compiled.predicate(device, value, now)
+
+
+def test_legacy_rule_uses_its_type_threshold():
+    compiled = compile_rule(AlertRule(id="r", type=AlertType.PACKET_LOSS))
+    assert compiled.metric == "packet_loss"
+    assert compiled.threshold == 10.0
+
+
+def test_lifecycle_rules_are_not_compiled():
+    assert compile_rule(AlertRule(id="r", type=AlertType.NEW_DEVICE)) is None
+
+
+def test_threshold_operators():
+    device = make_device()
+    above = compile_rule(latency_rule(threshold=100))
+    below = compile_rule(latency_rule(threshold=100, operator="<="))
+    assert fires(above, device, 101, 0) and not fires(above, device, 100, 0)
+    assert fires(below, device, 100, 0) and not fires(below, device, 101, 0)
+
+
+def test_engine_visits_only_rules_in_scope():
+    engine = RuleEngine()
+    engine.load(
+        [
+            latency_rule(id="all", threshold=100),
+            latency_rule(id="phones", threshold=100, device_types=["phone"]),
+            latency_rule(id="one", threshold=100, device_ids=["b"]),
+            latency_rule(id="vendor", threshold=100, vendors=["ACME"]),
+        ]
+    )
+    phone = make_device("a", latency=150, vendor="Acme")
+    laptop = make_device("b", type="laptop", latency=150)
+    offline = make_device("c", status="offline", latency=150)
+
+    matches = {
+        (c.rule.id, d.id) for c, d, _ in engine.evaluate([phone, laptop, offline])
+    }
+    assert matches == {
+        ("all", "a"),
+        ("phones", "a"),
+        ("vendor", "a"),
+        ("all", "b"),
+        ("one", "b"),
+    }
+
+
+def test_disabled_rules_are_skipped_and_updates_recompile():
+    engine = RuleEngine()
+    rule = latency_rule(threshold=100, enabled=False)
+    engine.load([rule])
+    device = make_device(latency=150)
+    assert engine.evaluate([device]) == []
+
+    engine.update(rule.model_copy(update={"enabled": True}))
+    assert len(engine.evaluate([device])) == 1
@@ -0,0 +1,183 @@
+"""Windowed and sustained rule conditions over streaming statistics"""
+
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.network import AlertRule, AlertType, NetworkDevice
+from app.services.rule_engine import RuleEngine, compile_rule
+from app.services.streaming_stats import EWMA, MOfN, SlidingWindow
+
+
+def make_device(device_id: str = "dev1", **fields) -> NetworkDevice:
+    fields.setdefault("status", "online")
+    fields.setdefault("type", "phone")
+    return NetworkDevice(
+        id=device_id, name=device_id, ip="10.0.0.1", mac=device_id, **fields
+    )
+
+
+def latency_rule(**fields) -> AlertRule:
+    return AlertRule(
+        id=fields.pop("id", "latency"),
+        type=AlertType.HIGH_LATENCY,
+        metric="latency",
+        **fields,
+    )
+
+
+def fires(compiled, device, value, now) -> bool:
+    return compiled.predicate(device, value, now)
+
+
+def test_m_of_n_needs_breaches_within_the_last_samples():
+    compiled = compile_rule(latency_rule(threshold=100, samples=5, breaches=3))
+    device = make_device()
+    outcomes = [
+        fires(compiled, device, value, now)
+        for now, value in enumerate([150, 50, 150, 50, 150, 50, 150, 50, 50])
+    ]
+    # Fires while three of the last five samples breach
+    assert outcomes == [False, False, False, False, True, False, True, False, False]
+
+
+def test_m_of_n_is_tracked_per_device():
+    compiled = compile_rule(latency_rule(threshold=100, samples=2, breaches=2))
+    first, second = make_device("a"), make_device("b")
+    fires(compiled, first, 150, 0)
+    assert not fires(compiled, second, 150, 1)
+    assert fires(compiled, first, 150, 2)
+
+
+def test_sustained_fires_after_duration():
+    compiled = compile_rule(
+        latency_rule(threshold=100, condition="sustained", duration=30)
+    )
+    device = make_device()
+    assert not fires(compiled, device, 150, 0)
+    assert not fires(compiled, device, 150, 29)
+    assert fires(compiled, device, 150, 30)
+    # Dropping below restarts the clock
+    assert not fires(compiled, device, 50, 31)
+    assert not fires(compiled, device, 150, 40)
+
+
+def test_rate_of_change_is_per_second():
+    compiled = compile_rule(
+        latency_rule(threshold=5, condition="rate_of_change", aggregate="last")
+    )
+    device = make_device()
+    assert not fires(compiled, device, 10, 0)
+    assert not fires(compiled, device, 50, 10)  # 4 ms/s
+    assert fires(compiled, device, 110, 20)  # 6 ms/s
+
+
+def test_mean_window_ignores_expired_samples():
+    compiled = compile_rule(latency_rule(threshold=100, aggregate="mean", window=60))
+    device = make_device()
+    assert fires(compiled, device, 300, 0)
+    assert fires(compiled, device, 0, 10)  # mean 150
+    # The 300 ms sample left the window
+    assert not fires(compiled, device, 0, 200)
+
+
+def test_min_samples_holds_aggregates_back():
+    compiled = compile_rule(
+        latency_rule(threshold=100, aggregate="max", window=60, min_samples=3)
+    )
+    device = make_device()
+    assert not fires(compiled, device, 500, 0)
+    assert not fires(compiled, device, 500, 1)
+    assert fires(compiled, device, 500, 2)
+
+
+def test_quantile_window_matches_exact_quantile():
+    compiled = compile_rule(latency_rule(threshold=90, aggregate="p95", window=300))
+    device = make_device()
+    for now in range(100):
+        value = float(now + 1)
+        result = fires(compiled, device, value, now)
+    # p95 of 1..100 is about 95, within the sketch's 2% accuracy
+    assert result
+    window = compiled.device_state[0][device.id]
+    assert window.quantile(0.95, 99) == pytest.approx(95, rel=0.03)
+
+
+def test_ewma_smooths_spikes():
+    compiled = compile_rule(latency_rule(threshold=100, aggregate="ewma", window=60))
+    device = make_device()
+    for now in range(0, 300, 10):
+        assert not fires(compiled, device, 20, now)
+    # A single spike is damped below the threshold
+    assert not fires(compiled, device, 400, 300)
+    # A sustained rise gets there
+    assert any(fires(compiled, device, 400, now) for now in range(310, 600, 10))
+
+
+def test_sliding_window_quantiles_within_accuracy():
+    rng = random.Random(7)
+    window = SlidingWindow(3600)
+    values = [rng.lognormvariate(3, 1) for _ in range(2000)]
+    for value in values:
+        window.update(value, 100)
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert window.quantile(q, 100) == pytest.approx(exact, rel=0.05)
+    assert window.count(100) == 2000
+    assert window.max(100) == max(values)
+
+
+def test_ewma_half_life():
+    average = EWMA(10)
+    average.update(0, 0)
+    assert average.update(100, 10) == pytest.approx(50)
+
+
+def test_m_of_n_counts_last_n():
+    window = MOfN(3)
+    assert [window.push(hit) for hit in (True, True, False, False)] == [1, 2, 2, 1]
+
+
+def test_forget_drops_device_windows():
+    engine = RuleEngine()
+    engine.load([latency_rule(threshold=100, aggregate="p90", samples=3)])
+    device = make_device(latency=150)
+    engine.evaluate([device], now=0)
+    assert engine.device_bytes(device.id) > 0
+
+    engine.forget(device.id)
+    assert engine.device_bytes(device.id) == 0
+    assert all(
+        not states
+        for compiled in engine.compiled.values()
+        for states in compiled.device_state
+    )
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"window": 0},
+        {"samples": 0},
+        {"breaches": 2},
+        {"breaches": 4, "samples": 3},
+        {"min_samples": 0},
+        {"duration": -1},
+        {"window": 1025},
+        {"min_samples": 1025},
+        {"breaches": 1, "samples": 1025},
+        {"breaches": 1025, "samples": 1025},
+    ],
+)
+def test_invalid_windows_are_rejected(fields):
+    with pytest.raises(ValidationError):
+        latency_rule(threshold=100, **fields)
+
+
+def test_largest_windows_are_accepted():
+    rule = latency_rule(
+        threshold=100, window=1024, min_samples=1024, breaches=1024, samples=1024
+    )
+    assert compile_rule(rule) is not None
@@ -0,0 +1,187 @@
+"""Presence sessions checked against a direct computation over intervals"""
+
+import random
+
+import pytest
+
+from app.services.sessions import PresenceSessions, _MaxTree
+
+
+def random_history(rng: random.Random, macs, steps: int = 200):
+    """Open and close sessions at increasing times; mac -> [[start, end]]"""
+    sessions = PresenceSessions()
+    intervals = {mac: [] for mac in macs}
+    now = 0.0
+    for _ in range(steps):
+        now += rng.uniform(0, 50)
+        mac = rng.choice(macs)
+        history = intervals[mac]
+        if history and history[-1][1] is None:
+            # Last seen some time after it connected
+            end = rng.uniform(history[-1][0], now)
+            sessions.close_session(mac, end)
+            history[-1][1] = end
+        else:
+            sessions.open_session(mac, now)
+            history.append([now, None])
+    return sessions, intervals, now
+
+
+def clipped(start, end, since, until) -> float:
+    return max(0.0, min(end, until) - max(start, since))
+
+
+def expected_availability(history, since, until, now):
+    until = min(until, now)
+    monitored_since = max(since, history[0][0])
+    closed = [(start, end) for start, end in history if end is not None]
+    online = sum(
+        clipped(start, now if end is None else end, monitored_since, until)
+        for start, end in history
+    )
+    gaps = [
+        (end, history[index + 1][0] if index + 1 < len(history) else now)
+        for index, (_, end) in enumerate(closed)
+    ]
+    outages = [clipped(start, end, monitored_since, until) for start, end in gaps]
+    return {
+        "monitored_seconds": max(until - monitored_since, 0.0),
+        "online_seconds": online,
+        "longest_outage": max([o for o in outages if o > 0], default=None),
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_availability_matches_intervals(seed):
+    rng = random.Random(seed)
+    macs = [f"mac{i}" for i in range(6)]
+    sessions, intervals, now = random_history(rng, macs)
+
+    for _ in range(100):
+        mac = rng.choice(macs)
+        since = rng.uniform(-100, now)
+        until = rng.uniform(since, now + 100)
+        result = sessions.availability(mac, since, until, now)
+        if not intervals[mac]:
+            assert result is None
+            continue
+        expected = expected_availability(intervals[mac], since, until, now)
+        assert result["monitored_seconds"] == pytest.approx(
+            expected["monitored_seconds"], abs=1e-3
+        )
+        assert result["online_seconds"] == pytest.approx(
+            expected["online_seconds"], abs=1e-3
+        )
+        outage = result["longest_outage"]
+        if expected["longest_outage"] is None:
+            assert outage is None
+        else:
+            assert outage["seconds"] == pytest.approx(
+                expected["longest_outage"], abs=1e-3
+            )
+        assert result["online"] == (intervals[mac][-1][1] is None)
+        assert result["sessions"] == len(intervals[mac])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_online_between_matches_intervals(seed):
+    rng = random.Random(seed)
+    macs = [f"mac{i}" for i in range(20)]
+    sessions, intervals, now = random_history(rng, macs, steps=400)
+
+    for _ in range(100):
+        since = rng.uniform(0, now)
+        until = rng.uniform(since, now)
+        expected = {
+            mac
+            for mac, history in intervals.items()
+            for start, end in history
+            if start <= until and (now if end is None else end) >= since
+        }
+        assert set(sessions.online_between(since, until, now)) == expected
+
+
+def test_uptime_of_a_simple_history():
+    sessions = PresenceSessions()
+    sessions.open_session("a", 0)
+    sessions.close_session("a", 40)
+    sessions.open_session("a", 60)
+
+    result = sessions.availability("a", 0, 100, now=100)
+    assert result["uptime_percent"] == 80.0
+    assert result["longest_outage"] == {"start": 40, "end": 60, "seconds": 20}
+    assert result["online"]
+
+
+def test_old_sessions_are_trimmed():
+    sessions = PresenceSessions(max_sessions=10)
+    for start in range(0, 300, 20):
+        sessions.open_session("a", start)
+        sessions.close_session("a", start + 10)
+    assert len(sessions.devices["a"].starts) <= 10
+    result = sessions.availability("a", 0, 300, now=300)
+    # Trimmed history still answers from the oldest session kept
+    assert result["online_seconds"] == 10 * len(sessions.devices["a"].starts)
+
+
+def test_state_round_trips():
+    rng = random.Random(3)
+    macs = [f"mac{i}" for i in range(5)]
+    sessions, _, now = random_history(rng, macs)
+
+    restored = PresenceSessions()
+    restored.restore_state(sessions.export_state())
+    for mac in macs:
+        assert restored.availability(mac, 0, now, now) == sessions.availability(
+            mac, 0, now, now
+        )
+    assert set(restored.online_between(0, now, now)) == set(
+        sessions.online_between(0, now, now)
+    )
+
+
+def test_evicted_device_comes_back_with_its_sessions():
+    sessions = PresenceSessions()
+    sessions.open_session("a", 0)
+    sessions.close_session("a", 10)
+    sessions.open_session("a", 20)
+    before = sessions.availability("a", 0, 50, now=50)
+    assert sessions.device_bytes("a") > 0
+
+    state = sessions.evict("a")
+    assert sessions.availability("a", 0, 50, now=50) is None
+    assert sessions.device_bytes("a") == 0
+    assert "a" not in sessions.open
+
+    sessions.restore_device("a", state)
+    assert sessions.availability("a", 0, 50, now=50) == before
+    assert list(sessions.open) == ["a"]
+
+
+def test_max_tree_queries():
+    rng = random.Random(1)
+    values = [rng.uniform(0, 100) for _ in range(37)]
+    tree = _MaxTree(values[:20])
+    for value in values[20:]:
+        tree.append(value)
+
+    for _ in range(50):
+        lo = rng.randrange(len(values))
+        hi = rng.randrange(lo + 1, len(values) + 1)
+        assert tree.max(lo, hi) == max(values[lo:hi])
+        bound = rng.uniform(0, 100)
+        assert sorted(tree.at_least(lo, hi, bound)) == [
+            i for i in range(lo, hi) if values[i] >= bound
+        ]
+
+
+def test_availability_endpoints(client):
+    client.get("/api/devices")
+    ids = ["aabbcc000001", "missing"]
+    result = client.post("/api/devices/availability", json={"device_ids": ids}).json()
+    assert result["missing"] == ["missing"]
+    availability = result["devices"]["aabbcc000001"]
+    assert availability["online"] and availability["sessions"] == 1
+
+    online = client.get("/api/devices/online").json()
+    assert "aabbcc000001" in online["device_ids"]
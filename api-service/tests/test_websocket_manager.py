@@ -0,0 +1,170 @@
+"""WebSocket fan-out: topics, projections, device alerts and slow clients"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.models.network import Alert, AlertSeverity, AlertType
+from app.services import websocket_manager
+from app.services.alert_notifier import AlertNotifier
+from app.services.websocket_manager import ConnectionManager
+
+
+class FakeSocket:
+    """Records frames; `delay` makes it a slow reader, `fail` a broken one"""
+
+    def __init__(self, subprotocols=(), delay: float = 0.0, fail: bool = False):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.delay = delay
+        self.fail = fail
+        self.frames = []
+        self.closed_with = None
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def _send(self, frame):
+        if self.fail:
+            raise RuntimeError("connection reset")
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame)
+
+    async def send_text(self, frame: str):
+        await self._send(frame)
+
+    async def send_bytes(self, frame: bytes):
+        await self._send(frame)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+    def messages(self):
+        return [json.loads(frame) for frame in self.frames]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_broadcast_skips_topic_subscribers():
+    async def scenario():
+        manager = ConnectionManager()
+        plain, subscribed = FakeSocket(), FakeSocket()
+        await manager.connect(plain)
+        await manager.connect(subscribed)
+        manager.subscribe(subscribed, ["alerts"])
+
+        await manager.broadcast({"type": "network_update"})
+        await manager.publish("alerts", {"type": "alert_batch", "alerts": []})
+        return plain, subscribed
+
+    plain, subscribed = run(scenario())
+    assert [m["type"] for m in plain.messages()] == ["network_update"]
+    assert [(m["type"], m["topic"]) for m in subscribed.messages()] == [
+        ("alert_batch", "alerts")
+    ]
+
+
+def test_device_fields_are_projected_per_client():
+    async def scenario():
+        manager = ConnectionManager()
+        narrow, wide = FakeSocket(), FakeSocket()
+        for socket in (narrow, wide):
+            await manager.connect(socket)
+        manager.subscribe(narrow, ["devices"], fields=["status"])
+        manager.subscribe(wide, ["devices"])
+        device = {"id": "d1", "mac": "m", "status": "online", "latency": 3.0}
+        await manager.broadcast_device_event("connected", device)
+        return narrow, wide
+
+    narrow, wide = run(scenario())
+    assert narrow.messages()[0]["device"] == {
+        "id": "d1",
+        "mac": "m",
+        "status": "online",
+    }
+    assert wide.messages()[0]["device"]["latency"] == 3.0
+
+
+def test_device_topics_get_their_own_alerts_and_resolutions():
+    async def scenario():
+        manager = ConnectionManager()
+        notifier = AlertNotifier(manager)
+        page = FakeSocket()
+        await manager.connect(page)
+        manager.subscribe(page, ["device:d1"])
+
+        def alert(alert_id, device_id, resolved=False):
+            return Alert(
+                id=alert_id,
+                type=AlertType.HIGH_LATENCY,
+                severity=AlertSeverity.WARNING,
+                title="t",
+                message="m",
+                device_id=device_id,
+                timestamp=datetime(2024, 1, 1),
+                resolved=resolved,
+            )
+
+        notifier.notify(
+            [
+                alert("new", "d1"),
+                alert("other", "d2"),
+                alert("old", "d1", resolved=True),
+                alert("elsewhere", "d2", resolved=True),
+            ]
+        )
+        await notifier.flush()
+        notifier.notify([alert("new", "d1", resolved=True)])
+        await notifier.flush()
+        return page
+
+    first, second = run(scenario()).messages()
+    assert [a["id"] for a in first["alerts"]] == ["new"]
+    assert first["resolved"] == ["old"]
+    assert (second["alerts"], second["resolved"]) == ([], ["new"])
+
+
+def test_invalid_topics_are_rejected():
+    manager = ConnectionManager()
+    socket = FakeSocket()
+    with pytest.raises(ValueError):
+        manager.subscribe(socket, ["devices", "weather"])
+    with pytest.raises(ValueError):
+        manager.subscribe(
+            socket,
+            [f"device:{i}" for i in range(websocket_manager.MAX_TOPICS_PER_CLIENT + 1)],
+        )
+    assert manager.subscribe(socket, ["device:d1", "devices"]) == [
+        "device:d1",
+        "devices",
+    ]
+    assert manager.device_topics() == ["device:d1"]
+    manager.unsubscribe(socket)
+    assert not manager.has_subscribers("devices")
+
+
+def test_slow_clients_are_dropped_without_holding_up_the_rest(monkeypatch):
+    monkeypatch.setattr(websocket_manager, "SEND_TIMEOUT", 0.05)
+
+    async def scenario():
+        manager = ConnectionManager()
+        fast, slow, broken = FakeSocket(), FakeSocket(delay=1), FakeSocket(fail=True)
+        for socket in (fast, slow, broken):
+            await manager.connect(socket)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await manager.broadcast({"type": "network_update"})
+        elapsed = loop.time() - start
+        await asyncio.gather(*manager.closing)
+        return manager, fast, slow, broken, elapsed
+
+    manager, fast, slow, broken, elapsed = run(scenario())
+    assert elapsed < 0.5
+    assert len(fast.frames) == 1
+    assert manager.active_connections == {fast}
+    assert slow.closed_with == 1013
+    assert broken.closed_with is None